@@ -1,32 +1,34 @@
-from pydub import AudioSegment
 import matplotlib.pyplot as plt
+from featurecache import FeatureCache
+from overview import Overview
 
 # --- Settings ---
 file_path = "funeralmix.mp3"
-chunk_size_ms = 100  # How fine to sample (smaller = more detail)
+plot_points = 2000  # Points drawn across the window; zooming in pulls finer levels (down to 1 ms)
 
-# --- Load and Prepare Audio ---
-audio = AudioSegment.from_mp3(file_path)
-length = len(audio)
-times = []
-volumes = []
-
-# --- Process audio in chunks ---
-for i in range(0, length, chunk_size_ms):
-    chunk = audio[i:i + chunk_size_ms]
-    db = chunk.dBFS if chunk.dBFS != float("-inf") else -90  # Handle digital silence
-    volumes.append(db)
-    times.append(i / 1000)  # Convert to seconds
+# --- Min/max/RMS pyramid (built once in blocks, then cached) ---
+overview = Overview.load(file_path, FeatureCache())
+times, _, _, volumes = overview.view(0, overview.duration, plot_points)
 
 # --- Plotting ---
-plt.figure(figsize=(15, 5))
-plt.plot(times, volumes, label="Volume (dBFS)")
-plt.axhline(y=-45, color='r', linestyle='--', label='Suggested Threshold (-45 dBFS)')
-plt.title("Volume Profile of Audio Over Time")
-plt.xlabel("Time (seconds)")
-plt.ylabel("Volume (dBFS)")
-plt.ylim(-90, 0)
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
+fig, ax = plt.subplots(figsize=(15, 5))
+line, = ax.plot(times, volumes, drawstyle="steps-post", label="Volume (dBFS)")
+ax.axhline(y=-45, color='r', linestyle='--', label='Suggested Threshold (-45 dBFS)')
+ax.set_title("Volume Profile of Audio Over Time")
+ax.set_xlabel("Time (seconds)")
+ax.set_ylabel("Volume (dBFS)")
+ax.set_ylim(-90, 0)
+ax.grid(True)
+ax.legend()
+fig.tight_layout()
+
+
+def refresh(ax):
+    # Re-query the pyramid for whatever range the toolbar zoomed/panned to
+    start, end = ax.get_xlim()
+    times, _, _, volumes = overview.view(start, end, plot_points)
+    line.set_data(times, volumes)
+
+
+ax.callbacks.connect("xlim_changed", refresh)
 plt.show()
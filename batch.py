@@ -0,0 +1,374 @@
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# === CONFIGURATION ===
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".m4a", ".aac", ".ogg")
+DEFAULT_OUTPUT_DIR = "batch_output"
+DEFAULT_RETRIES = 1  # extra attempts for a mix whose run raised or whose process died
+REPORT_FILE = "batch_report.json"
+
+
+# === TOOLS (headless front-ends over segmentation, like the scripts / GUI branches) ===
+def _export(path, ranges, paths, audio, options, tracks=None, manifest=None):
+    """Write the tracks, or with `virtual` only their cue sheet and offsets (returning the cue path)."""
+    if options.get("virtual"):
+        from cuesheet import write_virtual_split
+        if not ranges:
+            return []
+        cue_path, _ = write_virtual_split(path, ranges, os.path.dirname(paths[0]), tracks)
+        return [cue_path]
+    from exporter import export_segments
+    return [out for _, _, _, out in export_segments(path, ranges, paths, audio, options["lossless"],
+                                                    options["workers"], format=options["format"],
+                                                    bitrate=options["bitrate"], manifest=manifest)]
+
+
+def _manifest(path, out_dir, tool, options):
+    """The resume checkpoint (manifest.SplitManifest) of one mix's run, or None without `resume`."""
+    if not options.get("resume") or options.get("virtual"):
+        return None
+    from manifest import SplitManifest
+    return SplitManifest(out_dir, path, tool, options["params"])
+
+
+def _ranges(manifest, compute):
+    """Boundaries saved by an earlier run with the same parameters, else `compute()`."""
+    return manifest.boundaries(compute) if manifest else compute()
+
+
+def _curve(manifest, detector, mix):
+    """The curve to plot; a resumed run only takes it from the feature cache (None if it is not there)."""
+    from segmentation import cached_curve
+    return cached_curve(detector, mix) if manifest and manifest.resumed else detector.curve(mix)
+
+
+def _ext(options):
+    from encoder import extension
+    return extension(options["format"])
+
+
+def _low_volume_ranges(mix, params):
+    from segmentation import LowVolumeDetector
+    return LowVolumeDetector(float(params.get("min_dbfs", -35)), int(params.get("pause_ms", 2000)),
+                             int(params.get("chunk_ms", 100)), int(params.get("min_song_ms", 10000)),
+                             str(params.get("refine", "1")).lower() not in ("0", "false", "no")).ranges(mix)
+
+
+def _mix(path, options):
+    from featurecache import FeatureCache
+    from segmentation import MixFeatures
+    return MixFeatures(path, FeatureCache(), options["stream"])
+
+
+def low_volume_split(path, out_dir, options):
+    mix = _mix(path, options)
+    manifest = _manifest(path, out_dir, "low-volume", options)
+    ranges = _ranges(manifest, lambda: _low_volume_ranges(mix, options["params"]))
+    paths = [os.path.join(out_dir, f"song_{i+1}{_ext(options)}") for i in range(len(ranges))]
+    return _export(path, ranges, paths, mix.audio_if_decoded, options, manifest=manifest)
+
+
+def timestamps(path, out_dir, options):
+    mix = _mix(path, options)
+    manifest = _manifest(path, out_dir, "timestamps", options)
+    ranges = _ranges(manifest, lambda: _low_volume_ranges(mix, options["params"]))
+    # The interactive preview becomes a file; there is nobody to answer y/n
+    with open(os.path.join(out_dir, "split_preview.txt"), "w", encoding="utf-8") as f:
+        for i, (start, end) in enumerate(ranges):
+            f.write(f"Song {i+1}: {start//1000}s → {end//1000}s ({end//1000 - start//1000} seconds)\n")
+    paths = [os.path.join(out_dir, f"song_{i+1}{_ext(options)}") for i in range(len(ranges))]
+    return _export(path, ranges, paths, mix.audio_if_decoded, options, manifest=manifest)
+
+
+def process(path, out_dir, options):
+    from segmentation import SilenceDetector
+    params = options["params"]
+    mix = _mix(path, options)
+    manifest = _manifest(path, out_dir, "process", options)
+    detector = SilenceDetector(min_silence_len=int(params.get("min_silence_len", 1500)),
+                               silence_thresh=int(params.get("silence_thresh", -40)))
+    ranges = _ranges(manifest, lambda: detector.ranges(mix))
+    paths = [os.path.join(out_dir, f"song_{i+1}{_ext(options)}") for i in range(len(ranges))]
+    return _export(path, ranges, paths, mix.audio_if_decoded, options, manifest=manifest)
+
+
+def song_by_time(path, out_dir, options):
+    from exporter import source_length_ms
+    if not options["timecuts"]:
+        raise ValueError("song-by-time needs a timecut JSON (--timecuts, a manifest entry, "
+                         "or <mix name>.json next to the mix)")
+    with open(options["timecuts"], "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    start_times = [int(entry["start_time"] * 60 * 1000) for entry in metadata]
+    end_times = start_times[1:] + [source_length_ms(path)]
+
+    segments_metadata = []
+    for i, (start, end) in enumerate(zip(start_times, end_times)):
+        artist = metadata[i].get("artist", "Unknown Artist").strip()
+        title = metadata[i].get("title", f"Track_{i+1:02}").strip()
+        segments_metadata.append({
+            "track": i + 1,
+            "filename": f"{artist} - {title}{_ext(options)}",
+            "artist": artist,
+            "title": title,
+            "start_min": metadata[i]["start_time"],
+            "start_sec": start // 1000,
+            "end_sec": end // 1000,
+            "duration_sec": (end - start) // 1000
+        })
+    paths = [os.path.join(out_dir, s["filename"]) for s in segments_metadata]
+    outputs = _export(path, list(zip(start_times, end_times)), paths, None, options, segments_metadata,
+                      _manifest(path, out_dir, "song-by-time", options))
+    if not options.get("virtual"):  # the virtual split writes its own, with offsets
+        with open(os.path.join(out_dir, "split_timestamps.json"), "w", encoding="utf-8") as f:
+            json.dump(segments_metadata, f, indent=2, ensure_ascii=False)
+    return outputs
+
+
+def transition_energy(path, out_dir, options):
+    from matplotlib.figure import Figure
+    from segmentation import TempoChangeDetector
+    params = options["params"]
+    mix = _mix(path, options)
+    detector = TempoChangeDetector(int(params.get("window_seconds", 10)),
+                                   float(params.get("tempo_change_threshold", 10)),
+                                   float(params.get("min_segment_sec", 30)),
+                                   float(params.get("window_overlap", 0.0)))
+    manifest = _manifest(path, out_dir, "transition-energy", options)
+    ranges = _ranges(manifest, lambda: detector.ranges(mix))
+    paths = [os.path.join(out_dir, f"track_{i+1:02}{_ext(options)}") for i in range(len(ranges))]
+    outputs = _export(path, ranges, paths, mix.audio_if_decoded, options, manifest=manifest)
+    curve = _curve(manifest, detector, mix)
+    if curve is None:
+        return outputs  # resumed: the previous run's plot stays
+
+    # Agg only: there is no display on the servers
+    times, tempos = curve
+    fig = Figure(figsize=(14, 5))
+    ax = fig.add_subplot()
+    ax.plot(times, tempos, marker='o', label="Tempo (BPM)")
+    for start, _ in ranges[1:]:
+        ax.axvline(x=start / 1000, color='r', linestyle='--', alpha=0.5)
+    ax.set_title("Detected Beat Pattern Changes Over Time")
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Tempo (BPM)")
+    ax.grid(True)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(os.path.join(out_dir, "tempo_plot.png"))
+    return outputs
+
+
+def novelty_split(path, out_dir, options):
+    from matplotlib.figure import Figure
+    from segmentation import NoveltyDetector
+    params = options["params"]
+    mix = _mix(path, options)
+    detector = NoveltyDetector(float(params.get("kernel_sec", 30)),
+                               float(params.get("min_track_sec", 60)),
+                               float(params.get("sensitivity", 6.0)))
+    manifest = _manifest(path, out_dir, "novelty", options)
+    ranges = _ranges(manifest, lambda: detector.ranges(mix))
+    paths = [os.path.join(out_dir, f"track_{i+1:02}{_ext(options)}") for i in range(len(ranges))]
+    outputs = _export(path, ranges, paths, mix.audio_if_decoded, options, manifest=manifest)
+    curve = _curve(manifest, detector, mix)
+    if curve is None:
+        return outputs  # resumed: the previous run's plot stays
+
+    times, novelty = curve
+    fig = Figure(figsize=(14, 5))
+    ax = fig.add_subplot()
+    ax.plot(times, novelty, label="Novelty")
+    for start, _ in ranges[1:]:
+        ax.axvline(x=start / 1000, color='r', linestyle='--', alpha=0.5)
+    ax.set_title("Timbre and Harmony Changes Over Time")
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Novelty")
+    ax.grid(True)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(os.path.join(out_dir, "novelty_plot.png"))
+    return outputs
+
+
+TOOLS = {
+    "low-volume": low_volume_split,
+    "timestamps": timestamps,
+    "process": process,
+    "song-by-time": song_by_time,
+    "transition-energy": transition_energy,
+    "novelty": novelty_split,
+}
+
+
+# === JOBS ===
+def collect_jobs(source, recursive=False, timecuts=None):
+    """Mixes to run from a directory, a .txt list of paths or a .json manifest.
+
+    A JSON manifest is a list of paths or of `{"file": ..., "timecuts": ...,
+    "params": {...}}` objects; relative paths are taken from the manifest's folder.
+    Returns a list of `{"file", "timecuts", "params"}` dicts.
+    """
+    jobs = []
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            jobs += [{"file": os.path.join(root, name)} for name in sorted(files)
+                     if name.lower().endswith(AUDIO_EXTENSIONS)]
+            if not recursive:
+                break
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, "r", encoding="utf-8") as f:
+            if source.lower().endswith(".json"):
+                entries = json.load(f)
+            else:
+                entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        for entry in entries:
+            job = dict(entry) if isinstance(entry, dict) else {"file": entry}
+            job["file"] = os.path.join(base, job["file"])
+            if job.get("timecuts"):
+                job["timecuts"] = os.path.join(base, job["timecuts"])
+            jobs.append(job)
+
+    for job in jobs:
+        # A <mix>.json next to the mix beats the batch-wide timecut file
+        sibling = os.path.splitext(job["file"])[0] + ".json"
+        job.setdefault("timecuts", sibling if os.path.isfile(sibling) else timecuts)
+        job.setdefault("params", {})
+    return jobs
+
+
+def _output_dirs(jobs, output_dir):
+    """One output folder per mix, named after it (numbered if two mixes share a name)."""
+    dirs, used = [], set()
+    for job in jobs:
+        name = os.path.splitext(os.path.basename(job["file"]))[0]
+        candidate, n = name, 2
+        while candidate in used:
+            candidate, n = f"{name}_{n}", n + 1
+        used.add(candidate)
+        dirs.append(os.path.join(output_dir, candidate))
+    return dirs
+
+
+def run_job(tool, job, out_dir, options):
+    """Run one tool on one mix (in a pool process); returns the exported files and timing."""
+    started = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+    options = dict(options, timecuts=job.get("timecuts"), params={**options["params"], **job["params"]})
+    outputs = TOOLS[tool](job["file"], out_dir, options)
+    return {"outputs": outputs, "seconds": round(time.time() - started, 2)}
+
+
+def run_batch(tool, jobs, output_dir, options, processes=None, retries=DEFAULT_RETRIES):
+    """Run `jobs`, up to `processes` at a time, and return one report record per mix.
+
+    Every mix runs in a fresh process (a one-worker pool of its own), so a
+    crash or a leak in one cannot take down or slow the others. A mix whose
+    run raises, or whose process dies, is retried up to `retries` more times.
+    """
+    out_dirs = _output_dirs(jobs, output_dir)
+    records = [{"file": job["file"], "output_dir": out_dirs[i], "status": "pending", "attempts": 0}
+               for i, job in enumerate(jobs)]
+    todo, running = deque(range(len(jobs))), {}
+    while todo or running:
+        while todo and len(running) < (processes or os.cpu_count() or 1):
+            i = todo.popleft()
+            pool = ProcessPoolExecutor(max_workers=1)
+            running[pool.submit(run_job, tool, jobs[i], out_dirs[i], options)] = i, pool
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            i, pool = running.pop(future)
+            pool.shutdown(wait=True)
+            record = records[i]
+            record["attempts"] += 1
+            try:
+                record.update(future.result(), status="ok")
+                record.pop("error", None)
+                print(f"✅ {os.path.basename(record['file'])}: {len(record['outputs'])} "
+                      f"{'cue sheet' if options.get('virtual') else 'tracks'} in {record['seconds']}s")
+            except Exception as e:
+                record["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+                if record["attempts"] <= retries:
+                    print(f"🔁 {os.path.basename(record['file'])}: {record['error']} (retrying)")
+                    todo.append(i)
+                else:
+                    record["status"] = "failed"
+                    print(f"❌ {os.path.basename(record['file'])}: {record['error']}")
+    return records
+
+
+# === CLI ===
+def main(argv=None):
+    from encoder import EXPORT_FORMATS
+    parser = argparse.ArgumentParser(description="Run a DJ Helper tool over a folder or manifest of mixes.")
+    parser.add_argument("tool", choices=sorted(TOOLS))
+    parser.add_argument("source", help="folder of mixes, .txt list of paths, or .json manifest")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_DIR, help="one subfolder per mix is made here")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="mixes processed at once (default: CPU cores)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--recursive", action="store_true", help="also look in subfolders")
+    parser.add_argument("--timecuts", help="timecut JSON for song-by-time (like timecut_metadata.json)")
+    parser.add_argument("--reencode", action="store_true", help="re-encode instead of copying MP3 frames "
+                        "(implied by a --format other than mp3)")
+    parser.add_argument("--format", default="mp3", choices=list(EXPORT_FORMATS), help="format of re-encoded tracks")
+    parser.add_argument("--bitrate", help="bitrate of mp3/opus tracks, e.g. 192k (default: encoder default)")
+    parser.add_argument("--stream", action="store_true", help="analyse volume and onsets in blocks (flat memory)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="ignore split_manifest.json checkpoints: analyse and write every track again")
+    parser.add_argument("--virtual", action="store_true",
+                        help="write a .cue sheet and byte offsets into each mix instead of audio files")
+    parser.add_argument("--export-workers", type=int, default=1,
+                        help="tracks written in parallel per mix (default 1, the pool already fills the cores)")
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="tool parameter, same keys as the GUI (e.g. min_dbfs=-40)")
+    args = parser.parse_args(argv)
+
+    jobs = collect_jobs(args.source, args.recursive, args.timecuts)
+    if not jobs:
+        print(f"❌ No mixes found in {args.source}")
+        return 1
+    options = {
+        "lossless": not args.reencode,
+        "stream": args.stream,
+        "virtual": args.virtual,
+        "resume": not args.no_resume,
+        "format": args.format,
+        "bitrate": args.bitrate,
+        "workers": args.export_workers,
+        "params": dict(kv.split("=", 1) for kv in args.param),
+    }
+
+    print(f"🎛️ Running {args.tool} on {len(jobs)} mixes...")
+    started = time.time()
+    records = run_batch(args.tool, jobs, args.output, options, args.jobs, args.retries)
+
+    failed = [r for r in records if r["status"] != "ok"]
+    os.makedirs(args.output, exist_ok=True)
+    report_path = os.path.join(args.output, REPORT_FILE)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "tool": args.tool,
+            "seconds": round(time.time() - started, 2),
+            "succeeded": len(records) - len(failed),
+            "failed": len(failed),
+            "files": records,
+        }, f, indent=2, ensure_ascii=False)
+
+    print(f"\n📊 {len(records) - len(failed)}/{len(records)} mixes done in {time.time() - started:.1f}s, "
+          f"{sum(len(r.get('outputs', [])) for r in records)} "
+          f"{'cue sheets' if args.virtual else 'tracks'} written")
+    for record in failed:
+        print(f"  ❌ {record['file']}: {record['error']}")
+    print("📁 Report saved to:", report_path)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
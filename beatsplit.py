@@ -1,40 +1,46 @@
-import librosa
-import numpy as np
-from pydub import AudioSegment
 import os
+from cuesheet import write_virtual_split
+from encoder import extension
+from exporter import export_segments
+from featurecache import FeatureCache
+from segmentation import BeatGapDetector, MixFeatures, PhraseDetector
 
 # === CONFIGURATION ===
 AUDIO_FILE = "funeralmix.mp3"
-MIN_GAP_BETWEEN_BEATS = 0  # seconds — gap threshold to trigger split
+SPLIT_MODE = "phrase"  # "phrase": split where whole phrases change (tracks); "gap": after gaps between beats
+PHRASE_BARS = 16  # phrase mode: bars compared on each side of a boundary (8, 16 or 32)
+MIN_TRACK_SEC = 60  # phrase mode: no track shorter than this
+MIN_GAP_BETWEEN_BEATS = 0  # gap mode: seconds — gap threshold to trigger split (0 = every beat)
 OUTPUT_DIR = "beat_split_songs"
+LOSSLESS_EXPORT = True  # Copy MP3 frames instead of re-encoding each track
+EXPORT_WORKERS = None  # Tracks written in parallel (None = one per CPU core)
+EXPORT_FORMAT = "mp3"  # mp3, flac, opus or wav (anything but mp3 is re-encoded)
+EXPORT_BITRATE = None  # e.g. "320k" for mp3/opus (None = encoder default)
+STREAMING = False  # Compute onsets block by block from the file (flat memory for long mixes)
+VIRTUAL_SPLIT = False  # Write a .cue sheet and offsets into the mix instead of audio files
 
-# === STEP 1: DETECT BEATS ===
+# === STEP 1 & 2: DETECT BEATS AND FIND SPLIT POINTS (beats are cached per mix) ===
 print("🔍 Loading audio and detecting beats...")
-y, sr = librosa.load(AUDIO_FILE, sr=None)
-tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-beat_times = librosa.frames_to_time(beat_frames, sr=sr)
-
-# === STEP 2: FIND SPLIT POINTS ===
-split_times = [0.0]
-for i in range(1, len(beat_times)):
-    if beat_times[i] - beat_times[i - 1] >= MIN_GAP_BETWEEN_BEATS:
-        split_times.append(beat_times[i])
-split_times.append(len(y) / sr)
-
-# Convert seconds to milliseconds for pydub
-split_ms = [int(t * 1000) for t in split_times]
+mix = MixFeatures(AUDIO_FILE, FeatureCache(), STREAMING)
+if SPLIT_MODE == "phrase":
+    detector = PhraseDetector(PHRASE_BARS, min_track_sec=MIN_TRACK_SEC)
+else:
+    detector = BeatGapDetector(MIN_GAP_BETWEEN_BEATS)
+ranges = detector.ranges(mix)
+print(mix.summary())
 
 # === STEP 3: SPLIT AND EXPORT ===
-print(f"\n🎵 Splitting {AUDIO_FILE} into {len(split_ms) - 1} segments...")
-audio = AudioSegment.from_mp3(AUDIO_FILE)
+print(f"\n🎵 Splitting {AUDIO_FILE} into {len(ranges)} segments...")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-for i in range(len(split_ms) - 1):
-    start_ms = split_ms[i]
-    end_ms = split_ms[i+1]
-    segment = audio[start_ms:end_ms]
-    output_path = os.path.join(OUTPUT_DIR, f"track_{i+1:02}.mp3")
-    segment.export(output_path, format="mp3")
-    print(f"✅ Exported: track_{i+1:02}.mp3 ({start_ms//1000}s to {end_ms//1000}s)")
+if VIRTUAL_SPLIT:
+    cue_path, _ = write_virtual_split(AUDIO_FILE, ranges, OUTPUT_DIR)
+    print(f"📝 Cue sheet for {len(ranges)} tracks: {cue_path}")
+else:
+    paths = [os.path.join(OUTPUT_DIR, f"track_{i+1:02}{extension(EXPORT_FORMAT)}") for i in range(len(ranges))]
+    for i, start_ms, end_ms, _ in export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded,
+                                                  LOSSLESS_EXPORT, EXPORT_WORKERS, format=EXPORT_FORMAT,
+                                                  bitrate=EXPORT_BITRATE):
+        print(f"✅ Exported: track_{i+1:02}{extension(EXPORT_FORMAT)} ({start_ms//1000}s to {end_ms//1000}s)")
 
 print("\n✅ Done! All split tracks saved to:", OUTPUT_DIR)
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# === CONFIGURATION ===
+BENCH_DIR = "benchmark_mixes"  # generated mixes are kept here and reused
+RESULTS_DIR = "benchmark_results"
+LENGTHS = ["10m", "1h", "4h"]
+PIPELINES = ["audio_level", "low_volume", "low_volume_stream", "process", "timestamps",
+             "beat_split", "beat_split_stream", "transition_energy", "transition_energy_stream", "novelty", "novelty_stream",
+             "song_by_time"]
+SAMPLE_RATE = 44100
+SEED = 1234
+GAP_MS = 3000  # silence between songs: long and quiet enough for every volume-based tool
+BOUNDARY_TOLERANCE_MS = 5000  # a detected split further than this from any real one is a miss
+
+
+# === SYNTHETIC MIXES ===
+def parse_length(text):
+    """"10m" / "1h" / "90s" -> seconds."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    return int(float(text[:-1]) * units[text[-1]]) if text[-1] in units else int(text)
+
+
+def plan_mix(seconds, seed=SEED):
+    """Songs (start_ms, length_ms, bpm) filling `seconds`; neighbours differ by at least 12 BPM."""
+    rng = np.random.default_rng(seed)
+    songs, position, bpm = [], 0, 120
+    total_ms = seconds * 1000
+    while position < total_ms:
+        length = int(min(rng.uniform(150, 300) * 1000, total_ms - position))
+        bpm = float(rng.choice([b for b in range(90, 141, 2) if abs(b - bpm) >= 12]))
+        songs.append((position, length, bpm))
+        position += length + GAP_MS
+    return songs
+
+
+def song_block(t, bpm, rng):
+    """Stereo float samples for song-relative times `t` (s): a chord, kicks on the beat, some noise."""
+    beat = 60.0 / bpm
+    phase = np.mod(t, beat)
+    kick = np.exp(-phase * 30) * np.sin(2 * np.pi * 55 * phase)
+    chord = sum(np.sin(2 * np.pi * f * t) for f in (220.0, 277.2, 329.6)) / 3
+    mono = 0.35 * chord + 0.45 * kick + 0.02 * rng.standard_normal(len(t))
+    return np.stack([mono, 0.9 * mono], axis=1)
+
+
+def generate_mix(path, seconds, seed=SEED):
+    """Write a deterministic synthetic mix plus its known boundaries and a timecut JSON.
+
+    The audio is synthesized in 10 s blocks straight into an ffmpeg encoder, so
+    even the 4 hour mix never exists in memory.
+    """
+    from streaming import TrackEncoder
+    rng = np.random.default_rng(seed + 1)
+    songs = plan_mix(seconds, seed)
+    encoder = TrackEncoder(path, SAMPLE_RATE, 2)
+    block = 10 * SAMPLE_RATE
+    for start, length, bpm in songs:
+        frames = int(length * SAMPLE_RATE / 1000)
+        for offset in range(0, frames, block):
+            t = np.arange(offset, min(offset + block, frames)) / SAMPLE_RATE
+            encoder.write((song_block(t, bpm, rng) * 32767 * 0.5).astype(np.int16))
+        gap = int(min(GAP_MS, seconds * 1000 - start - length) * SAMPLE_RATE / 1000)
+        if gap > 0:
+            encoder.write((rng.standard_normal((gap, 2)) * 3).astype(np.int16))  # about -80 dBFS
+    encoder.finish_input()
+    encoder.wait()
+
+    base = os.path.splitext(path)[0]
+    with open(base + ".truth.json", "w", encoding="utf-8") as f:
+        json.dump({"seconds": seconds, "seed": seed,
+                   "songs": [{"start_ms": s, "length_ms": l, "bpm": b} for s, l, b in songs]}, f, indent=2)
+    with open(base + ".timecuts.json", "w", encoding="utf-8") as f:
+        json.dump([{"start_time": s / 60000, "artist": "Synthetic", "title": f"Song {i+1:02} ({b:.0f} BPM)"}
+                   for i, (s, _, b) in enumerate(songs)], f, indent=2)
+    return path
+
+
+def ensure_mix(length):
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f"synthetic_{length}.mp3")
+    if not os.path.exists(os.path.splitext(path)[0] + ".truth.json"):
+        print(f"🎛️ Generating {length} synthetic mix...")
+        generate_mix(path, parse_length(length))
+    return path
+
+
+# === PIPELINES (run inside a fresh child process) ===
+def run_pipeline(name, mix_path, out_dir, lossless):
+    """Run one tool end to end the way its script does; returns the ranges it produced."""
+    from exporter import export_segments, source_length_ms
+    from featurecache import FeatureCache
+    from segmentation import (LowVolumeDetector, MixFeatures, NoveltyDetector, PhraseDetector, SilenceDetector,
+                              TempoChangeDetector)
+
+    def export(ranges, audio):
+        paths = [os.path.join(out_dir, f"track_{i+1:03}.mp3") for i in range(len(ranges))]
+        for _ in export_segments(mix_path, ranges, paths, audio, lossless):
+            pass
+        return ranges
+
+    if name == "audio_level":
+        from overview import Overview, render
+        overview = Overview.load(mix_path, FeatureCache())
+        render(overview, 0, overview.duration, 1500, 500)
+        return []
+    if name == "low_volume_stream":
+        from streaming import stream_low_volume_split
+        splits = stream_low_volume_split(mix_path, lambda i: os.path.join(out_dir, f"track_{i+1:03}.mp3"),
+                                         lossless=lossless)
+        return [(start, end) for _, start, end, _ in splits]
+    if name == "song_by_time":
+        with open(os.path.splitext(mix_path)[0] + ".timecuts.json", "r", encoding="utf-8") as f:
+            starts = [int(entry["start_time"] * 60 * 1000) for entry in json.load(f)]
+        return export(list(zip(starts, starts[1:] + [source_length_ms(mix_path)])), None)
+
+    mix = MixFeatures(mix_path, FeatureCache(), stream=name.endswith("_stream"))
+    detector = {
+        "low_volume": LowVolumeDetector(),
+        "timestamps": LowVolumeDetector(),
+        "process": SilenceDetector(),
+        "beat_split": PhraseDetector(),
+        "beat_split_stream": PhraseDetector(),
+        "transition_energy": TempoChangeDetector(),
+        "transition_energy_stream": TempoChangeDetector(),
+        "novelty": NoveltyDetector(),
+        "novelty_stream": NoveltyDetector(),
+    }[name]
+    ranges = detector.ranges(mix)
+    return export(ranges, mix.audio_if_decoded)
+
+
+def child_main(name, mix_path, out_dir, lossless):
+    started = time.perf_counter()
+    ranges = run_pipeline(name, mix_path, out_dir, lossless)
+    seconds = time.perf_counter() - started
+    from profiling import peak_rss_mb
+    peak, children_peak = peak_rss_mb()
+    print(json.dumps({"seconds": round(seconds, 3), "peak_rss_mb": peak, "ffmpeg_peak_rss_mb": children_peak,
+                      "ranges": [[int(s), int(e)] for s, e in ranges]}))
+
+
+# === SCORING ===
+def boundary_score(ranges, truth):
+    """How well the detected splits match the real song starts."""
+    real = np.array([song["start_ms"] for song in truth["songs"][1:]])
+    found = np.array([start for start, _ in ranges[1:]])
+    if not len(real) or not len(found):
+        return {"found": int(len(found)), "expected": int(len(real))}
+    nearest = np.abs(found[:, None] - real[None, :]).min(axis=1)
+    missed = np.abs(real[:, None] - found[None, :]).min(axis=1) > BOUNDARY_TOLERANCE_MS
+    return {
+        "found": int(len(found)),
+        "expected": int(len(real)),
+        "median_error_ms": float(np.median(nearest)),
+        "false_splits": int((nearest > BOUNDARY_TOLERANCE_MS).sum()),
+        "missed_splits": int(missed.sum()),
+    }
+
+
+def run_one(name, mix_path, lossless, warm_cache=None):
+    """Time one pipeline in a fresh interpreter with an empty (or given) feature cache and no seek index."""
+    from mp3cut import INDEX_SUFFIX
+    out_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    cache_dir = warm_cache or tempfile.mkdtemp(prefix="bench_cache_")
+    if not warm_cache and INDEX_SUFFIX and os.path.exists(mix_path + INDEX_SUFFIX):
+        os.remove(mix_path + INDEX_SUFFIX)  # the MP3 seek index counts as cache too
+    env = dict(os.environ, DJHELPER_CACHE_DIR=cache_dir)
+    try:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, mix_path, out_dir,
+                               "lossless" if lossless else "reencode"],
+                              capture_output=True, text=True, env=env)
+        if proc.returncode:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        if not warm_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# === LOSSLESS CUT CHECK ===
+def cut_check_ranges(length_ms, frame_ms):
+    """Ranges covering mp3cut's edge cases: the first frame, starts and ends mid-frame, a range
+    barely longer than one frame and the last (partial) frame."""
+    middle = length_ms // 2
+    return [
+        (0, 1000),
+        (int(frame_ms * 3 + 7), int(frame_ms * 40 + 11)),
+        (middle + 3, middle + 3 + int(frame_ms * 1.5)),
+        (middle + int(frame_ms * 100) + 13, length_ms - int(frame_ms * 50) - 5),
+        (length_ms - int(frame_ms * 2.5), length_ms),
+    ]
+
+
+def verify_cuts(mix_path, ranges=None):
+    """Cut `ranges` losslessly and compare every cut, sample for sample, with the same slice of a full
+    decode (what a re-encode would start from). Returns the ranges that differ.
+
+    The slice is taken from the raw samples: past the last one, AudioSegment
+    slicing pads up to 2 ms of silence that no cut can contain.
+    """
+    from pydub import AudioSegment
+    from mp3cut import Mp3Cutter
+    full = AudioSegment.from_file(mix_path)
+    cutter = Mp3Cutter(mix_path)
+    out_dir = tempfile.mkdtemp(prefix="bench_cuts_")
+    failures = []
+    try:
+        ranges = ranges or cut_check_ranges(len(full), cutter.samples_per_frame * 1000 / cutter.sample_rate)
+        for i, (start, end) in enumerate(ranges):
+            out_path = os.path.join(out_dir, f"cut_{i+1:02}.mp3")
+            cutter.cut(start, end, out_path)
+            cut = AudioSegment.from_file(out_path)
+            expected = full.raw_data[int(start * full.frame_rate / 1000.0) * full.frame_width:
+                                     int(end * full.frame_rate / 1000.0) * full.frame_width]
+            if cut.raw_data == expected:
+                print(f"✅ {start}ms → {end}ms: {len(expected) // full.frame_width} samples match")
+            else:
+                print(f"❌ {start}ms → {end}ms: {int(cut.frame_count())} samples, expected "
+                      f"{len(expected) // full.frame_width}")
+                failures.append((start, end))
+    finally:
+        cutter.close()
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return failures
+
+
+def verify_wav_export(mix_path, seconds=60):
+    """Split a WAV copy of the mix's first `seconds` with the default lossless=True, with and without its
+    decode at hand (nothing to copy frames from, so every track is re-encoded). WAV tracks must equal the
+    slices exactly, MP3 tracks must have their length. Returns the exports that failed."""
+    from pydub import AudioSegment
+    from exporter import export_segments
+    out_dir = tempfile.mkdtemp(prefix="bench_wav_")
+    failures = []
+    try:
+        source = AudioSegment.from_file(mix_path)[:seconds * 1000]
+        wav_path = os.path.join(out_dir, "source.wav")
+        source.export(wav_path, format="wav")
+        ranges = [(0, 10007), (10007, 31500), (31500, len(source))]
+        for audio, label in ((source, "decoded"), (None, "streamed")):
+            for format in ("wav", "mp3"):
+                paths = [os.path.join(out_dir, f"{label}_{i+1:02}.{format}") for i in range(len(ranges))]
+                try:
+                    list(export_segments(wav_path, ranges, paths, audio, True, 1, format=format))
+                    tracks = [AudioSegment.from_file(path) for path in paths]
+                except Exception as e:
+                    print(f"❌ WAV source, {label}, {format}: {e!r}")
+                    failures.append((label, format))
+                    continue
+                if format == "wav":
+                    ok = all(t.raw_data == source[a:b].raw_data for t, (a, b) in zip(tracks, ranges))
+                else:
+                    ok = all(abs(len(t) - (b - a)) <= 1 for t, (a, b) in zip(tracks, ranges))
+                print(f"{'✅' if ok else '❌'} WAV source, {label}, {format}: {len(tracks)} tracks")
+                if not ok:
+                    failures.append((label, format))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return failures
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# === CLI ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile every tool on synthetic mixes.")
+    parser.add_argument("--lengths", nargs="+", default=LENGTHS, help="mix lengths, e.g. 10m 1h 4h")
+    parser.add_argument("--pipelines", nargs="+", default=PIPELINES, choices=PIPELINES)
+    parser.add_argument("--reencode", action="store_true", help="benchmark re-encoded instead of lossless export")
+    parser.add_argument("--warm", action="store_true", help="keep the feature cache between pipelines")
+    parser.add_argument("-o", "--output", help="results JSON (default: benchmark_results/<time>.json)")
+    parser.add_argument("--verify", action="store_true",
+                        help="only check that exports decode exactly like slices of the full decode "
+                             "(lossless MP3 cuts, WAV sources)")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        failures = []
+        for length in args.lengths:
+            print(f"🔍 Lossless cuts of the {length} mix...")
+            failures += verify_cuts(ensure_mix(length))
+            print(f"🔍 Exporting a WAV copy of the {length} mix...")
+            failures += verify_wav_export(ensure_mix(length))
+        print("\n✅ Every export matches" if not failures else f"\n❌ {len(failures)} export(s) differ")
+        return 1 if failures else 0
+
+    results = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "lossless": not args.reencode,
+        "warm_cache": args.warm,
+        "runs": [],
+    }
+    for length in args.lengths:
+        mix_path = ensure_mix(length)
+        with open(os.path.splitext(mix_path)[0] + ".truth.json", "r", encoding="utf-8") as f:
+            truth = json.load(f)
+        warm_cache = tempfile.mkdtemp(prefix="bench_cache_") if args.warm else None
+        for name in args.pipelines:
+            print(f"⏱️ {length} {name}...", end=" ", flush=True)
+            run = run_one(name, mix_path, not args.reencode, warm_cache)
+            ranges = run.pop("ranges", [])
+            run.update(length=length, mix_seconds=truth["seconds"], pipeline=name, segments=len(ranges))
+            if "error" not in run:
+                run["realtime_factor"] = round(truth["seconds"] / max(run["seconds"], 1e-9), 1)
+                if name != "audio_level":
+                    run["boundaries"] = boundary_score(ranges, truth)
+                print(f"{run['seconds']:.1f}s, {run['peak_rss_mb']} MB peak, {run['realtime_factor']}x realtime")
+            else:
+                print(f"❌ {run['error']}")
+            results["runs"].append(run)
+        if warm_cache:
+            shutil.rmtree(warm_cache, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print("\n📁 Results saved to:", output)
+    return 1 if any("error" in run for run in results["runs"]) else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _, _, name, mix_path, out_dir, mode = sys.argv
+        child_main(name, mix_path, out_dir, mode == "lossless")
+    else:
+        sys.exit(main())
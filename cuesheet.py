@@ -0,0 +1,125 @@
+import json
+import os
+import struct
+
+CUE_FRAMES_PER_SECOND = 75  # INDEX mm:ss:ff counts CD frames
+_CUE_FILE_TYPES = {".mp3": "MP3", ".aif": "AIFF", ".aiff": "AIFF"}  # anything else is WAVE to players
+
+
+def _wav_layout(path):
+    """`(data_offset, block_align, sample_rate)` of a RIFF/WAVE file, or None if it is not one."""
+    with open(path, "rb") as f:
+        if f.read(4) != b"RIFF" or f.read(8)[4:] != b"WAVE":
+            return None
+        block_align = sample_rate = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            kind, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if kind == b"fmt ":
+                fmt = f.read(size + size % 2)
+                sample_rate, block_align = struct.unpack("<I", fmt[4:8])[0], struct.unpack("<H", fmt[12:14])[0]
+            elif kind == b"data":
+                return (f.tell(), block_align, sample_rate) if block_align else None
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+
+
+def track_offsets(source_path, ranges):
+    """Sample and byte positions of each `(start_ms, end_ms)` range in the source file itself.
+
+    MP3 positions come from the seek index (see mp3cut.Mp3Cutter.seek_range):
+    decoding bytes `[byte_start, byte_end)` and dropping `skip_samples` lands
+    exactly on the track. WAV positions are plain sample offsets into the data
+    chunk. Other formats get sample positions only (byte fields are None).
+    """
+    tracks = []
+    if str(source_path).lower().endswith(".mp3"):
+        from mp3cut import Mp3Cutter
+        cutter = Mp3Cutter(source_path)
+        try:
+            for start, end in ranges:
+                byte_start, byte_end, skip = cutter.seek_range(start, end)
+                tracks.append({"start_ms": int(start), "end_ms": int(end),
+                               "start_sample": cutter.sample_at(start), "end_sample": cutter.sample_at(end),
+                               "byte_start": byte_start, "byte_end": byte_end, "skip_samples": skip})
+            sample_rate = cutter.sample_rate
+        finally:
+            cutter.close()
+    else:
+        layout = _wav_layout(source_path)
+        if layout:
+            data_offset, block_align, sample_rate = layout
+        else:
+            from pydub.utils import mediainfo
+            sample_rate = int(mediainfo(source_path)["sample_rate"])
+        for start, end in ranges:
+            # Same frame mapping as AudioSegment slicing
+            a, b = int(start * sample_rate / 1000.0), int(end * sample_rate / 1000.0)
+            tracks.append({"start_ms": int(start), "end_ms": int(end), "start_sample": a, "end_sample": b,
+                           "byte_start": data_offset + a * block_align if layout else None,
+                           "byte_end": data_offset + b * block_align if layout else None,
+                           "skip_samples": 0 if layout else None})
+    for track in tracks:
+        track["sample_rate"] = sample_rate
+    return tracks
+
+
+def _cue_text(text):
+    return str(text).replace('"', "'")
+
+
+def cue_time(ms):
+    """`mm:ss:ff` of a position, rounded down to a whole CD frame (minutes may pass 99)."""
+    frames = int(ms) * CUE_FRAMES_PER_SECOND // 1000
+    return f"{frames // (60 * CUE_FRAMES_PER_SECOND):02}:{frames // CUE_FRAMES_PER_SECOND % 60:02}:" \
+           f"{frames % CUE_FRAMES_PER_SECOND:02}"
+
+
+def cue_sheet(source_ref, tracks, title=None, performer=None):
+    """A cue sheet for `tracks` (dicts with start_ms and optional title/artist) in the file `source_ref`."""
+    lines = []
+    if performer:
+        lines.append(f'PERFORMER "{_cue_text(performer)}"')
+    if title:
+        lines.append(f'TITLE "{_cue_text(title)}"')
+    file_type = _CUE_FILE_TYPES.get(os.path.splitext(source_ref)[1].lower(), "WAVE")
+    lines.append(f'FILE "{_cue_text(source_ref)}" {file_type}')
+    for i, track in enumerate(tracks):
+        lines.append(f"  TRACK {i + 1:02} AUDIO")
+        lines.append(f'    TITLE "{_cue_text(track.get("title") or f"Track {i + 1:02}")}"')
+        if track.get("artist"):
+            lines.append(f'    PERFORMER "{_cue_text(track["artist"])}"')
+        lines.append(f"    INDEX 01 {cue_time(track['start_ms'])}")
+    return "\n".join(lines) + "\n"
+
+
+def write_virtual_split(source_path, ranges, out_dir, tracks=None, performer=None):
+    """Describe a split instead of writing it: a `.cue` sheet plus an extended `split_timestamps.json`.
+
+    `tracks` are the tool's own per-track metadata dicts (artist, title,
+    start_sec...), extended with the positions from `track_offsets`. No
+    audio is written; the cue sheet points at the original mix. Returns
+    `(cue_path, tracks)`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    try:
+        source_ref = os.path.relpath(source_path, out_dir)
+    except ValueError:
+        source_ref = os.path.abspath(source_path)  # another drive on Windows
+    records = []
+    for i, (offsets, (start, end)) in enumerate(zip(track_offsets(source_path, ranges), ranges)):
+        record = {"track": i + 1, "start_sec": start // 1000, "end_sec": end // 1000,
+                  "duration_sec": (end - start) // 1000}
+        record.update({k: v for k, v in (tracks[i] if tracks else {}).items() if k != "filename"})
+        record.update(offsets, source=os.path.abspath(source_path))
+        records.append(record)
+
+    cue_path = os.path.join(out_dir, name + ".cue")
+    with open(cue_path, "w", encoding="utf-8") as f:
+        f.write(cue_sheet(source_ref, records, title=name, performer=performer))
+    with open(os.path.join(out_dir, "split_timestamps.json"), "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    return cue_path, records
@@ -0,0 +1,155 @@
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+from envelope import sum_of_squares, samples_of
+
+
+class SegmentView:
+    """A stretch of decoded int16 PCM that slices, measures and exports without copying samples.
+
+    Millisecond positions map to frames exactly like AudioSegment slicing, so
+    `view[a:b]` covers the same samples as `audio[a:b]`; every slice is just
+    another NumPy view over the one decoded buffer.
+    """
+
+    __slots__ = ("pcm", "frame_rate")
+
+    def __init__(self, pcm, frame_rate):
+        self.pcm = pcm  # (frames, channels) int16
+        self.frame_rate = frame_rate
+
+    def __len__(self):
+        return round(len(self.pcm) * 1000 / self.frame_rate)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            key = slice(key, key + 1)
+        a, b = self._frames(key.start, key.stop)
+        return SegmentView(self.pcm[a:b], self.frame_rate)
+
+    def _frames(self, start, end):
+        """Frame bounds of `[start, end)` ms, clamped to the view like AudioSegment slicing."""
+        length = len(self)
+        start = min(start if start is not None else 0, length)
+        end = min(end if end is not None else length, length)
+        return int(start * self.frame_rate / 1000.0), int(end * self.frame_rate / 1000.0)
+
+    @property
+    def channels(self):
+        return self.pcm.shape[1]
+
+    @property
+    def duration_seconds(self):
+        return len(self.pcm) / self.frame_rate
+
+    @property
+    def raw_data(self):
+        """The interleaved PCM bytes as a memoryview (what an encoder's stdin takes)."""
+        return np.ascontiguousarray(self.pcm).data
+
+    @property
+    def rms(self):
+        """`audioop.rms` of the samples, like `AudioSegment.rms`."""
+        count = self.pcm.size
+        return int(np.sqrt(sum_of_squares(self.pcm.reshape(-1)) / count)) if count else 0
+
+    @property
+    def dBFS(self):
+        rms = self.rms
+        return 20 * np.log10(rms / 32768.0) if rms else -float("inf")
+
+    def export(self, out_path, format="mp3", bitrate=None):
+        """Encode straight from the buffer through an ffmpeg pipe (no slice copy, no temp WAV)."""
+        return self.export_many([(None, None, out_path)], format, bitrate)[0]
+
+    def export_many(self, segments, format="mp3", bitrate=None):
+        """Export several `(start_ms, end_ms, out_path)` slices with one ffmpeg process.
+
+        Only the stretch of the buffer the slices cover is piped, once; each
+        file is identical to `view[start_ms:end_ms].export(out_path)`.
+        """
+        from encoder import encode_pcm
+        frames = [self._frames(start, end) for start, end, _ in segments]
+        first = min(a for a, _ in frames)
+        last = max(max(b for _, b in frames), first)
+        return encode_pcm(self.pcm[first:last], self.frame_rate,
+                          [(a - first, b - first, out_path) for (a, b), (_, _, out_path) in zip(frames, segments)],
+                          format, bitrate)
+
+
+class DecodedAudio:
+    """A single decode of an audio file shared by librosa analysis and pydub export.
+
+    `audio` is the pydub AudioSegment used for slicing/exporting, `pcm` is an
+    int16 (frames, channels) view over the very same bytes, and `float32()`
+    is the mono signal librosa expects, derived once from that buffer.
+    """
+
+    def __init__(self, audio, decode_seconds=0.0):
+        if audio.sample_width != 2:
+            audio = audio.set_sample_width(2)
+        self.audio = audio
+        self.decode_seconds = decode_seconds
+        self._mono = None
+
+    @classmethod
+    def load(cls, path):
+        started = time.perf_counter()
+        audio = AudioSegment.from_file(path)
+        return cls(audio, time.perf_counter() - started)
+
+    @property
+    def sr(self):
+        return self.audio.frame_rate
+
+    @property
+    def channels(self):
+        return self.audio.channels
+
+    @property
+    def pcm(self):
+        return samples_of(self.audio).reshape(-1, self.channels)
+
+    def view(self):
+        """The whole decode as a SegmentView, to slice and export without copies."""
+        return SegmentView(self.pcm, self.sr)
+
+    @property
+    def frame_count(self):
+        return len(self.audio.raw_data) // self.audio.frame_width
+
+    @property
+    def duration(self):
+        return self.frame_count / self.sr
+
+    def float32(self):
+        """Mono float32 samples in [-1, 1), as `librosa.load(path, sr=None)` gives."""
+        if self._mono is None:
+            pcm = self.pcm
+            if self.channels == 1:
+                mono = pcm[:, 0].astype(np.float32)
+            else:
+                mono = pcm.mean(axis=1, dtype=np.float32)
+            mono *= 1.0 / 32768
+            self._mono = mono
+        return self._mono
+
+    def savings(self):
+        """What the old decode-twice pipeline spent on top of this one.
+
+        librosa.load ran ffmpeg a second time and materialized every channel
+        as float32 before mixing down to mono.
+        """
+        return {
+            "decode_seconds_saved": self.decode_seconds,
+            "peak_bytes_saved": self.frame_count * self.channels * 4,
+        }
+
+    def summary(self):
+        saved = self.savings()
+        return (f"Decoded once in {self.decode_seconds:.1f}s "
+                f"({len(self.audio.raw_data) / 2**20:.0f} MB PCM); "
+                f"skipped a second decode (~{saved['decode_seconds_saved']:.1f}s, "
+                f"~{saved['peak_bytes_saved'] / 2**20:.0f} MB peak)")
@@ -0,0 +1,92 @@
+import subprocess
+
+import numpy as np
+from pydub import AudioSegment
+
+# === EXPORT SETTINGS ===
+EXPORT_FORMATS = {  # format: (ffmpeg encoder, muxer, file extension)
+    "mp3": ("libmp3lame", "mp3", ".mp3"),
+    "flac": ("flac", "flac", ".flac"),
+    "opus": ("libopus", "opus", ".opus"),
+    "wav": ("pcm_s16le", "wav", ".wav"),
+}
+LOSSY_FORMATS = ("mp3", "opus")  # the ones a bitrate applies to
+BATCH_SEGMENTS = 16  # segments one ffmpeg process encodes
+BATCH_MAX_GAP_MS = 10000  # unused audio a batch may pipe through between two of its segments
+
+
+def extension(format="mp3"):
+    """File extension (with the dot) of an export format."""
+    return _format(format)[2]
+
+
+def _format(format):
+    try:
+        return EXPORT_FORMATS[format]
+    except KeyError:
+        raise ValueError(f"Unknown export format {format!r}; choose from {', '.join(EXPORT_FORMATS)}") from None
+
+
+def output_args(format="mp3", bitrate=None):
+    """ffmpeg output options for `format`; `bitrate` ("192k") only applies to the lossy formats.
+
+    Without a bitrate ffmpeg's defaults are kept (128 kbps CBR for MP3, as
+    pydub's export always produced).
+    """
+    codec, muxer, _ = _format(format)
+    args = ["-c:a", codec]
+    if format == "flac":
+        args += ["-sample_fmt", "s16"]  # 16-bit like the decode, even from a float MP3 decode
+    if bitrate and format in LOSSY_FORMATS:
+        args += ["-b:a", str(bitrate)]
+    return args + ["-f", muxer]
+
+
+def batches(ranges, size=BATCH_SEGMENTS, max_gap_ms=BATCH_MAX_GAP_MS):
+    """Group range indices into runs one encoder process can take.
+
+    A run holds at most `size` ranges that follow each other in the mix with
+    no more than `max_gap_ms` between them, so the audio piped to its
+    process is little more than the segments it writes.
+    """
+    groups = []
+    for i, (start, end) in enumerate(ranges):
+        if groups and len(groups[-1]) < size:
+            prev_start, prev_end = ranges[groups[-1][-1]]
+            if start >= prev_start and start - max(prev_end, prev_start) <= max_gap_ms:
+                groups[-1].append(i)
+                continue
+        groups.append([i])
+    return groups
+
+
+def encode_batch(input_args, data, segments, format="mp3", bitrate=None):
+    """Encode several segments of one input with a single ffmpeg process.
+
+    `data` (any bytes-like object) is piped in once, read as `input_args`
+    describe it. Each `(start_sample, end_sample, out_path)` is cut from the
+    decoded input with atrim, sample exact, and encoded to its own file, so
+    the files are the same as one encoder process per segment would write.
+    Returns the output paths.
+    """
+    labels = [f"[s{i}]" for i in range(len(segments))] if len(segments) > 1 else ["[0:a]"]
+    graph = [f"[0:a]asplit={len(segments)}{''.join(labels)}"] if len(segments) > 1 else []
+    graph += [f"{label}atrim=start_sample={start}:end_sample={max(end, start)},asetpts=PTS-STARTPTS[o{i}]"
+              for i, (label, (start, end, _)) in enumerate(zip(labels, segments))]
+    command = [AudioSegment.converter, "-v", "error", "-y"] + input_args + ["-i", "-",
+                                                                          "-filter_complex", ";".join(graph)]
+    for i, (_, _, out_path) in enumerate(segments):
+        command += ["-map", f"[o{i}]"] + output_args(format, bitrate) + [out_path]
+    proc = subprocess.run(command, input=data, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode:
+        raise RuntimeError(f"ffmpeg could not encode {segments[0][2]}"
+                           f"{f' (+{len(segments) - 1} more)' if len(segments) > 1 else ''}: "
+                           f"{proc.stderr.decode(errors='replace')}")
+    return [out_path for _, _, out_path in segments]
+
+
+def encode_pcm(pcm, sample_rate, segments, format="mp3", bitrate=None):
+    """`encode_batch` for int16 (frames, channels) PCM; segment bounds are frames into `pcm`."""
+    data = np.ascontiguousarray(pcm).data.cast("B")  # a view when pcm is a row slice of the decode
+    input_args = ["-f", "s16le", "-ar", str(sample_rate), "-ac", str(pcm.shape[1])]
+    return encode_batch(input_args, data, segments, format, bitrate)
@@ -0,0 +1,147 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pydub import AudioSegment
+
+from decoded import DecodedAudio
+from encoder import BATCH_SEGMENTS, batches
+from manifest import encoding_key
+from mp3cut import Mp3Cutter
+from streaming import stream_export
+
+# Encoder processes running at once; each re-encodes a batch of neighbouring segments
+EXPORT_WORKERS = int(os.environ.get("DJHELPER_EXPORT_WORKERS", os.cpu_count() or 1))
+
+
+def export_segments(source_path, ranges, out_paths, audio=None, lossless=True, workers=None, profile=None,
+                    format="mp3", bitrate=None, manifest=None):
+    """Write each `(start_ms, end_ms)` range of the source to the matching output path.
+
+    With `lossless`, an MP3 source and MP3 output the frames are copied
+    straight from the file (see mp3cut), otherwise views of `audio` are piped
+    into ffmpeg (see decoded.SegmentView), so no slice of the mix is ever
+    copied. Without `audio`, an MP3 source is re-encoded from just the frames
+    the ranges need (found through its saved seek index), ordered ranges of
+    other formats are encoded while streaming the decode (see streaming) and
+    anything else decodes the source first. Re-encodes go to `format` (see
+    encoder.EXPORT_FORMATS) at `bitrate`.
+
+    Neighbouring segments are re-encoded in batches by one long-lived ffmpeg
+    process each (see encoder.batches), so a split into thousands of beats
+    does not pay for thousands of process starts. Up to `workers` batches
+    are written concurrently (threads driving ffmpeg or frame copies, so no
+    PCM is pickled between processes), and only twice that many are in
+    flight at a time, which bounds the memory they use.
+    Yields `(index, start_ms, end_ms, out_path)` in track order as segments finish.
+    Each segment's write time (its share of the batch) and size go to
+    `profile` (a RunProfile) if given.
+
+    With a `manifest` (manifest.SplitManifest), segments it already records
+    as written the same way are yielded in their place without being written
+    again, and every other one is recorded in it as it finishes (the
+    manifest is saved every few segments and once the export stops).
+    """
+    workers = max(1, workers or EXPORT_WORKERS)
+    # Frames can only be copied from an MP3 into an MP3; everything else is re-encoded
+    lossless = lossless and format == "mp3" and str(source_path).lower().endswith(".mp3")
+    encoding = encoding_key(format, bitrate, lossless)
+    written = deque()
+    if manifest is not None:
+        written.extend(i for i in range(len(ranges))
+                       if manifest.done(ranges[i][0], ranges[i][1], out_paths[i], encoding))
+    todo = sorted(set(range(len(ranges))) - set(written))
+
+    def kept(before):
+        """The already written segments ahead of index `before`, in their place in the output."""
+        while written and written[0] < before:
+            i = written.popleft()
+            yield i, ranges[i][0], ranges[i][1], out_paths[i]
+
+    results = _write(source_path, ranges, out_paths, todo, audio, lossless, workers, profile, format, bitrate)
+    try:
+        for result in results:
+            yield from kept(result[0])
+            if manifest is not None:
+                manifest.finish(result[1], result[2], result[3], encoding)
+            yield result
+        yield from kept(len(ranges))
+    finally:
+        results.close()
+        if manifest is not None:
+            manifest.save()
+
+
+def _write(source_path, ranges, out_paths, todo, audio, lossless, workers, profile, format, bitrate):
+    """Write the `todo` indices for export_segments; yields their results in index order."""
+    cutter = None
+    if str(source_path).lower().endswith(".mp3") and (lossless or audio is None):
+        cutter = Mp3Cutter(source_path)
+    elif audio is None and todo:
+        if all(ranges[i][1] <= ranges[j][0] for i, j in zip(todo, todo[1:])):
+            # Never decoded in memory: encode while decoding, with flat memory use
+            exported = ((todo[j], start, end, out_path) for j, start, end, out_path in
+                        stream_export(source_path, [ranges[i] for i in todo], [out_paths[i] for i in todo],
+                                      format, bitrate))
+            yield from profile.timed(exported) if profile else exported
+            return
+        audio = AudioSegment.from_file(source_path)
+    view = DecodedAudio(audio).view() if audio is not None and not cutter else None
+
+    def write(batch):
+        started = time.perf_counter()
+        segments = [(ranges[i][0], ranges[i][1], out_paths[i]) for i in batch]
+        if lossless:
+            for start, end, out_path in segments:
+                cutter.cut(start, end, out_path)
+        elif cutter:
+            cutter.transcode_many(segments, format, bitrate)
+        else:
+            view.export_many(segments, format, bitrate)
+        seconds = (time.perf_counter() - started) / len(batch)
+        if profile:
+            for i in batch:
+                profile.segment(i, ranges[i][0], ranges[i][1], seconds, out_paths[i])
+        return [(i, ranges[i][0], ranges[i][1], out_paths[i]) for i in batch]
+
+    # Small enough that every worker gets a share of a short list of songs
+    size = 1 if lossless else max(1, min(BATCH_SEGMENTS, -(-len(todo) // workers)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for group in batches([ranges[i] for i in todo], size):
+            pending.append(pool.submit(write, [todo[j] for j in group]))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Stopping early (an error, or the caller closing us) drops queued segments
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+        if cutter:
+            cutter.close()
+
+
+def source_length_ms(source_path, audio=None):
+    """Length of the source in ms, without decoding it.
+
+    MP3 lengths come from the frame index (exactly what pydub would decode);
+    other formats from ffprobe's duration, the same probe streaming.pcm_blocks
+    makes, so the last track simply ends where the decode does.
+    """
+    if audio is not None:
+        return len(audio)
+    if str(source_path).lower().endswith(".mp3"):
+        cutter = Mp3Cutter(source_path)
+        try:
+            return cutter.duration_ms
+        finally:
+            cutter.close()
+    from pydub.utils import mediainfo
+    duration = mediainfo(source_path).get("duration")
+    if duration:
+        return round(float(duration) * 1000)
+    return len(AudioSegment.from_file(source_path))  # no duration in the container: only a decode can tell
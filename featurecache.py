@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Where analysis results live between runs (override with DJHELPER_CACHE_DIR)
+CACHE_DIR = os.environ.get("DJHELPER_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".djhelper_cache"))
+MAX_CACHE_BYTES = 1 << 30  # least recently used entries are dropped past 1 GB
+
+HASH_BLOCK_BYTES = 1 << 20
+_HASH_INDEX = "hashes.json"
+
+
+class FeatureCache:
+    """On-disk `.npz` store of analysis features keyed by audio content + parameters.
+
+    Entries are named after a hash of the file contents, the feature kind and
+    the analysis parameters, so renaming a mix keeps its cache while any
+    parameter change (sr, hop_length, chunk_ms...) gets its own entry.
+    Thresholds applied after analysis are deliberately not part of the key.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def file_hash(self, path):
+        """SHA-1 of the file contents, remembered per (path, size, mtime)."""
+        stat = os.stat(path)
+        stamp = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        index_path = os.path.join(self.cache_dir, _HASH_INDEX)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        if stamp in index:
+            return index[stamp]
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        index[stamp] = digest.hexdigest()
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"  # batch runs write from several processes
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+        return index[stamp]
+
+    def entry_path(self, path, kind, **params):
+        key = json.dumps({"file": self.file_hash(path), "kind": kind, "params": params},
+                         sort_keys=True, default=str)
+        name = f"{kind}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.npz"
+        return os.path.join(self.cache_dir, name)
+
+    def get(self, path, kind, **params):
+        """Cached arrays for `kind` as a dict, or None on a miss."""
+        entry = self.entry_path(path, kind, **params)
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                features = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        os.utime(entry)  # mark as recently used
+        return features
+
+    def put(self, path, kind, features, **params):
+        """Store a dict of arrays/scalars for `kind` and return it as loaded arrays."""
+        entry = self.entry_path(path, kind, **params)
+        features = {name: np.asarray(value) for name, value in features.items()}
+        tmp_path = entry[:-len(".npz")] + f".{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **features)
+        os.replace(tmp_path, entry)
+        self.evict()
+        return features
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz") and not name.endswith(".tmp.npz"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass  # another run evicted it first
+            total -= size
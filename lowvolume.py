@@ -1,48 +1,62 @@
-from pydub import AudioSegment
 import os
+from cuesheet import write_virtual_split
+from encoder import extension
+from exporter import export_segments
+from featurecache import FeatureCache
+from manifest import SplitManifest, encoding_key
+from segmentation import LowVolumeDetector, MixFeatures
+from streaming import stream_low_volume_split
 
 # Settings
 MIN_PAUSE_DBFS = -35          # Threshold: anything below this dBFS is considered a pause
 PAUSE_DURATION_MS = 2000       # How long the low-volume needs to last (e.g. 2 seconds)
 CHUNK_SIZE_MS = 100            # Window size for checking volume
 MIN_SONG_LENGTH_MS = 10000     # Minimum duration of a song (10 seconds)
-
-# Load audio
-audio = AudioSegment.from_mp3("funeralmix.mp3")
-length = len(audio)
-
-# Track low-volume regions
-potential_splits = []
-current_silence = 0
-
-for i in range(0, length, CHUNK_SIZE_MS):
-    chunk = audio[i:i + CHUNK_SIZE_MS]
-    if chunk.dBFS < MIN_PAUSE_DBFS:
-        current_silence += CHUNK_SIZE_MS
-        if current_silence >= PAUSE_DURATION_MS:
-            potential_splits.append(i)
-            current_silence = 0  # reset
-    else:
-        current_silence = 0
-
-# Deduplicate splits and make sure they are spaced
-clean_splits = []
-prev_split = 0
-for split in potential_splits:
-    if split - prev_split >= MIN_SONG_LENGTH_MS:
-        clean_splits.append(split)
-        prev_split = split
-
-# Always include start and end
-split_points = [0] + clean_splits + [length]
-
-# Export
+REFINE_SPLITS = True           # Move each cut to the quietest millisecond of its pause (not when streaming)
+LOSSLESS_EXPORT = True         # Copy MP3 frames instead of re-encoding each song
+EXPORT_WORKERS = None          # Tracks written in parallel (None = one per CPU core)
+EXPORT_FORMAT = "mp3"          # mp3, flac, opus or wav (anything but mp3 is re-encoded)
+EXPORT_BITRATE = None          # e.g. "320k" for mp3/opus (None = encoder default)
+STREAMING = False              # Decode in blocks and write each song as soon as it ends (flat memory)
+VIRTUAL_SPLIT = False          # Write a .cue sheet and offsets into the mix instead of audio files
+RESUME = True                  # Reuse boundaries and skip finished songs of an earlier run (split_manifest.json)
+
+AUDIO_FILE = "funeralmix.mp3"
 output_folder = "volume_split_songs"
 os.makedirs(output_folder, exist_ok=True)
 
-for i in range(len(split_points) - 1):
-    start = split_points[i]
-    end = split_points[i+1]
-    segment = audio[start:end]
-    segment.export(os.path.join(output_folder, f"song_{i+1}.mp3"), format="mp3")
-    print(f"Exported song_{i+1}.mp3 from {start//1000}s to {end//1000}s")
+manifest = None
+if RESUME and not VIRTUAL_SPLIT:
+    # Checkpoint of this run; a rerun (after a crash or a tweak) only redoes what is missing or changed
+    manifest = SplitManifest(output_folder, AUDIO_FILE, "low_volume", {
+        "min_dbfs": MIN_PAUSE_DBFS, "pause_ms": PAUSE_DURATION_MS, "chunk_ms": CHUNK_SIZE_MS,
+        "min_song_ms": MIN_SONG_LENGTH_MS, "refine": REFINE_SPLITS and not STREAMING})
+
+if STREAMING and not VIRTUAL_SPLIT and (manifest is None or manifest.ranges is None):
+    # One pass over an ffmpeg pipe; memory stays constant however long the mix is
+    song_path = lambda i: os.path.join(output_folder, f"song_{i+1}{extension(EXPORT_FORMAT)}")
+    exported = stream_low_volume_split(AUDIO_FILE, song_path, MIN_PAUSE_DBFS, PAUSE_DURATION_MS, CHUNK_SIZE_MS,
+                                       MIN_SONG_LENGTH_MS, LOSSLESS_EXPORT, EXPORT_FORMAT, EXPORT_BITRATE)
+    if manifest:
+        exported = manifest.checkpoint(exported, encoding_key(EXPORT_FORMAT, EXPORT_BITRATE, LOSSLESS_EXPORT))
+    for i, start, end, _ in exported:
+        print(f"Exported song_{i+1}{extension(EXPORT_FORMAT)} from {start//1000}s to {end//1000}s")
+else:
+    # Load audio (the volume envelope is reused from the cache on re-runs)
+    mix = MixFeatures(AUDIO_FILE, FeatureCache(), STREAMING)
+
+    # Split after each low-volume run, keeping songs at least MIN_SONG_LENGTH_MS apart
+    detector = LowVolumeDetector(MIN_PAUSE_DBFS, PAUSE_DURATION_MS, CHUNK_SIZE_MS, MIN_SONG_LENGTH_MS,
+                                 REFINE_SPLITS)
+    ranges = manifest.boundaries(lambda: detector.ranges(mix)) if manifest else detector.ranges(mix)
+
+    # Export (or only describe the split)
+    if VIRTUAL_SPLIT:
+        cue_path, _ = write_virtual_split(AUDIO_FILE, ranges, output_folder)
+        print(f"Cue sheet for {len(ranges)} songs: {cue_path}")
+    else:
+        paths = [os.path.join(output_folder, f"song_{i+1}{extension(EXPORT_FORMAT)}") for i in range(len(ranges))]
+        for i, start, end, _ in export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded,
+                                                LOSSLESS_EXPORT, EXPORT_WORKERS, format=EXPORT_FORMAT,
+                                                bitrate=EXPORT_BITRATE, manifest=manifest):
+            print(f"Exported song_{i+1}{extension(EXPORT_FORMAT)} from {start//1000}s to {end//1000}s")
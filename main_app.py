@@ -1,6 +1,15 @@
+import queue
+import threading
+
 import customtkinter as ctk
 from tkinter import filedialog
 
+POLL_MS = 100  # how often the UI picks up log lines and progress from a running tool
+
+
+class RunCancelled(Exception):
+    """Raised on the worker thread when Cancel was pressed."""
+
 
 # --- Tool Frame Example ---
 
@@ -47,7 +56,12 @@ class ToolFrame(ctk.CTkFrame):
             self.time_entry.pack(pady=2)
 
         self.run_btn = ctk.CTkButton(main_tab, text="Run", command=self.run_tool)
-        self.run_btn.pack(pady=10)
+        self.run_btn.pack(pady=(10, 2))
+        self.cancel_btn = ctk.CTkButton(main_tab, text="Cancel", command=self.cancel_run, state="disabled")
+        self.cancel_btn.pack(pady=2)
+        self.progress = ctk.CTkProgressBar(main_tab, width=350)
+        self.progress.set(0)
+        self.progress.pack(pady=4)
 
         self.result_text = ctk.CTkTextbox(main_tab, height=120, width=500)
         self.result_text.pack(pady=10)
@@ -59,6 +73,40 @@ class ToolFrame(ctk.CTkFrame):
         self.param_var = ctk.StringVar()
         self.param_entry = ctk.CTkEntry(adv_tab, textvariable=self.param_var, width=350)
         self.param_entry.pack(pady=2)
+        self.lossless_var = ctk.BooleanVar(value=True)
+        self.lossless_check = ctk.CTkCheckBox(adv_tab, text="Lossless MP3 cut (no re-encode, MP3 output only)",
+                                              variable=self.lossless_var)
+        self.lossless_check.pack(pady=2)
+        self.stream_var = ctk.BooleanVar(value=False)
+        self.stream_check = ctk.CTkCheckBox(adv_tab, text="Stream decode (flat memory for long mixes)", variable=self.stream_var)
+        self.stream_check.pack(pady=2)
+        self.virtual_var = ctk.BooleanVar(value=False)
+        self.virtual_check = ctk.CTkCheckBox(adv_tab, text="Virtual split (.cue sheet + offsets, no audio files)",
+                                             variable=self.virtual_var)
+        self.virtual_check.pack(pady=2)
+        self.workers_label = ctk.CTkLabel(adv_tab, text="Export workers (blank = one per CPU core):")
+        self.workers_label.pack(pady=2)
+        self.workers_var = ctk.StringVar()
+        self.workers_entry = ctk.CTkEntry(adv_tab, textvariable=self.workers_var, width=80)
+        self.workers_entry.pack(pady=2)
+        self.format_label = ctk.CTkLabel(adv_tab, text="Export format and bitrate (blank = encoder default):")
+        self.format_label.pack(pady=2)
+        from encoder import EXPORT_FORMATS
+        self.format_var = ctk.StringVar(value="mp3")
+        self.format_menu = ctk.CTkOptionMenu(adv_tab, values=list(EXPORT_FORMATS), variable=self.format_var,
+                                             width=80)
+        self.format_menu.pack(pady=2)
+        self.bitrate_var = ctk.StringVar()
+        self.bitrate_entry = ctk.CTkEntry(adv_tab, textvariable=self.bitrate_var, width=80,
+                                          placeholder_text="e.g. 192k")
+        self.bitrate_entry.pack(pady=2)
+
+        # Tools run on a worker thread that only talks to the UI through this queue
+        self._events = queue.Queue()
+        self._cancel = threading.Event()
+        self._worker = None
+        self._poll_id = None
+        self._plot_tab = None  # added the first time a tool has something to plot
 
     def browse_input(self):
         file = filedialog.askopenfilename()
@@ -71,79 +119,215 @@ class ToolFrame(ctk.CTkFrame):
             self.output_var.set(folder)
 
     def run_tool(self):
-        import traceback
-        import os
+        if self._worker and self._worker.is_alive():
+            return  # one run per tool at a time; Cancel stops the current one
         self.result_text.configure(state="normal")
         self.result_text.delete("1.0", "end")
-        tool = getattr(self, 'tool_name', None)
+        self.result_text.configure(state="disabled")
         tool_name = getattr(self, 'tool_name', self.__class__.__name__)
-        # Get input/output/params
+        # Get input/output/params (Tk variables can only be read on this thread)
         input_path = self.input_var.get().strip()
         output_path = self.output_var.get().strip()
         params = self.param_var.get().strip()
-        result_lines = []
+        lossless = self.lossless_var.get()
+        stream = self.stream_var.get()
+        virtual = self.virtual_var.get()
+        workers = self.workers_var.get().strip()
+        workers = int(workers) if workers.isdigit() else None
+        time_text = self.time_var.get().strip() if hasattr(self, 'time_var') else None
+        export_format = self.format_var.get()
+        bitrate = self.bitrate_var.get().strip() or None
+
+        self._cancel = threading.Event()
+        self.run_btn.configure(state="disabled")
+        self.cancel_btn.configure(state="normal")
+        self.progress.configure(mode="indeterminate")
+        self.progress.start()
+        self._worker = threading.Thread(
+            target=self._run_tool,
+            args=(tool_name, input_path, output_path, params, lossless, workers, stream, time_text,
+                  export_format, bitrate, virtual),
+            daemon=True)
+        self._worker.start()
+        self._poll_id = self.after(POLL_MS, self._poll)
+
+    def cancel_run(self):
+        self._cancel.set()
+        self.cancel_btn.configure(state="disabled")
+        self._log("Cancelling after the current segment...")
+
+    def destroy(self):
+        # Leaving the tool stops its run; the worker thread exits at its next check
+        self._cancel.set()
+        if self._poll_id:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        super().destroy()
+
+    def _log(self, line):
+        self._events.put(("log", line))
+
+    def _call(self, func):
+        """Run `func` on the UI thread (matplotlib windows must be opened there)."""
+        self._events.put(("call", func))
+
+    def _check_cancelled(self):
+        if self._cancel.is_set():
+            raise RunCancelled()
+
+    def _segments(self, exported, total=None):
+        """Pass export results through, reporting progress and stopping on Cancel."""
+        try:
+            for done, segment in enumerate(exported, 1):
+                yield segment
+                if total:
+                    self._events.put(("progress", done / total))
+                self._check_cancelled()
+        finally:
+            # Drops queued segments and waits for the ones already being written
+            exported.close()
+
+    def _virtual_split(self, input_path, ranges, folder, tracks=None):
+        """Write the cue sheet and offsets for `ranges` instead of exporting them."""
+        from cuesheet import write_virtual_split
+        cue_path, records = write_virtual_split(input_path, ranges, folder, tracks)
+        for record in records:
+            self._log(f"Track {record['track']:02}: {record['start_ms']//1000}s → {record['end_ms']//1000}s")
+        self._log(f"Cue sheet and offsets saved to: {cue_path}")
+        return records
+
+    def _show_plot(self, view_class, *args):
+        """Replace the Plot tab's contents with `view_class(tab, *args)` and switch to it."""
+        if self._plot_tab is None:
+            self._plot_tab = self.tabview.add("Plot")
+        for widget in self._plot_tab.winfo_children():
+            widget.destroy()
+        tab = self._plot_tab
+        view_class(tab, *args).pack(fill="both", expand=True)
+        self.tabview.set("Plot")
+
+    def _report_profile(self, profile, folder):
+        """Log the per-stage summary and keep the full profile next to the tool's other outputs."""
+        import os
+        self._log(profile.summary())
+        self._log(f"Run profile saved to: {profile.save(os.path.join(folder, 'run_profile.json'))}")
+
+    def _append_result(self, line):
+        self.result_text.configure(state="normal")
+        self.result_text.insert("end", line + "\n")
+        self.result_text.see("end")
+        self.result_text.configure(state="disabled")
+
+    def _poll(self):
+        self._poll_id = None
+        finished = False
+        while True:
+            try:
+                kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                self._append_result(value)
+            elif kind == "progress":
+                if self.progress.cget("mode") == "indeterminate":
+                    self.progress.stop()
+                    self.progress.configure(mode="determinate")
+                self.progress.set(value)
+            elif kind == "call":
+                try:
+                    value()
+                except Exception as e:
+                    self._append_result(f"Error: {e}")
+            elif kind == "done":
+                finished, completed = True, value
+        if finished:
+            self.progress.stop()
+            self.progress.configure(mode="determinate")
+            self.progress.set(1 if completed else 0)
+            self.run_btn.configure(state="normal")
+            self.cancel_btn.configure(state="disabled")
+        else:
+            self._poll_id = self.after(POLL_MS, self._poll)
+
+    def _run_tool(self, tool_name, input_path, output_path, params, lossless, workers, stream, time_text,
+                  export_format="mp3", bitrate=None, virtual=False):
+        import traceback
+        import os
+        from encoder import extension
+        completed = False
+        ext = extension(export_format)
+        encoding = {"format": export_format, "bitrate": bitrate}
         try:
             if tool_name == "Audio Level":
-                from pydub import AudioSegment
-                import matplotlib.pyplot as plt
-                chunk_size_ms = 100
+                from envelope import SILENCE_FLOOR_DBFS
+                from featurecache import FeatureCache
+                from overview import BASE_MS, Overview
+                # A bare number is the chunk size (ms) as always; threshold=... moves the dBFS line
+                chunk_size_ms = BASE_MS
+                threshold = -45
                 if params:
                     try:
-                        chunk_size_ms = int(params)
+                        for kv in params.split(","):
+                            k, v = kv.split("=") if "=" in kv else ("chunk_ms", kv)
+                            if k.strip() == "chunk_ms": chunk_size_ms = int(v)
+                            elif k.strip() == "threshold": threshold = float(v)
                     except:
                         pass
-                audio = AudioSegment.from_mp3(input_path)
-                length = len(audio)
-                times, volumes = [], []
-                for i in range(0, length, chunk_size_ms):
-                    chunk = audio[i:i + chunk_size_ms]
-                    db = chunk.dBFS if chunk.dBFS != float("-inf") else -90
-                    volumes.append(db)
-                    times.append(i / 1000)
-                plt.figure(figsize=(15, 5))
-                plt.plot(times, volumes, label="Volume (dBFS)")
-                plt.axhline(y=-45, color='r', linestyle='--', label='Suggested Threshold (-45 dBFS)')
-                plt.title("Volume Profile of Audio Over Time")
-                plt.xlabel("Time (seconds)")
-                plt.ylabel("Volume (dBFS)")
-                plt.ylim(-90, 0)
-                plt.grid(True)
-                plt.legend()
-                plt.tight_layout()
-                plt.show()
-                result_lines.append("Volume plot displayed.")
+                if chunk_size_ms < 1:
+                    self._log(f"chunk_ms must be at least 1, using {BASE_MS}.")
+                    chunk_size_ms = BASE_MS
+                if not SILENCE_FLOOR_DBFS <= threshold <= 0:
+                    self._log(f"threshold must be between {SILENCE_FLOOR_DBFS} and 0 dBFS, using -45.")
+                    threshold = -45
+                overview = Overview.load(input_path, FeatureCache(), chunk_size_ms)
+                self._call(lambda: self._show_plot(OverviewView, overview, threshold))
+                self._log("Volume plot ready in the Plot tab: scroll to zoom (down to 1 ms), "
+                          "drag to pan, double-click to see the whole mix.")
             elif tool_name == "Beat Split":
-                import librosa
-                import numpy as np
-                from pydub import AudioSegment
+                from exporter import export_segments
+                from featurecache import FeatureCache
+                from segmentation import BeatGapDetector, MixFeatures, PhraseDetector
                 AUDIO_FILE = input_path
-                MIN_GAP_BETWEEN_BEATS = float(params) if params else 0
                 OUTPUT_DIR = output_path or "beat_split_songs"
-                y, sr = librosa.load(AUDIO_FILE, sr=None)
-                tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-                beat_times = librosa.frames_to_time(beat_frames, sr=sr)
-                split_times = [0.0]
-                for i in range(1, len(beat_times)):
-                    if beat_times[i] - beat_times[i - 1] >= MIN_GAP_BETWEEN_BEATS:
-                        split_times.append(beat_times[i])
-                split_times.append(len(y) / sr)
-                split_ms = [int(t * 1000) for t in split_times]
-                audio = AudioSegment.from_mp3(AUDIO_FILE)
-                os.makedirs(OUTPUT_DIR, exist_ok=True)
-                for i in range(len(split_ms) - 1):
-                    start_ms = split_ms[i]
-                    end_ms = split_ms[i+1]
-                    segment = audio[start_ms:end_ms]
-                    output_path_file = os.path.join(OUTPUT_DIR, f"track_{i+1:02}.mp3")
-                    segment.export(output_path_file, format="mp3")
-                    result_lines.append(f"Exported: track_{i+1:02}.mp3 ({start_ms//1000}s to {end_ms//1000}s)")
-                result_lines.append(f"Done! All split tracks saved to: {OUTPUT_DIR}")
+                # Phrase mode unless a bare gap (seconds) or min_gap=... asks for the old split at every beat gap
+                detector = PhraseDetector()
+                try:
+                    if params and "=" not in params:
+                        detector = BeatGapDetector(float(params))
+                    elif params:
+                        for kv in params.split(","):
+                            k, v = kv.split("=")
+                            if k == "min_gap": detector = BeatGapDetector(float(v))
+                            elif k == "phrase_bars": detector.phrase_bars = int(v)
+                            elif k == "min_track_sec": detector.min_track_sec = float(v)
+                            elif k == "sensitivity": detector.sensitivity = float(v)
+                except:
+                    pass
+                mix = MixFeatures(AUDIO_FILE, FeatureCache(), stream)
+                ranges = detector.ranges(mix)
+                self._log(mix.summary())
+                if virtual:
+                    self._virtual_split(AUDIO_FILE, ranges, OUTPUT_DIR)
+                else:
+                    os.makedirs(OUTPUT_DIR, exist_ok=True)
+                    paths = [os.path.join(OUTPUT_DIR, f"track_{i+1:02}{ext}") for i in range(len(ranges))]
+                    exported = export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded, lossless, workers,
+                                               **encoding)
+                    for i, start_ms, end_ms, _ in self._segments(exported, len(ranges)):
+                        self._log(f"Exported: track_{i+1:02}{ext} ({start_ms//1000}s to {end_ms//1000}s)")
+                    self._log(f"Done! All split tracks saved to: {OUTPUT_DIR}")
             elif tool_name == "Low Volume Split":
-                from pydub import AudioSegment
+                from exporter import export_segments
+                from featurecache import FeatureCache
+                from manifest import SplitManifest, encoding_key
+                from profiling import RunProfile
+                from segmentation import LowVolumeDetector, MixFeatures
+                from streaming import stream_low_volume_split
                 MIN_PAUSE_DBFS = -35
                 PAUSE_DURATION_MS = 2000
                 CHUNK_SIZE_MS = 100
                 MIN_SONG_LENGTH_MS = 10000
+                REFINE_SPLITS = True
                 if params:
                     try:
                         for kv in params.split(","):
@@ -152,41 +336,130 @@ class ToolFrame(ctk.CTkFrame):
                             elif k == "pause_ms": PAUSE_DURATION_MS = int(v)
                             elif k == "chunk_ms": CHUNK_SIZE_MS = int(v)
                             elif k == "min_song_ms": MIN_SONG_LENGTH_MS = int(v)
+                            elif k == "refine": REFINE_SPLITS = v.strip() not in ("0", "false", "no")
                     except:
                         pass
-                audio = AudioSegment.from_mp3(input_path)
-                length = len(audio)
-                potential_splits = []
-                current_silence = 0
-                for i in range(0, length, CHUNK_SIZE_MS):
-                    chunk = audio[i:i + CHUNK_SIZE_MS]
-                    if chunk.dBFS < MIN_PAUSE_DBFS:
-                        current_silence += CHUNK_SIZE_MS
-                        if current_silence >= PAUSE_DURATION_MS:
-                            potential_splits.append(i)
-                            current_silence = 0
-                    else:
-                        current_silence = 0
-                clean_splits = []
-                prev_split = 0
-                for split in potential_splits:
-                    if split - prev_split >= MIN_SONG_LENGTH_MS:
-                        clean_splits.append(split)
-                        prev_split = split
-                split_points = [0] + clean_splits + [length]
                 output_folder = output_path or "volume_split_songs"
                 os.makedirs(output_folder, exist_ok=True)
-                for i in range(len(split_points) - 1):
-                    start = split_points[i]
-                    end = split_points[i+1]
-                    segment = audio[start:end]
-                    out_file = os.path.join(output_folder, f"song_{i+1}.mp3")
-                    segment.export(out_file, format="mp3")
-                    result_lines.append(f"Exported song_{i+1}.mp3 from {start//1000}s to {end//1000}s")
+                profile = RunProfile(tool_name, input_path, stream=stream, lossless=lossless, workers=workers,
+                                     min_dbfs=MIN_PAUSE_DBFS, pause_ms=PAUSE_DURATION_MS, **encoding)
+                # Checkpoint: a rerun reuses the boundaries and only writes the songs still missing
+                manifest = None if virtual else SplitManifest(output_folder, input_path, "low_volume", {
+                    "min_dbfs": MIN_PAUSE_DBFS, "pause_ms": PAUSE_DURATION_MS, "chunk_ms": CHUNK_SIZE_MS,
+                    "min_song_ms": MIN_SONG_LENGTH_MS, "refine": REFINE_SPLITS and not stream})
+                if virtual:
+                    mix = MixFeatures(input_path, FeatureCache(), stream, profile)
+                    ranges = LowVolumeDetector(MIN_PAUSE_DBFS, PAUSE_DURATION_MS, CHUNK_SIZE_MS,
+                                               MIN_SONG_LENGTH_MS, REFINE_SPLITS).ranges(mix)
+                    export_stage = "cue sheet"
+                elif stream and manifest.ranges is None:
+                    song_path = lambda i: os.path.join(output_folder, f"song_{i+1}{ext}")
+                    exported = manifest.checkpoint(profile.timed(stream_low_volume_split(
+                        input_path, song_path, MIN_PAUSE_DBFS, PAUSE_DURATION_MS, CHUNK_SIZE_MS,
+                        MIN_SONG_LENGTH_MS, lossless, **encoding)), encoding_key(export_format, bitrate, lossless))
+                    total = None  # not known until the whole mix has streamed past
+                    export_stage = "decode + dbfs + export (streamed)"
+                else:
+                    mix = MixFeatures(input_path, FeatureCache(), profile=profile)
+                    detector = LowVolumeDetector(MIN_PAUSE_DBFS, PAUSE_DURATION_MS, CHUNK_SIZE_MS,
+                                                 MIN_SONG_LENGTH_MS, REFINE_SPLITS)
+                    ranges = manifest.boundaries(lambda: detector.ranges(mix))
+                    paths = [os.path.join(output_folder, f"song_{i+1}{ext}") for i in range(len(ranges))]
+                    exported = export_segments(input_path, ranges, paths, mix.audio_if_decoded, lossless, workers,
+                                               profile, **encoding, manifest=manifest)
+                    total = len(ranges)
+                    export_stage = "export"
+                with profile.stage(export_stage):
+                    if virtual:
+                        self._virtual_split(input_path, ranges, output_folder)
+                    else:
+                        for i, start, end, _ in self._segments(exported, total):
+                            self._log(f"Exported song_{i+1}{ext} from {start//1000}s to {end//1000}s")
+                self._report_profile(profile, output_folder)
+            elif tool_name == "Novelty Split":
+                from matplotlib.figure import Figure
+                from overview import figure_image
+                import json
+                from exporter import export_segments
+                from featurecache import FeatureCache
+                from manifest import SplitManifest
+                from profiling import RunProfile
+                from segmentation import MixFeatures, NoveltyDetector, cached_curve
+                AUDIO_FILE = input_path
+                OUTPUT_DIR = output_path or "novelty_splits"
+                detector = NoveltyDetector()
+                if params:
+                    try:
+                        for kv in params.split(","):
+                            k, v = kv.split("=")
+                            if k == "kernel_sec": detector.kernel_sec = float(v)
+                            elif k == "min_track_sec": detector.min_track_sec = float(v)
+                            elif k == "sensitivity": detector.sensitivity = float(v)
+                    except:
+                        pass
+                profile = RunProfile(tool_name, AUDIO_FILE, stream=stream, lossless=lossless, workers=workers,
+                                     kernel_sec=detector.kernel_sec, **encoding)
+                mix = MixFeatures(AUDIO_FILE, FeatureCache(), stream, profile)
+                manifest = None if virtual else SplitManifest(OUTPUT_DIR, AUDIO_FILE, "novelty", {
+                    "kernel_sec": detector.kernel_sec, "min_track_sec": detector.min_track_sec,
+                    "sensitivity": detector.sensitivity})
+                if not (manifest and manifest.resumed):
+                    mix.spectral()  # decode and spectral frames first, so Cancel can stop before the novelty pass
+                    self._check_cancelled()
+                ranges = manifest.boundaries(lambda: detector.ranges(mix)) if manifest else detector.ranges(mix)
+                # Resumed runs never decode for the graph: only a curve the feature cache has is drawn
+                curve = cached_curve(detector, mix) if manifest and manifest.resumed else detector.curve(mix)
+                self._log(mix.summary())
+                os.makedirs(OUTPUT_DIR, exist_ok=True)
+                segments_metadata = []
+                if virtual:
+                    with profile.stage("cue sheet"):
+                        segments_metadata = self._virtual_split(AUDIO_FILE, ranges, OUTPUT_DIR)
+                else:
+                    paths = [os.path.join(OUTPUT_DIR, f"track_{i+1:02}{ext}") for i in range(len(ranges))]
+                    exported = export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded, lossless, workers,
+                                               profile, **encoding, manifest=manifest)
+                    with profile.stage("export"):
+                        for i, start, end, filepath in self._segments(exported, len(ranges)):
+                            filename = os.path.basename(filepath)
+                            self._log(f"Exported: {filename} ({start//1000}s → {end//1000}s)")
+                            segments_metadata.append({
+                                "track": i + 1,
+                                "filename": filename,
+                                "start_sec": start // 1000,
+                                "end_sec": end // 1000,
+                                "duration_sec": (end - start) // 1000
+                            })
+                if not virtual:
+                    with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w") as f:
+                        json.dump(segments_metadata, f, indent=2)
+                with open(os.path.join(OUTPUT_DIR, "split_timestamps.txt"), "w") as f:
+                    for segment in segments_metadata:
+                        f.write(f"Track {segment['track']:02}: {segment['start_sec']}s -> {segment['end_sec']}s ({segment['duration_sec']}s)\n")
+                if curve is not None:
+                    times, novelty = curve
+                    with profile.stage("plot"):
+                        fig = Figure(figsize=(14, 5))
+                        ax = fig.add_subplot()
+                        ax.plot(times, novelty, label="Novelty")
+                        for start, _ in ranges[1:]:
+                            ax.axvline(x=start / 1000, color='r', linestyle='--', alpha=0.5)
+                        ax.set_title("Timbre and Harmony Changes Over Time")
+                        ax.set_xlabel("Time (s)")
+                        ax.set_ylabel("Novelty")
+                        ax.grid(True)
+                        ax.legend()
+                        fig.tight_layout()
+                        fig.savefig(os.path.join(OUTPUT_DIR, "novelty_plot.png"))
+                        image = figure_image(fig)
+                    self._call(lambda: self._show_plot(ImageView, image))
+                else:
+                    self._log("Resumed without the spectral frames in the feature cache: kept the previous novelty graph.")
+                self._log(f"All tracks, timestamp logs, and novelty graph saved to: {OUTPUT_DIR}")
+                self._report_profile(profile, OUTPUT_DIR)
             elif tool_name == "Process":
-                from pydub import AudioSegment
-                from pydub.silence import split_on_silence
-                audio = AudioSegment.from_mp3(input_path)
+                from exporter import export_segments
+                from segmentation import MixFeatures, SilenceDetector
                 min_silence_len = 1500
                 silence_thresh = -40
                 if params:
@@ -197,23 +470,29 @@ class ToolFrame(ctk.CTkFrame):
                             elif k == "silence_thresh": silence_thresh = int(v)
                     except:
                         pass
-                chunks = split_on_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
+                mix = MixFeatures(input_path)
+                ranges = SilenceDetector(min_silence_len=min_silence_len, silence_thresh=silence_thresh).ranges(mix)
                 output_folder = output_path or "split_songs"
-                os.makedirs(output_folder, exist_ok=True)
-                for i, chunk in enumerate(chunks):
-                    out_file = os.path.join(output_folder, f"song_{i+1}.mp3")
-                    chunk.export(out_file, format="mp3")
-                    result_lines.append(f"Exported {out_file}")
+                if virtual:
+                    self._virtual_split(input_path, ranges, output_folder)
+                else:
+                    os.makedirs(output_folder, exist_ok=True)
+                    paths = [os.path.join(output_folder, f"song_{i+1}{ext}") for i in range(len(ranges))]
+                    exported = export_segments(input_path, ranges, paths, mix.audio_if_decoded, lossless, workers, **encoding)
+                    for _, _, _, out_file in self._segments(exported, len(ranges)):
+                        self._log(f"Exported {out_file}")
             elif tool_name == "Song By Time":
-                from pydub import AudioSegment
                 import os
                 import json
-                audio = AudioSegment.from_mp3(input_path)
-                audio_length_ms = len(audio)
+                from exporter import export_segments, source_length_ms
+                audio = None  # MP3s are cut or re-encoded from their own frames, never decoded whole
+                if not input_path.lower().endswith(".mp3") and not lossless and not stream and not virtual:
+                    from pydub import AudioSegment
+                    audio = AudioSegment.from_file(input_path)
+                audio_length_ms = source_length_ms(input_path, audio)
                 # Parse time input
-                timestr = getattr(self, 'time_var', None)
+                timestr = time_text
                 if timestr:
-                    timestr = self.time_var.get().strip()
                     start_times = []
                     for t in timestr.split(","):
                         t = t.strip()
@@ -225,132 +504,237 @@ class ToolFrame(ctk.CTkFrame):
                     end_times = start_times[1:] + [audio_length_ms]
                     output_dir = output_path or "time_splits"
                     os.makedirs(output_dir, exist_ok=True)
-                    for i in range(len(start_times)):
-                        start = start_times[i]
-                        end = end_times[i]
-                        segment = audio[start:end]
-                        out_file = os.path.join(output_dir, f"song_{i+1}.mp3")
-                        segment.export(out_file, format="mp3")
-                        result_lines.append(f"Exported: song_{i+1}.mp3 ({start//1000}s → {end//1000}s)")
+                    ranges = list(zip(start_times, end_times))
+                    if virtual:
+                        self._virtual_split(input_path, ranges, output_dir)
+                    else:
+                        paths = [os.path.join(output_dir, f"song_{i+1}{ext}") for i in range(len(ranges))]
+                        exported = export_segments(input_path, ranges, paths, audio, lossless, workers, **encoding)
+                        for i, start, end, _ in self._segments(exported, len(ranges)):
+                            self._log(f"Exported: song_{i+1}{ext} ({start//1000}s → {end//1000}s)")
                 else:
-                    result_lines.append("No time input provided.")
+                    self._log("No time input provided.")
             elif tool_name == "Timestamps":
-                from pydub import AudioSegment
+                from exporter import export_segments
+                from featurecache import FeatureCache
+                from segmentation import LowVolumeDetector, MixFeatures
                 MIN_PAUSE_DBFS = -35
                 PAUSE_DURATION_MS = 2000
                 CHUNK_SIZE_MS = 100
                 MIN_SONG_LENGTH_MS = 10000
-                audio = AudioSegment.from_mp3(input_path)
-                length = len(audio)
-                split_points = []
-                current_silence = 0
-                for i in range(0, length, CHUNK_SIZE_MS):
-                    chunk = audio[i:i + CHUNK_SIZE_MS]
-                    db = chunk.dBFS if chunk.dBFS != float("-inf") else -90
-                    if db < MIN_PAUSE_DBFS:
-                        current_silence += CHUNK_SIZE_MS
-                        if current_silence >= PAUSE_DURATION_MS:
-                            split_points.append(i)
-                            current_silence = 0
-                    else:
-                        current_silence = 0
-                final_splits = [0]
-                for point in split_points:
-                    if point - final_splits[-1] >= MIN_SONG_LENGTH_MS:
-                        final_splits.append(point)
-                final_splits.append(length)
+                mix = MixFeatures(input_path, FeatureCache(), stream)
+                ranges = LowVolumeDetector(MIN_PAUSE_DBFS, PAUSE_DURATION_MS, CHUNK_SIZE_MS,
+                                           MIN_SONG_LENGTH_MS).ranges(mix)
                 output_dir = output_path or "volume_split_songs"
-                os.makedirs(output_dir, exist_ok=True)
-                for i in range(len(final_splits) - 1):
-                    start = final_splits[i]
-                    end = final_splits[i+1]
-                    segment = audio[start:end]
-                    out_file = os.path.join(output_dir, f"song_{i+1}.mp3")
-                    segment.export(out_file, format="mp3")
-                    result_lines.append(f"Exported: song_{i+1}.mp3 ({start//1000}s → {end//1000}s)")
+                if virtual:
+                    self._virtual_split(input_path, ranges, output_dir)
+                else:
+                    os.makedirs(output_dir, exist_ok=True)
+                    paths = [os.path.join(output_dir, f"song_{i+1}{ext}") for i in range(len(ranges))]
+                    exported = export_segments(input_path, ranges, paths, mix.audio_if_decoded, lossless, workers,
+                                               **encoding)
+                    for i, start, end, _ in self._segments(exported, len(ranges)):
+                        self._log(f"Exported: song_{i+1}{ext} ({start//1000}s → {end//1000}s)")
             elif tool_name == "Transition Energy":
-                import librosa
-                import numpy as np
-                from scipy.signal import medfilt
-                from pydub import AudioSegment
-                import matplotlib.pyplot as plt
+                from matplotlib.figure import Figure
+                from overview import figure_image
                 import json
+                from exporter import export_segments
+                from featurecache import FeatureCache
+                from manifest import SplitManifest
+                from profiling import RunProfile
+                from segmentation import MixFeatures, TempoChangeDetector, cached_curve
                 AUDIO_FILE = input_path
                 OUTPUT_DIR = output_path or "beat_change_splits"
                 WINDOW_SECONDS = 10
+                WINDOW_OVERLAP = 0.0
                 TEMPO_CHANGE_THRESHOLD = 10
                 MIN_SEGMENT_DURATION_SEC = 30
-                y, sr = librosa.load(AUDIO_FILE, sr=None)
-                duration_sec = librosa.get_duration(y=y, sr=sr)
-                hop_length = 512
-                onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
-                frame_times = librosa.frames_to_time(np.arange(len(onset_env)), sr=sr, hop_length=hop_length)
-                window_hops = int(WINDOW_SECONDS * sr / hop_length)
-                tempos = []
-                times = []
-                for i in range(0, len(onset_env) - window_hops, window_hops):
-                    segment = onset_env[i:i + window_hops]
-                    if len(segment) < 10:
-                        continue
-                    tempo, _ = librosa.beat.beat_track(onset_envelope=segment, sr=sr, hop_length=hop_length)
-                    tempos.append(tempo)
-                    times.append(frame_times[i])
-                tempos = medfilt(tempos, kernel_size=3)
-                tempos = np.array(tempos)
-                times = np.array(times)
-                split_times = [0.0]
-                for i in range(1, len(tempos)):
-                    delta = abs(tempos[i] - tempos[i - 1])
-                    if delta >= TEMPO_CHANGE_THRESHOLD:
-                        if times[i] - split_times[-1] > MIN_SEGMENT_DURATION_SEC:
-                            split_times.append(times[i])
-                split_times.append(duration_sec)
-                split_ms = [int(t * 1000) for t in split_times]
-                audio = AudioSegment.from_mp3(AUDIO_FILE)
+                profile = RunProfile(tool_name, AUDIO_FILE, stream=stream, lossless=lossless, workers=workers,
+                                     window_seconds=WINDOW_SECONDS, overlap=WINDOW_OVERLAP, **encoding)
+                mix = MixFeatures(AUDIO_FILE, FeatureCache(), stream, profile)
+                detector = TempoChangeDetector(WINDOW_SECONDS, TEMPO_CHANGE_THRESHOLD, MIN_SEGMENT_DURATION_SEC,
+                                               WINDOW_OVERLAP)
+                manifest = None if virtual else SplitManifest(OUTPUT_DIR, AUDIO_FILE, "tempo_change", {
+                    "window_seconds": WINDOW_SECONDS, "threshold": TEMPO_CHANGE_THRESHOLD,
+                    "min_segment_sec": MIN_SEGMENT_DURATION_SEC, "overlap": WINDOW_OVERLAP})
+                if not (manifest and manifest.resumed):
+                    mix.onset()  # decode and onsets first, so Cancel can stop before the tempo pass
+                    self._check_cancelled()
+                ranges = manifest.boundaries(lambda: detector.ranges(mix)) if manifest else detector.ranges(mix)
+                # Resumed runs never decode for the graph: only a curve the feature cache has is drawn
+                curve = cached_curve(detector, mix) if manifest and manifest.resumed else detector.curve(mix)
+                self._log(mix.summary())
                 os.makedirs(OUTPUT_DIR, exist_ok=True)
                 segments_metadata = []
-                for i in range(len(split_ms) - 1):
-                    start = split_ms[i]
-                    end = split_ms[i + 1]
-                    segment = audio[start:end]
-                    filename = f"track_{i+1:02}.mp3"
-                    filepath = os.path.join(OUTPUT_DIR, filename)
-                    segment.export(filepath, format="mp3")
-                    result_lines.append(f"Exported: {filename} ({start//1000}s → {end//1000}s)")
-                    segments_metadata.append({
-                        "track": i + 1,
-                        "filename": filename,
-                        "start_sec": start // 1000,
-                        "end_sec": end // 1000,
-                        "duration_sec": (end - start) // 1000
-                    })
-                with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w") as f:
-                    json.dump(segments_metadata, f, indent=2)
+                if virtual:
+                    with profile.stage("cue sheet"):
+                        segments_metadata = self._virtual_split(AUDIO_FILE, ranges, OUTPUT_DIR)
+                else:
+                    paths = [os.path.join(OUTPUT_DIR, f"track_{i+1:02}{ext}") for i in range(len(ranges))]
+                    exported = export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded, lossless, workers,
+                                               profile, **encoding, manifest=manifest)
+                    with profile.stage("export"):
+                        for i, start, end, filepath in self._segments(exported, len(ranges)):
+                            filename = os.path.basename(filepath)
+                            self._log(f"Exported: {filename} ({start//1000}s → {end//1000}s)")
+                            segments_metadata.append({
+                                "track": i + 1,
+                                "filename": filename,
+                                "start_sec": start // 1000,
+                                "end_sec": end // 1000,
+                                "duration_sec": (end - start) // 1000
+                            })
+                if not virtual:
+                    with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w") as f:
+                        json.dump(segments_metadata, f, indent=2)
                 with open(os.path.join(OUTPUT_DIR, "split_timestamps.txt"), "w") as f:
                     for segment in segments_metadata:
                         f.write(f"Track {segment['track']:02}: {segment['start_sec']}s -> {segment['end_sec']}s ({segment['duration_sec']}s)\n")
-                plt.figure(figsize=(14, 5))
-                plt.plot(times, tempos, marker='o', label="Tempo (BPM)")
-                for split in split_times[1:-1]:
-                    plt.axvline(x=split, color='r', linestyle='--', alpha=0.5)
-                plt.title("Detected Beat Pattern Changes Over Time")
-                plt.xlabel("Time (s)")
-                plt.ylabel("Tempo (BPM)")
-                plt.grid(True)
-                plt.legend()
-                plt.tight_layout()
-                plt.savefig(os.path.join(OUTPUT_DIR, "tempo_plot.png"))
-                plt.show()
-                result_lines.append(f"All tracks, timestamp logs, and tempo graph saved to: {OUTPUT_DIR}")
+                if curve is not None:
+                    times, tempos = curve
+                    with profile.stage("plot"):
+                        fig = Figure(figsize=(14, 5))
+                        ax = fig.add_subplot()
+                        ax.plot(times, tempos, marker='o', label="Tempo (BPM)")
+                        for start, _ in ranges[1:]:
+                            ax.axvline(x=start / 1000, color='r', linestyle='--', alpha=0.5)
+                        ax.set_title("Detected Beat Pattern Changes Over Time")
+                        ax.set_xlabel("Time (s)")
+                        ax.set_ylabel("Tempo (BPM)")
+                        ax.grid(True)
+                        ax.legend()
+                        fig.tight_layout()
+                        fig.savefig(os.path.join(OUTPUT_DIR, "tempo_plot.png"))
+                        image = figure_image(fig)
+                    self._call(lambda: self._show_plot(ImageView, image))
+                else:
+                    self._log("Resumed without the tempos in the feature cache: kept the previous tempo graph.")
+                self._log(f"All tracks, timestamp logs, and tempo graph saved to: {OUTPUT_DIR}")
+                self._report_profile(profile, OUTPUT_DIR)
             elif tool_name == "YouTube to MP3":
-                result_lines.append("YouTube to MP3 logic not implemented yet.")
+                from youtubetomp3 import OUTPUT_DIR, TRANSCODE_WORKERS, download_playlist
+                if not input_path:
+                    self._log("Enter a playlist or video URL as the input.")
+                else:
+                    download_playlist(input_path, output_path or OUTPUT_DIR,
+                                      transcode_workers=workers or TRANSCODE_WORKERS, log=self._log,
+                                      should_stop=self._cancel.is_set)
+                    self._check_cancelled()
             else:
-                result_lines.append("Tool not implemented.")
+                self._log("Tool not implemented.")
+            completed = True
+        except RunCancelled:
+            self._log("Cancelled.")
         except Exception as e:
-            result_lines.append(f"Error: {e}")
-            result_lines.append(traceback.format_exc())
-        self.result_text.insert("end", "\n".join(result_lines))
-        self.result_text.configure(state="disabled")
+            self._log(f"Error: {e}")
+            self._log(traceback.format_exc())
+        finally:
+            self._events.put(("done", completed))
+
+class ImageView(ctk.CTkLabel):
+    """A rendered PIL image, scaled to fit."""
+
+    def __init__(self, master, image):
+        self._ctk_image = ctk.CTkImage(light_image=image, dark_image=image, size=(780, 280))
+        super().__init__(master, text="", image=self._ctk_image)
+
+
+class OverviewView(ctk.CTkFrame):
+    """Zoomable waveform/loudness plot of an overview.Overview.
+
+    Every pan or zoom is rendered with Agg on a background thread at the
+    widget's pixel size from the pyramid level that matches the zoom, so the
+    Tk thread only ever swaps in finished images.
+    """
+
+    MIN_SPAN_SECONDS = 0.01
+
+    def __init__(self, master, overview, threshold=-45):
+        super().__init__(master)
+        self.overview = overview
+        self.threshold = threshold
+        self.start, self.end = 0.0, overview.duration
+        self.image_label = ctk.CTkLabel(self, text="Rendering...")
+        self.image_label.pack(fill="both", expand=True)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._request = None
+        self._rendered = None
+        self._closed = False
+        self._image = None
+        self._drag = None
+        threading.Thread(target=self._render_loop, daemon=True).start()
+
+        self.image_label.bind("<MouseWheel>", lambda e: self._zoom(e.x, 0.8 if e.delta > 0 else 1.25))
+        self.image_label.bind("<Button-4>", lambda e: self._zoom(e.x, 0.8))
+        self.image_label.bind("<Button-5>", lambda e: self._zoom(e.x, 1.25))
+        self.image_label.bind("<ButtonPress-1>", self._on_press)
+        self.image_label.bind("<B1-Motion>", self._on_drag)
+        self.image_label.bind("<Double-Button-1>", lambda e: self._set_range(0.0, self.overview.duration))
+        self.bind("<Configure>", lambda e: self.redraw())
+        self._poll_id = self.after(POLL_MS, self._poll)
+
+    def destroy(self):
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self.after_cancel(self._poll_id)
+        super().destroy()
+
+    def redraw(self):
+        width = max(self.winfo_width(), 200)
+        height = max(self.winfo_height(), 150)
+        with self._lock:
+            self._request = (self.start, self.end, width, height)
+        self._wake.set()
+
+    def _render_loop(self):
+        from overview import render
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                if self._closed:
+                    return
+                request = self._request
+            if request:
+                start, end, width, height = request
+                image = render(self.overview, start, end, width, height, self.threshold)
+                with self._lock:
+                    self._rendered = (image, width, height)
+
+    def _poll(self):
+        with self._lock:
+            rendered, self._rendered = self._rendered, None
+        if rendered:
+            image, width, height = rendered
+            self._image = ctk.CTkImage(light_image=image, dark_image=image, size=(width, height))
+            self.image_label.configure(image=self._image, text="")
+        self._poll_id = self.after(POLL_MS, self._poll)
+
+    def _set_range(self, start, end):
+        span = min(max(end - start, self.MIN_SPAN_SECONDS), self.overview.duration)
+        start = min(max(start, 0.0), self.overview.duration - span)
+        self.start, self.end = start, start + span
+        self.redraw()
+
+    def _time_at(self, x):
+        return self.start + (self.end - self.start) * x / max(self.winfo_width(), 1)
+
+    def _zoom(self, x, factor):
+        pivot = self._time_at(x)
+        self._set_range(pivot - (pivot - self.start) * factor, pivot + (self.end - pivot) * factor)
+
+    def _on_press(self, event):
+        self._drag = (event.x, self.start, self.end)
+
+    def _on_drag(self, event):
+        x, start, end = self._drag
+        shift = (x - event.x) * (end - start) / max(self.winfo_width(), 1)
+        self._set_range(start + shift, end + shift)
+
 
 class SidebarApp(ctk.CTk):
     def __init__(self):
@@ -373,6 +757,7 @@ class SidebarApp(ctk.CTk):
             ("Audio Level", ToolFrame),
             ("Beat Split", ToolFrame),
             ("Low Volume Split", ToolFrame),
+            ("Novelty Split", ToolFrame),
             ("Process", ToolFrame),
             ("Song By Time", ToolFrame),
             ("Timestamps", ToolFrame),
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+
+from featurecache import HASH_BLOCK_BYTES, FeatureCache
+
+MANIFEST_FILE = "split_manifest.json"  # written next to split_timestamps.json
+SAVE_EVERY = 16  # finished segments recorded between two rewrites of the manifest
+
+
+def file_checksum(path):
+    """SHA-256 of a written track."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def encoding_key(format="mp3", bitrate=None, lossless=True):
+    """What a track's bytes depend on besides its range (lossless only applies to MP3 output)."""
+    return {"format": format, "bitrate": bitrate, "lossless": bool(lossless and format == "mp3")}
+
+
+def _plain(value):
+    """`value` as it reads back from JSON (tuples become lists...), so saved and new parameters compare equal."""
+    return json.loads(json.dumps(value, default=str))
+
+
+class SplitManifest:
+    """Checkpoint of one split job, kept in its output folder and rewritten as segments finish.
+
+    It records the source's content hash, the analysis parameters and the
+    boundaries they gave, and every finished segment with its encoding and
+    a checksum of the file written. A rerun on the same source reuses the
+    boundaries if the parameters did not change (no decode, no analysis),
+    and export_segments skips every segment whose file is still as recorded,
+    so after a crash, a cancel or a parameter tweak only the missing or
+    changed tracks are encoded.
+    """
+
+    def __init__(self, out_dir, source_path, tool, params, cache=None):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, MANIFEST_FILE)
+        self.source_hash = (cache or FeatureCache()).file_hash(source_path)
+        self.data = {"source": os.path.abspath(source_path), "source_hash": self.source_hash,
+                     "tool": tool, "params": _plain(params), "ranges": None, "segments": {}}
+        self.ranges = None  # boundaries an earlier run found with the same parameters
+        self.resumed = False  # whether those exist, so this run needs no decode and no analysis
+        self.unsaved = 0  # segments recorded since the last save
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = None
+        if saved and saved.get("source_hash") == self.source_hash:
+            # Finished tracks stay valid whatever the parameters; boundaries only for the same ones
+            self.data["segments"] = saved.get("segments", {})
+            if saved.get("tool") == tool and saved.get("params") == self.data["params"] \
+                    and saved.get("ranges") is not None:
+                self.data["ranges"] = saved["ranges"]
+                self.ranges = [tuple(r) for r in saved["ranges"]]
+                self.resumed = True
+
+    def boundaries(self, compute):
+        """The saved ranges if they came from the same source and parameters, else `compute()` (then saved)."""
+        if self.ranges is None:
+            self.set_ranges(compute())
+        return self.ranges
+
+    def set_ranges(self, ranges):
+        self.ranges = [(int(start), int(end)) for start, end in ranges]
+        self.data["ranges"] = [list(r) for r in self.ranges]
+        self.save()
+
+    def checkpoint(self, exported, encoding):
+        """Record each `(index, start_ms, end_ms, out_path)` of a streamed split as it passes.
+
+        The boundaries are only saved once the whole mix has gone past; a
+        stream cut short runs again, but its finished tracks stay recorded.
+        """
+        ranges = []
+        try:
+            for result in exported:
+                self.finish(result[1], result[2], result[3], encoding)
+                ranges.append((result[1], result[2]))
+                yield result
+        finally:
+            self.save()
+        self.set_ranges(ranges)
+
+    def _key(self, out_path):
+        return os.path.relpath(out_path, self.out_dir).replace(os.sep, "/")
+
+    def done(self, start_ms, end_ms, out_path, encoding):
+        """Whether `out_path` already holds this segment, written with this encoding."""
+        entry = self.data["segments"].get(self._key(out_path))
+        if not entry or [entry["start_ms"], entry["end_ms"]] != [int(start_ms), int(end_ms)] \
+                or entry["encoding"] != _plain(encoding):
+            return False
+        try:
+            stat = os.stat(out_path)
+        except OSError:
+            return False
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        # Only a touched file is read back to compare contents
+        if file_checksum(out_path) != entry["sha256"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns  # saved with the export, so the next run trusts the file again
+        self.unsaved += 1
+        return True
+
+    def finish(self, start_ms, end_ms, out_path, encoding):
+        """Record a segment as written; the manifest is rewritten every SAVE_EVERY of them (and by `save`)."""
+        stat = os.stat(out_path)
+        self.data["segments"][self._key(out_path)] = {
+            "start_ms": int(start_ms), "end_ms": int(end_ms), "encoding": _plain(encoding),
+            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_checksum(out_path)}
+        self.unsaved += 1
+        if self.unsaved >= SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        self.unsaved = 0
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)  # a crash mid-write leaves the previous checkpoint
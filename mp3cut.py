@@ -0,0 +1,359 @@
+import mmap
+import os
+import struct
+import subprocess
+
+import numpy as np
+from pydub import AudioSegment
+
+# Every MP3 decoder delays its output by 528 + 1 samples (LAME/ffmpeg convention)
+DECODER_DELAY = 529
+MAX_TAG_DELAY = 4095  # delay/padding are 12-bit fields in the LAME tag
+
+_BITRATES_KBPS = {
+    True: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1
+    False: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],  # MPEG-2/2.5
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# Xing/Info tag layout: 4 id + 4 flags + 4 frames + 4 bytes + 100 TOC + 4 quality
+_XING_FLAGS = 0x0F
+_XING_SIZE = 120
+_LAME_SIZE = 36
+
+INDEX_SUFFIX = ".seekindex.npz"  # frame index saved next to each MP3 (set to None to never write one)
+_INDEX_VERSION = 1
+
+
+def _parse_header(data, pos):
+    """Decode the 4-byte MPEG audio Layer III header at `pos`, or None if invalid."""
+    if pos + 4 > len(data) or data[pos] != 0xFF:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version = (b1 >> 3) & 3
+    if (b1 & 0xE0) != 0xE0 or version == 1 or (b1 >> 1) & 3 != 1:
+        return None
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if bitrate_index in (0, 15) or rate_index == 3:
+        return None  # free-format and reserved values cannot be cut safely
+
+    mpeg1 = version == 3
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    bitrate = _BITRATES_KBPS[mpeg1][bitrate_index] * 1000
+    mono = (b3 >> 6) == 3
+    crc_bytes = 0 if b1 & 1 else 2
+    return {
+        "mpeg1": mpeg1,
+        "version": version,
+        "bitrate_index": bitrate_index,
+        "rate_index": rate_index,
+        "sample_rate": sample_rate,
+        "size": (144 if mpeg1 else 72) * bitrate // sample_rate + ((b2 >> 1) & 1),
+        "samples": 1152 if mpeg1 else 576,
+        "side_info": (17 if mono else 32) if mpeg1 else (9 if mono else 17),
+        "crc_bytes": crc_bytes,
+    }
+
+
+def _crc16(data):
+    """CRC-16/ARC, the checksum LAME uses for its info tag."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class Mp3Cutter:
+    """Cut an MP3 into tracks by copying whole frames, without decoding.
+
+    Each output starts with a fresh Xing/Info + LAME tag frame whose encoder
+    delay and padding tell gapless decoders (ffmpeg, and therefore pydub and
+    librosa) to trim the output back to the exact requested samples. The
+    frames just before a cut are carried along so the decoder has the bit
+    reservoir and MDCT overlap it needs for the first audible sample.
+
+    The frame index (byte offset, size, main_data_begin and payload of every
+    frame; frame i starts at sample i * samples_per_frame) is saved next to
+    the MP3 the first time, so later runs only touch the frames they cut.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if not self._load_index():
+            self._scan()
+            self._save_index()
+
+    def _index_stamp(self):
+        stat = os.stat(self.path)
+        return np.array([_INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    def _load_index(self):
+        """Pick up a saved frame index if it belongs to this exact file; True if one was used."""
+        if not INDEX_SUFFIX:
+            return False
+        try:
+            with np.load(self.path + INDEX_SUFFIX, allow_pickle=False) as index:
+                if not np.array_equal(index["stamp"], self._index_stamp()):
+                    return False
+                fields = {name: index[name] for name in index.files}
+        except (OSError, ValueError, KeyError):
+            return False
+        self._first_header = fields["first_header"].tobytes()
+        self.header = _parse_header(self._first_header, 0)
+        self.sample_rate = self.header["sample_rate"]
+        self.samples_per_frame = self.header["samples"]
+        self.lame_tag = fields["lame_tag"].tobytes() or None
+        self.encoder_delay, self.encoder_padding, self.timeline_offset = (int(v) for v in fields["tag_info"])
+        self.offsets = fields["offsets"]
+        self.sizes = fields["sizes"]
+        self.reservoir = fields["reservoir"]
+        self.payloads = fields["payloads"]
+        self.bitrate_indexes = fields["bitrate_indexes"]
+        return True
+
+    def _save_index(self):
+        if not INDEX_SUFFIX:
+            return
+        index_path = self.path + INDEX_SUFFIX
+        tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(tmp_path, stamp=self._index_stamp(),
+                     first_header=np.frombuffer(self._first_header, dtype=np.uint8),
+                     lame_tag=np.frombuffer(self.lame_tag or b"", dtype=np.uint8),
+                     tag_info=np.array([self.encoder_delay, self.encoder_padding, self.timeline_offset]),
+                     offsets=self.offsets, sizes=self.sizes, reservoir=self.reservoir,
+                     payloads=self.payloads, bitrate_indexes=self.bitrate_indexes)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            pass  # read-only folder: scan again next time
+
+    def _scan(self):
+        data = self._data
+        pos = 0
+        if data[:3] == b"ID3":
+            size = data[6] << 21 | data[7] << 14 | data[8] << 7 | data[9]
+            pos = 10 + size + (10 if data[5] & 0x10 else 0)
+
+        offsets, sizes, reservoir, payloads, bitrates = [], [], [], [], []
+        first = None
+        end = len(data)
+        while pos + 4 <= end:
+            header = _parse_header(data, pos)
+            if header is None or (first and header["sample_rate"] != first["sample_rate"]):
+                if data[pos:pos + 3] == b"TAG" or data[pos:pos + 8] == b"APETAGEX":
+                    break
+                pos += 1
+                continue
+            # Guard against false sync words inside junk or tag data
+            nxt = pos + header["size"]
+            if nxt + 4 <= end and _parse_header(data, nxt) is None \
+                    and data[nxt:nxt + 3] != b"TAG" and data[nxt:nxt + 8] != b"APETAGEX":
+                pos += 1
+                continue
+            if first is None:
+                first = header
+                self._first_header = bytes(data[pos:pos + 4])
+                if self._read_info_tag(pos, header):
+                    pos = nxt
+                    continue
+            side = pos + 4 + header["crc_bytes"]
+            offsets.append(pos)
+            sizes.append(header["size"])
+            reservoir.append(data[side] << 1 | data[side + 1] >> 7 if header["mpeg1"] else data[side])
+            payloads.append(header["size"] - 4 - header["crc_bytes"] - header["side_info"])
+            bitrates.append(header["bitrate_index"])
+            pos = nxt
+
+        if first is None:
+            raise ValueError(f"{self.path} contains no MPEG Layer III frames")
+        self.header = first
+        self.sample_rate = first["sample_rate"]
+        self.samples_per_frame = first["samples"]
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.sizes = np.array(sizes, dtype=np.int32)
+        self.reservoir = np.array(reservoir, dtype=np.int32)
+        self.payloads = np.array(payloads, dtype=np.int32)
+        self.bitrate_indexes = np.array(bitrates, dtype=np.int8)
+
+    def _read_info_tag(self, pos, header):
+        """Pick up encoder delay/padding from a Xing/Info/VBRI frame; True if one was found."""
+        self.lame_tag = None
+        self.encoder_delay = 0
+        self.encoder_padding = 0
+        # Without a LAME tag ffmpeg trims nothing, so timeline sample 0 is decoded sample 0.
+        # Cuts then lose the first 529 samples of the file, which a tag cannot express.
+        self.timeline_offset = 0
+
+        data = self._data
+        tag = pos + 4 + header["crc_bytes"] + header["side_info"]
+        if data[pos + 36:pos + 40] == b"VBRI":
+            return True
+        if data[tag:tag + 4] not in (b"Xing", b"Info"):
+            return False
+        flags = struct.unpack(">I", data[tag + 4:tag + 8])[0]
+        lame = tag + 8 + 4 * bool(flags & 1) + 4 * bool(flags & 2) + 100 * bool(flags & 4) \
+            + 4 * bool(flags & 8)
+        version = bytes(data[lame:lame + 4])
+        if version in (b"LAME", b"Lavf", b"Lavc") and lame + _LAME_SIZE <= pos + header["size"]:
+            self.lame_tag = bytes(data[lame:lame + _LAME_SIZE])
+            packed = int.from_bytes(self.lame_tag[21:24], "big")
+            self.encoder_delay = packed >> 12
+            self.encoder_padding = packed & 0xFFF
+            self.timeline_offset = self.encoder_delay + DECODER_DELAY
+        return True
+
+    @property
+    def frame_count(self):
+        return len(self.offsets)
+
+    @property
+    def total_samples(self):
+        """Samples on the decoded timeline, the one pydub/librosa split points refer to."""
+        total = self.frame_count * self.samples_per_frame
+        if self.lame_tag:
+            total -= self.encoder_delay + self.encoder_padding
+        return total
+
+    @property
+    def duration_ms(self):
+        return round(self.total_samples * 1000 / self.sample_rate)
+
+    def sample_at(self, ms):
+        """Decoded-timeline sample a split point in ms falls on (the same one AudioSegment slicing uses)."""
+        return min(int(ms * self.sample_rate / 1000.0), self.total_samples)
+
+    def frame_range(self, start_ms, end_ms):
+        """Frames to copy for [start_ms, end_ms) plus the LAME delay/padding that trims them."""
+        spf = self.samples_per_frame
+        start, end = self.sample_at(start_ms), self.sample_at(end_ms)
+        s0 = start + self.timeline_offset  # position in the raw decoded stream
+        s1 = max(end, start) + self.timeline_offset
+
+        a = self._first_frame(s0)
+        if s0 - a * spf - DECODER_DELAY > MAX_TAG_DELAY:
+            a = -(-(s0 - DECODER_DELAY - MAX_TAG_DELAY) // spf)
+
+        b = min(max(-(-s1 // spf), a + 1), self.frame_count)
+        delay = min(max(s0 - a * spf - DECODER_DELAY, 0), MAX_TAG_DELAY)
+        padding = min(max(b * spf - s1 + DECODER_DELAY, 0), MAX_TAG_DELAY)
+        return a, b, delay, padding
+
+    def _first_frame(self, s0):
+        """First frame a decoder needs to produce raw-stream sample `s0`.
+
+        The frame holding s0 needs its predecessor for the MDCT overlap, and
+        that one needs the earlier frames its main_data_begin points back into.
+        """
+        a = max(s0 // self.samples_per_frame - 1, 0)
+        needed = self.reservoir[a] if a < self.frame_count else 0
+        while needed > 0 and a > 0:
+            a -= 1
+            needed -= self.payloads[a]
+        return a
+
+    def seek_range(self, start_ms, end_ms):
+        """Where a player reading the source itself finds [start_ms, end_ms).
+
+        Returns `(byte_start, byte_end, skip_samples)`: decoding the frames in
+        bytes [byte_start, byte_end) of the file and dropping the first
+        `skip_samples` decoded samples (per channel, decoder delay included)
+        starts exactly on `start_ms`, with no tag or copy needed.
+        """
+        spf = self.samples_per_frame
+        s0 = self.sample_at(start_ms) + self.timeline_offset
+        s1 = max(self.sample_at(end_ms) + self.timeline_offset, s0)
+        a = min(self._first_frame(s0), self.frame_count - 1)
+        b = min(max(-(-s1 // spf), a + 1), self.frame_count)
+        return int(self.offsets[a]), int(self.offsets[b - 1] + self.sizes[b - 1]), int(s0 - a * spf)
+
+    def _tag_frame(self, a, b, delay, padding):
+        """Xing/Info frame + LAME tag describing frames [a, b) of the source."""
+        h = self.header
+        needed = 4 + h["side_info"] + _XING_SIZE + _LAME_SIZE
+        for bitrate_index in range(1, 15):
+            bitrate = _BITRATES_KBPS[h["mpeg1"]][bitrate_index] * 1000
+            size = (144 if h["mpeg1"] else 72) * bitrate // self.sample_rate
+            if size >= needed:
+                break
+
+        frame = bytearray(size)
+        first = self._first_header
+        # Same stream parameters, no CRC, no padding, and a bitrate big enough for the tag
+        frame[0:4] = bytes([0xFF, first[1] | 1, bitrate_index << 4 | h["rate_index"] << 2, first[3]])
+
+        sizes = self.sizes[a:b]
+        total_bytes = size + int(sizes.sum())
+        vbr = len(np.unique(self.bitrate_indexes[a:b])) > 1
+        before = np.concatenate(([0], np.cumsum(sizes, dtype=np.int64)))
+        pick = (np.arange(100) * (b - a)) // 100
+        toc = np.minimum((size + before[pick]) * 256 // total_bytes, 255).astype(np.uint8)
+
+        tag = 4 + h["side_info"]
+        frame[tag:tag + 4] = b"Xing" if vbr else b"Info"
+        struct.pack_into(">III", frame, tag + 4, _XING_FLAGS, b - a, total_bytes)
+        frame[tag + 16:tag + 116] = toc.tobytes()
+
+        lame = tag + _XING_SIZE
+        source = self.lame_tag or b"LAME3.100" + bytes(_LAME_SIZE - 9)
+        frame[lame:lame + 11] = source[:11]  # encoder version, revision, lowpass
+        frame[lame + 19:lame + 21] = source[19:21]  # encoding flags, bitrate
+        frame[lame + 21:lame + 24] = (delay << 12 | padding).to_bytes(3, "big")
+        frame[lame + 24:lame + 28] = source[24:28]  # misc, mp3gain, preset
+        struct.pack_into(">I", frame, lame + 28, total_bytes)
+        struct.pack_into(">H", frame, lame + 34, _crc16(frame[:lame + 34]))
+        return bytes(frame)
+
+    def cut_bytes(self, start_ms, end_ms):
+        """[start_ms, end_ms) of the source as a standalone MP3 (tag frame + copied frames)."""
+        a, b, delay, padding = self.frame_range(start_ms, end_ms)
+        frames = self._data[self.offsets[a]:self.offsets[b - 1] + self.sizes[b - 1]] if b > a else b""
+        return self._tag_frame(a, b, delay, padding) + frames
+
+    def cut(self, start_ms, end_ms, out_path):
+        """Write [start_ms, end_ms) of the source to `out_path` as copied frames.
+
+        Any range of at least one frame decodes to exactly the samples of the
+        full decode (see benchmark.py --verify). ffmpeg trims a shorter one
+        only at its end when its start and end fall in the same frame.
+        """
+        with open(out_path, "wb") as f:
+            f.write(self.cut_bytes(start_ms, end_ms))
+        return out_path
+
+    def transcode(self, start_ms, end_ms, out_path, format="mp3", bitrate=None):
+        """Re-encode [start_ms, end_ms) to `out_path`, decoding only the frames that range needs."""
+        return self.transcode_many([(start_ms, end_ms, out_path)], format, bitrate)[0]
+
+    def transcode_many(self, segments, format="mp3", bitrate=None):
+        """Re-encode several `(start_ms, end_ms, out_path)` ranges with one ffmpeg process.
+
+        The frames covering all of them are cut once and each range is trimmed
+        from that decode, sample exact, so the files match `transcode`'s.
+        """
+        from encoder import encode_batch
+        first = min(start for start, _, _ in segments)
+        last = max(max(end for _, end, _ in segments), first)
+        origin = self.sample_at(first)
+        return encode_batch(["-f", "mp3"], self.cut_bytes(first, last),
+                            [(self.sample_at(start) - origin, self.sample_at(end) - origin, out_path)
+                             for start, end, out_path in segments], format, bitrate)
+
+    def decode(self, start_ms, end_ms):
+        """int16 (frames, channels) PCM of [start_ms, end_ms), the same samples a full decode has there."""
+        channels = 1 if (self._first_header[3] >> 6) == 3 else 2
+        proc = subprocess.run(
+            [AudioSegment.converter, "-v", "error", "-f", "mp3", "-i", "-", "-f", "s16le",
+             "-acodec", "pcm_s16le", "-"],
+            input=self.cut_bytes(start_ms, end_ms), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if proc.returncode:
+            raise RuntimeError(f"ffmpeg could not decode {self.path}: {proc.stderr.decode(errors='replace')}")
+        usable = len(proc.stdout) - len(proc.stdout) % (2 * channels)
+        return np.frombuffer(proc.stdout[:usable], dtype=np.int16).reshape(-1, channels)
+
+    def close(self):
+        self._data.close()
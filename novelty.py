@@ -0,0 +1,102 @@
+import numpy as np
+
+# === NOVELTY SETTINGS ===
+FRAME_SECONDS = 0.4  # audio per feature frame (rounded to a power-of-two FFT size)
+N_MELS = 48
+KERNEL_SECONDS = 30  # music compared on each side of a candidate boundary
+MIN_TRACK_SEC = 60  # no two splits closer than this
+SENSITIVITY = 6.0  # how far (robust z-score) a novelty peak must stand out to count as a transition
+BLOCK_ROWS = 512  # self-similarity rows per matrix product
+PCM_BLOCK_FRAMES = 1 << 20  # samples of a decode turned into feature frames at once
+
+
+def frame_length(sr, frame_seconds=FRAME_SECONDS):
+    """Samples per feature frame: the power of two closest to `frame_seconds`."""
+    return 1 << int(round(np.log2(sr * frame_seconds)))
+
+
+def pcm_in_blocks(pcm, block_frames=PCM_BLOCK_FRAMES):
+    """A decode's int16 (frames, channels) samples as the same kind of blocks an ffmpeg stream gives."""
+    return (pcm[a:a + block_frames] for a in range(0, len(pcm), block_frames))
+
+
+def spectral_frames(blocks, sr, frame_len, n_mels=N_MELS):
+    """Log-mel and chroma of consecutive, non-overlapping `frame_len` frames of int16 `blocks`.
+
+    Frames are cut from one running buffer, so the result does not depend on
+    how the audio was blocked (a whole decode or an ffmpeg stream) and never
+    holds more than a block of it. Returns `(frames, samples)`: a float32
+    `(frame count, n_mels + 12)` array and how many samples went in.
+    """
+    import librosa
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=frame_len, n_mels=n_mels).astype(np.float32).T
+    chroma_basis = librosa.filters.chroma(sr=sr, n_fft=frame_len).astype(np.float32).T
+    window = np.hanning(frame_len).astype(np.float32)
+    rows, carry, samples = [], np.zeros(0, dtype=np.float32), 0
+    for block in blocks:
+        samples += len(block)
+        buffer = np.concatenate([carry, block.mean(axis=1, dtype=np.float32) * (1.0 / 32768)])
+        count = len(buffer) // frame_len
+        if count:
+            power = np.abs(np.fft.rfft(buffer[:count * frame_len].reshape(count, frame_len) * window)) ** 2
+            power = power.astype(np.float32)
+            mel = 10 * np.log10(power @ mel_basis + 1e-10)
+            chroma = power @ chroma_basis
+            chroma /= np.maximum(chroma.max(axis=1, keepdims=True), 1e-10)  # like chroma_stft's norm=inf
+            rows.append(np.hstack([mel, chroma]))
+        carry = buffer[count * frame_len:]
+    frames = np.concatenate(rows) if rows else np.zeros((0, n_mels + 12), dtype=np.float32)
+    return frames, samples
+
+
+def normalize(frames, n_mels=N_MELS):
+    """Unit-length frames in which timbre (mel) and harmony (chroma) weigh the same, so dot products are
+    cosine similarities."""
+    features = (frames - frames.mean(axis=0)) / np.maximum(frames.std(axis=0), 1e-6)
+    features[:, :n_mels] /= np.sqrt(n_mels)
+    features[:, n_mels:] /= np.sqrt(features.shape[1] - n_mels)
+    features /= np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-6)
+    return features.astype(np.float32)
+
+
+def similarity_band(features, width, block_rows=BLOCK_ROWS):
+    """`band[i, d]`: similarity of frames i and i + d for 0 <= d < `width` (0 past the end of the mix).
+
+    Only this diagonal band of the self-similarity matrix is computed, one
+    block of rows per matrix product, so time and memory grow linearly with
+    the length of the mix instead of with its square.
+    """
+    n = len(features)
+    band = np.zeros((n, width), dtype=np.float32)
+    lags = np.arange(width)
+    for first in range(0, n, block_rows):
+        last = min(first + block_rows, n)
+        reach = min(last + width - 1, n)
+        product = features[first:last] @ features[first:reach].T  # (rows, rows + width - 1)
+        rows = np.arange(last - first)[:, None]
+        cols = rows + lags
+        inside = cols < reach - first
+        band[first:last] = np.where(inside, product[rows, np.minimum(cols, reach - first - 1)], 0.0)
+    return band
+
+
+def checkerboard_novelty(band, half_width):
+    """Novelty at every frame: a Gaussian-tapered checkerboard kernel slid along the matrix diagonal.
+
+    The kernel rewards frames that resemble their own side of frame i and
+    differ from the other side. It only reaches `half_width` frames either
+    way, so it only needs the `band` (lags below 2 * half_width); the sum is
+    taken one lag (one band column) at a time.
+    """
+    n, width = band.shape
+    offsets = np.arange(-half_width, half_width)
+    weight = np.where(offsets < 0, -1.0, 1.0) * np.exp(-0.5 * (offsets / (0.5 * half_width)) ** 2)
+    padded = np.zeros((n + 2 * half_width, width), dtype=np.float64)
+    padded[half_width:half_width + n] = band
+    novelty = np.zeros(n)
+    for lag in range(min(width, 2 * half_width)):
+        kernel = np.zeros(2 * half_width)
+        kernel[:2 * half_width - lag] = weight[:2 * half_width - lag] * weight[lag:]
+        # Lags above 0 stand for both triangles of the symmetric matrix
+        novelty += (1 if lag == 0 else 2) * np.correlate(padded[:, lag], kernel, mode="valid")[:n]
+    return novelty / np.abs(np.outer(weight, weight)).sum()
@@ -0,0 +1,93 @@
+import matplotlib.pyplot as plt
+import json
+import os
+from cuesheet import write_virtual_split
+from encoder import extension
+from exporter import export_segments
+from featurecache import FeatureCache
+from manifest import SplitManifest
+from segmentation import MixFeatures, NoveltyDetector, cached_curve
+
+# === CONFIGURATION ===
+AUDIO_FILE = "funeralmix.mp3"
+OUTPUT_DIR = "novelty_splits"
+KERNEL_SECONDS = 30  # Music compared on each side of a candidate transition (longer = only bigger changes)
+MIN_TRACK_SEC = 60  # No two splits closer than this
+SENSITIVITY = 6.0  # How far a novelty peak must stand out (robust z-score); lower finds more transitions
+LOSSLESS_EXPORT = True  # Copy MP3 frames instead of re-encoding each track
+EXPORT_WORKERS = None  # Tracks written in parallel (None = one per CPU core)
+EXPORT_FORMAT = "mp3"  # mp3, flac, opus or wav (anything but mp3 is re-encoded)
+EXPORT_BITRATE = None  # e.g. "320k" for mp3/opus (None = encoder default)
+STREAMING = False  # Compute the spectral frames block by block from the file (flat memory for long mixes)
+VIRTUAL_SPLIT = False  # Write a .cue sheet and offsets into the mix instead of audio files
+RESUME = True  # Reuse boundaries and skip finished tracks of an earlier run (split_manifest.json)
+
+# === STEP 1-3: SPECTRAL FRAMES, SELF-SIMILARITY BAND AND NOVELTY PEAKS (frames cached per mix) ===
+print("🎵 Loading audio...")
+mix = MixFeatures(AUDIO_FILE, FeatureCache(), STREAMING)
+detector = NoveltyDetector(KERNEL_SECONDS, MIN_TRACK_SEC, SENSITIVITY)
+manifest = None
+if RESUME and not VIRTUAL_SPLIT:
+    # Checkpoint of this run; a rerun (after a crash or a tweak) only redoes what is missing or changed
+    manifest = SplitManifest(OUTPUT_DIR, AUDIO_FILE, "novelty", {
+        "kernel_sec": KERNEL_SECONDS, "min_track_sec": MIN_TRACK_SEC, "sensitivity": SENSITIVITY})
+ranges = manifest.boundaries(lambda: detector.ranges(mix)) if manifest else detector.ranges(mix)
+# A resumed run never decodes for the graph: it is redrawn only if the feature cache has the frames
+curve = cached_curve(detector, mix) if manifest and manifest.resumed else detector.curve(mix)
+split_times = [start / 1000 for start, _ in ranges[1:]]
+print(mix.summary())
+
+# === STEP 4: EXPORT SPLITS ===
+print(f"\n✂️ Splitting into {len(ranges)} segments...")
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+segments_metadata = []
+
+if VIRTUAL_SPLIT:
+    # The cue sheet and split_timestamps.json (with offsets) replace the audio files
+    cue_path, segments_metadata = write_virtual_split(AUDIO_FILE, ranges, OUTPUT_DIR)
+    print(f"✅ Cue sheet: {cue_path}")
+else:
+    paths = [os.path.join(OUTPUT_DIR, f"track_{i+1:02}{extension(EXPORT_FORMAT)}") for i in range(len(ranges))]
+    for i, start, end, filepath in export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded,
+                                                   LOSSLESS_EXPORT, EXPORT_WORKERS, format=EXPORT_FORMAT,
+                                                   bitrate=EXPORT_BITRATE, manifest=manifest):
+        filename = os.path.basename(filepath)
+        print(f"✅ Exported: {filename} ({start//1000}s → {end//1000}s)")
+
+        segments_metadata.append({
+            "track": i + 1,
+            "filename": filename,
+            "start_sec": start // 1000,
+            "end_sec": end // 1000,
+            "duration_sec": (end - start) // 1000
+        })
+
+# === STEP 5: EXPORT TIMESTAMPS TO JSON & TXT ===
+if not VIRTUAL_SPLIT:
+    with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w") as f:
+        json.dump(segments_metadata, f, indent=2)
+
+with open(os.path.join(OUTPUT_DIR, "split_timestamps.txt"), "w") as f:
+    for segment in segments_metadata:
+      f.write(f"Track {segment['track']:02}: {segment['start_sec']}s -> {segment['end_sec']}s ({segment['duration_sec']}s)\n")
+
+# === STEP 6: PLOT NOVELTY ===
+if curve is not None:
+    times, novelty = curve
+    plt.figure(figsize=(14, 5))
+    plt.plot(times, novelty, label="Novelty")
+    for split in split_times:
+        plt.axvline(x=split, color='r', linestyle='--', alpha=0.5)
+    plt.title("Timbre and Harmony Changes Over Time")
+    plt.xlabel("Time (s)")
+    plt.ylabel("Novelty")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(OUTPUT_DIR, "novelty_plot.png"))
+    plt.show()
+else:
+    print("ℹ️ Resumed without the spectral frames in the feature cache: kept the novelty graph of the previous run")
+
+print("\n📁 All tracks, timestamp logs, and novelty graph saved to:", OUTPUT_DIR)
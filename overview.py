@@ -0,0 +1,138 @@
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from envelope import SILENCE_FLOOR_DBFS
+from streaming import pcm_blocks
+
+BASE_MS = 1  # finest zoom level: one min/max/RMS bin per millisecond
+LEVEL_FACTOR = 4  # each coarser level merges this many bins
+MIN_LEVEL_BINS = 1024  # stop adding levels once a level is this small
+
+
+def _merge(level, factor):
+    """The next coarser level: min of mins, max of maxes, mean of mean squares."""
+    n = len(level["min"])
+    starts = np.arange(0, n, factor)
+    counts = np.diff(np.append(starts, n))
+    return {
+        "min": np.minimum.reduceat(level["min"], starts),
+        "max": np.maximum.reduceat(level["max"], starts),
+        "ms": (np.add.reduceat(level["ms"], starts, dtype=np.float64) / counts).astype(np.float32),
+    }
+
+
+class Overview:
+    """Min/max/RMS level-of-detail pyramid of a mix, for plots that zoom without recomputing.
+
+    Level 0 has one bin per BASE_MS (rounded to whole frames); every level
+    above merges LEVEL_FACTOR bins. Amplitudes are normalized to full scale,
+    `ms` is the mean square so levels combine exactly and RMS/dBFS is derived
+    at draw time. A 4 hour mix is ~115 MB at level 0, ~150 MB in total.
+    """
+
+    def __init__(self, levels, bin_seconds, duration):
+        self.levels = levels
+        self.bin_seconds = bin_seconds
+        self.duration = duration
+
+    @classmethod
+    def build(cls, path, base_ms=BASE_MS):
+        """Scan `path` block by block (never holding the whole mix) into a pyramid."""
+        sample_rate, channels, blocks = pcm_blocks(path)
+        bin_frames = max(1, round(sample_rate * base_ms / 1000))
+        mins, maxs, mean_squares = [], [], []
+        carry = np.zeros((0, channels), dtype=np.int16)
+        total_frames = 0
+        for block in blocks:
+            total_frames += len(block)
+            pcm = np.concatenate((carry, block)) if len(carry) else block
+            whole = len(pcm) - len(pcm) % bin_frames
+            carry = pcm[whole:]
+            if whole:
+                bins = pcm[:whole].reshape(-1, bin_frames * channels)
+                mins.append(bins.min(axis=1))
+                maxs.append(bins.max(axis=1))
+                mean_squares.append(np.square(bins, dtype=np.float64).mean(axis=1) / 32768.0 ** 2)
+        if len(carry):
+            mins.append(carry.min(keepdims=True).reshape(1))
+            maxs.append(carry.max(keepdims=True).reshape(1))
+            mean_squares.append(np.square(carry, dtype=np.float64).mean(keepdims=True).reshape(1) / 32768.0 ** 2)
+
+        level = {
+            "min": np.concatenate(mins or [np.zeros(0)]).astype(np.int16),
+            "max": np.concatenate(maxs or [np.zeros(0)]).astype(np.int16),
+            "ms": np.concatenate(mean_squares or [np.zeros(0)]).astype(np.float32),
+        }
+        levels = [level]
+        while len(levels[-1]["min"]) > MIN_LEVEL_BINS:
+            levels.append(_merge(levels[-1], LEVEL_FACTOR))
+        return cls(levels, bin_frames / sample_rate, total_frames / sample_rate)
+
+    @classmethod
+    def load(cls, path, cache=None, base_ms=BASE_MS):
+        """The pyramid for `path`, built once and then served from a FeatureCache."""
+        features = cache.get(path, "overview", base_ms=base_ms) if cache else None
+        if features is None:
+            overview = cls.build(path, base_ms)
+            if cache:
+                cache.put(path, "overview", overview.to_features(), base_ms=base_ms)
+            return overview
+        levels = [{key: features[f"{key}_{k}"] for key in ("min", "max", "ms")}
+                  for k in range(int(features["level_count"]))]
+        return cls(levels, float(features["bin_seconds"]), float(features["duration"]))
+
+    def to_features(self):
+        features = {"level_count": len(self.levels), "bin_seconds": self.bin_seconds,
+                    "duration": self.duration}
+        for k, level in enumerate(self.levels):
+            features.update({f"{key}_{k}": values for key, values in level.items()})
+        return features
+
+    def view(self, start, end, width):
+        """Bins covering `[start, end)` seconds at about `width` points (at least `width` when possible).
+
+        Returns `(times, mins, maxs, dbfs)` with amplitudes in [-1, 1].
+        """
+        start, end = max(0.0, start), min(end, self.duration)
+        k = 0
+        while k + 1 < len(self.levels) and \
+                (end - start) / (self.bin_seconds * LEVEL_FACTOR ** (k + 1)) >= width:
+            k += 1
+        bin_seconds = self.bin_seconds * LEVEL_FACTOR ** k
+        level = self.levels[k]
+        a = int(start / bin_seconds)
+        b = min(int(np.ceil(end / bin_seconds)), len(level["min"]))
+        times = np.arange(a, b) * bin_seconds
+        ms = level["ms"][a:b].astype(np.float64)
+        with np.errstate(divide="ignore"):
+            dbfs = np.maximum(10 * np.log10(ms), SILENCE_FLOOR_DBFS)
+        return times, level["min"][a:b] / 32768.0, level["max"][a:b] / 32768.0, dbfs
+
+
+def figure_image(fig):
+    """Render a matplotlib Figure with Agg (safe off the Tk thread) into a PIL image."""
+    from PIL import Image
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    return Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+
+
+def render(overview, start, end, width_px, height_px, threshold_dbfs=-45, dpi=100):
+    """Waveform and loudness of `[start, end)` seconds at screen resolution, as a PIL image."""
+    times, mins, maxs, dbfs = overview.view(start, end, width_px)
+    fig = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi)
+    wave, loud = fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": [1, 2]})
+    wave.fill_between(times, mins, maxs, step="post", linewidth=0)
+    wave.set_ylim(-1, 1)
+    wave.set_yticks([])
+    loud.plot(times, dbfs, drawstyle="steps-post", label="Volume (dBFS)")
+    loud.axhline(y=threshold_dbfs, color='r', linestyle='--', label=f'Suggested Threshold ({threshold_dbfs} dBFS)')
+    loud.set_xlim(start, end)
+    loud.set_ylim(SILENCE_FLOOR_DBFS, 0)
+    loud.set_xlabel("Time (seconds)")
+    loud.set_ylabel("Volume (dBFS)")
+    loud.grid(True)
+    loud.legend(loc="lower right")
+    fig.tight_layout()
+    return figure_image(fig)
@@ -0,0 +1,100 @@
+import numpy as np
+
+# === PHRASE SETTINGS ===
+BEATS_PER_BAR = 4
+PHRASE_BARS = 16  # bars compared on each side of a candidate boundary (8, 16 or 32)
+DOWNBEAT_WINDOW_BARS = 8  # bars around each beat that vote on where the bar starts
+MIN_TRACK_SEC = 60  # no two splits closer than this
+SENSITIVITY = 4.0  # how far (robust z-score) a boundary must stand out from the mix's typical phrase change
+
+
+def _window_sums(values, before, after):
+    """Sum of `values[..., i - before : i + after]` (clipped to the array) at every i of the last axis."""
+    n = values.shape[-1]
+    prefix = np.zeros(values.shape[:-1] + (n + 1,))
+    np.cumsum(values, axis=-1, out=prefix[..., 1:])
+    i = np.arange(n)
+    return prefix[..., np.clip(i + after, 0, n)] - prefix[..., np.clip(i - before, 0, n)]
+
+
+def downbeats(strength, beats_per_bar=BEATS_PER_BAR, window_bars=DOWNBEAT_WINDOW_BARS):
+    """Indices of the beats that start a bar.
+
+    Each of the `beats_per_bar` phases (every 4th beat from 0, 1, 2, 3...)
+    sums the `strength` of its beats over the `window_bars` bars around every
+    beat; the strongest phase there is the downbeat. The vote is local, so
+    the bar grid can shift where one track hands over to the next.
+    """
+    strength = np.asarray(strength, dtype=np.float64)
+    phase_of = np.arange(len(strength)) % beats_per_bar
+    by_phase = np.where(phase_of == np.arange(beats_per_bar)[:, None], strength, 0.0)
+    half = window_bars * beats_per_bar // 2
+    phase = np.argmax(_window_sums(by_phase, half, half), axis=0)
+    return np.flatnonzero(phase_of == phase)
+
+
+def beat_features(beat_times, onset_env, frame_rate, energy):
+    """One row per beat interval: loudness (dBFS), mean onset strength and log beat length.
+
+    `onset_env` has `frame_rate` frames a second; loudness comes from the
+    mix's EnergyIndex, on its step grid.
+    """
+    beat_times = np.asarray(beat_times, dtype=np.float64)
+    step = energy.step_ms
+    edges_ms = np.minimum(np.round(beat_times * 1000 / step) * step, energy.length_ms // step * step)
+    loudness = energy.dbfs(edges_ms[:-1].astype(np.int64), np.maximum(edges_ms[1:], edges_ms[:-1]).astype(np.int64))
+
+    onset_env = np.asarray(onset_env, dtype=np.float64)
+    frames = np.clip(np.round(beat_times * frame_rate).astype(np.int64), 0, len(onset_env))
+    prefix = np.concatenate([[0.0], np.cumsum(onset_env)])
+    onsets = (prefix[frames[1:]] - prefix[frames[:-1]]) / np.maximum(frames[1:] - frames[:-1], 1)
+
+    lengths = np.log(np.maximum(np.diff(beat_times), 1e-3))
+    return np.column_stack([loudness, onsets, lengths])
+
+
+def standardize(features):
+    """Robust z-scores per column (median and MAD), so no one feature's units dominate."""
+    median = np.median(features, axis=0)
+    mad = 1.4826 * np.median(np.abs(features - median), axis=0)
+    return (features - median) / np.where(mad > 1e-9, mad, 1.0)
+
+
+def boundary_scores(bar_features, phrase_bars=PHRASE_BARS):
+    """How much the music changes at each bar line: distance between the mean of the
+    `phrase_bars` bars before it and the `phrase_bars` bars after it (index b = start of bar b)."""
+    n = len(bar_features)
+    prefix = np.zeros((n + 1, bar_features.shape[1]))
+    np.cumsum(bar_features, axis=0, out=prefix[1:])
+    b = np.arange(n)
+    lo, hi = np.maximum(b - phrase_bars, 0), np.minimum(b + phrase_bars, n)
+    before = (prefix[b] - prefix[lo]) / np.maximum(b - lo, 1)[:, None]
+    after = (prefix[hi] - prefix[b]) / np.maximum(hi - b, 1)[:, None]
+    scores = np.linalg.norm(after - before, axis=1)
+    scores[0] = 0.0  # nothing before the first bar
+    return scores
+
+
+def pick_boundaries(times, scores, phrase_bars=PHRASE_BARS, min_gap_sec=MIN_TRACK_SEC, sensitivity=SENSITIVITY,
+                    duration=None):
+    """Split times (s) among bar lines `times`: phrase-scale peaks of `scores`, strongest first.
+
+    A bar line qualifies if it is the highest score within a phrase on either
+    side and stands `sensitivity` robust deviations above the median; of
+    those, the strongest are kept that are at least `min_gap_sec` from each
+    other and from both ends of the mix.
+    """
+    from scipy.ndimage import maximum_filter1d
+    if not len(scores):
+        return []
+    duration = times[-1] if duration is None else duration
+    median = np.median(scores)
+    spread = 1.4826 * np.median(np.abs(scores - median)) or 1.0
+    peaks = (scores >= maximum_filter1d(scores, 2 * phrase_bars + 1, mode="constant")) & \
+            ((scores - median) / spread >= sensitivity) & \
+            (times >= min_gap_sec) & (times <= duration - min_gap_sec)
+    chosen = []
+    for i in np.flatnonzero(peaks)[np.argsort(-scores[peaks], kind="stable")]:
+        if all(abs(times[i] - t) >= min_gap_sec for t in chosen):
+            chosen.append(float(times[i]))
+    return sorted(chosen)
@@ -1,26 +1,38 @@
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
 import os
+from cuesheet import write_virtual_split
+from encoder import extension
+from exporter import export_segments
+from segmentation import MixFeatures, SilenceDetector
 
-# Load your MP3 file
-audio = AudioSegment.from_mp3("funeralmix.mp3")
+AUDIO_FILE = "funeralmix.mp3"
+LOSSLESS_EXPORT = True  # Copy MP3 frames instead of re-encoding each song
+EXPORT_WORKERS = None  # Tracks written in parallel (None = one per CPU core)
+EXPORT_FORMAT = "mp3"  # mp3, flac, opus or wav (anything but mp3 is re-encoded)
+EXPORT_BITRATE = None  # e.g. "320k" for mp3/opus (None = encoder default)
+VIRTUAL_SPLIT = False  # Write a .cue sheet and offsets into the mix instead of audio files
+
+# Load your MP3 file (decoded once, on first use)
+mix = MixFeatures(AUDIO_FILE)
 
 # Optional: Normalize audio to make silence detection more consistent
-# audio = match_target_amplitude(audio, -20.0)
+# audio = match_target_amplitude(mix.audio, -20.0)
 
-# Split on silence
-chunks = split_on_silence(
-    audio,
+# Split on silence (same chunks as pydub's split_on_silence, kept as time ranges)
+ranges = SilenceDetector(
     min_silence_len=1500,     # silence must be at least 1.5 seconds long
     silence_thresh=-40        # adjust based on your audio volume
-)
+).ranges(mix)
 
 # Create output folder
 output_folder = "split_songs"
 os.makedirs(output_folder, exist_ok=True)
 
-# Export each chunk
-for i, chunk in enumerate(chunks):
-    out_file = os.path.join(output_folder, f"song_{i+1}.mp3")
-    chunk.export(out_file, format="mp3")
-    print(f"Exported {out_file}")
+# Export each chunk (or only describe them)
+if VIRTUAL_SPLIT:
+    cue_path, _ = write_virtual_split(AUDIO_FILE, ranges, output_folder)
+    print(f"Cue sheet for {len(ranges)} songs: {cue_path}")
+else:
+    paths = [os.path.join(output_folder, f"song_{i+1}{extension(EXPORT_FORMAT)}") for i in range(len(ranges))]
+    for _, _, _, out_file in export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded, LOSSLESS_EXPORT, EXPORT_WORKERS,
+                                             format=EXPORT_FORMAT, bitrate=EXPORT_BITRATE):
+        print(f"Exported {out_file}")
@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its finished children (ffmpeg), in MB."""
+    try:
+        import resource
+    except ImportError:
+        return None, None  # not available on Windows
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20
+    return round(own, 1), round(children, 1)
+
+
+def io_bytes():
+    """`(read, written)` bytes this process has moved so far, pipes to ffmpeg included; None if unknown."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+        return counters.read_chars, counters.write_chars
+    except (ImportError, AttributeError):
+        return None, None
+
+
+def _cpu_seconds():
+    """CPU time of this process plus every ffmpeg child it has waited for."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class RunProfile:
+    """Wall time, CPU time, peak memory and I/O per stage of one tool run.
+
+    Stages nest (the onset stage triggers the decode stage, say); each one
+    reports only its own share, so the stage times add up to the run. Memory
+    is the process high-water mark, so a stage reports how much it raised
+    it (`peak_rss_growth_mb`) next to the run's peak so far. Export
+    segments are timed one by one from the threads that write them.
+    """
+
+    def __init__(self, tool, input_path=None, **settings):
+        self.tool = tool
+        self.input_path = input_path
+        self.settings = settings
+        self.stages = []
+        self.segments = []
+        self._stack = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._cpu_started = _cpu_seconds()
+
+    @contextmanager
+    def stage(self, name):
+        read, written = io_bytes()
+        frame = {"name": name, "wall": time.perf_counter(), "cpu": _cpu_seconds(), "peak": peak_rss_mb()[0],
+                 "read": read, "written": written, "child_wall": 0.0, "child_cpu": 0.0, "child_growth": 0.0,
+                 "child_read": 0, "child_written": 0}
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            wall = time.perf_counter() - frame["wall"]
+            cpu = _cpu_seconds() - frame["cpu"]
+            peak = peak_rss_mb()[0]
+            growth = peak - frame["peak"] if peak is not None else None
+            read, written = io_bytes()
+            read = read - frame["read"] if read is not None else None
+            written = written - frame["written"] if written is not None else None
+            if self._stack:
+                parent = self._stack[-1]
+                parent["child_wall"] += wall
+                parent["child_cpu"] += cpu
+                parent["child_growth"] += growth or 0.0
+                parent["child_read"] += read or 0
+                parent["child_written"] += written or 0
+            self.stages.append({
+                "stage": name,
+                "wall_seconds": round(wall - frame["child_wall"], 3),
+                "cpu_seconds": round(cpu - frame["child_cpu"], 3),
+                # ru_maxrss only ever rises: how far this stage pushed it, and where it stood after
+                "peak_rss_growth_mb": round(growth - frame["child_growth"], 1) if growth is not None else None,
+                "run_peak_rss_mb": peak,
+                "bytes_read": read - frame["child_read"] if read is not None else None,
+                "bytes_written": written - frame["child_written"] if written is not None else None,
+            })
+
+    def segment(self, index, start_ms, end_ms, seconds, out_path):
+        """Record one exported segment (called from export worker threads)."""
+        size = os.path.getsize(out_path) if os.path.exists(out_path) else None
+        with self._lock:
+            self.segments.append({"index": index, "start_ms": int(start_ms), "end_ms": int(end_ms),
+                                  "seconds": round(seconds, 3), "bytes_written": size})
+
+    def timed(self, exported):
+        """Pass `(index, start_ms, end_ms, out_path)` results through, timing each one as it arrives.
+
+        For streaming exports, where a segment is done when the stream gets past it.
+        """
+        last = time.perf_counter()
+        for index, start_ms, end_ms, out_path in exported:
+            now = time.perf_counter()
+            self.segment(index, start_ms, end_ms, now - last, out_path)
+            last = now
+            yield index, start_ms, end_ms, out_path
+
+    def to_dict(self):
+        own_peak, children_peak = peak_rss_mb()
+        segments = sorted(self.segments, key=lambda s: s["index"])
+        seconds = [s["seconds"] for s in segments]
+        return {
+            "tool": self.tool,
+            "input": self.input_path,
+            "settings": self.settings,
+            "cpu_count": os.cpu_count(),
+            "wall_seconds": round(time.perf_counter() - self._started, 3),
+            "cpu_seconds": round(_cpu_seconds() - self._cpu_started, 3),
+            "peak_rss_mb": own_peak,
+            "children_peak_rss_mb": children_peak,
+            "stages": self.stages,
+            "export": {
+                "segments": len(segments),
+                "total_seconds": round(sum(seconds), 3),
+                "slowest_seconds": max(seconds, default=None),
+                "bytes_written": sum(s["bytes_written"] or 0 for s in segments),
+            },
+            "segments": segments,
+        }
+
+    def summary(self):
+        """A few lines for the result box."""
+        profile = self.to_dict()
+        lines = [f"⏱️ {profile['wall_seconds']:.1f}s wall, {profile['cpu_seconds']:.1f}s CPU"
+                 + (f", {profile['peak_rss_mb']:.0f} MB peak" if profile["peak_rss_mb"] else "")]
+        for stage in self.stages:
+            line = f"  {stage['stage']}: {stage['wall_seconds']:.2f}s ({stage['cpu_seconds']:.2f}s CPU)"
+            if stage["bytes_read"] is not None:
+                line += f", {stage['bytes_read'] / 2**20:.0f} MB in / {stage['bytes_written'] / 2**20:.0f} MB out"
+            if stage["peak_rss_growth_mb"]:
+                line += f", peak +{stage['peak_rss_growth_mb']:.0f} MB"
+            lines.append(line)
+        export = profile["export"]
+        if export["segments"]:
+            lines.append(f"  {export['segments']} segments: {export['total_seconds']:.1f}s in total, "
+                         f"slowest {export['slowest_seconds']:.2f}s, {export['bytes_written'] / 2**20:.0f} MB written")
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+@contextmanager
+def stage(profile, name):
+    """`profile.stage(name)`, or nothing when there is no profile."""
+    if profile is None:
+        yield
+    else:
+        with profile.stage(name):
+            yield
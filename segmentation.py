@@ -0,0 +1,462 @@
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+
+from decoded import DecodedAudio
+from envelope import ENERGY_STEP_MS, EnergyIndex, dbfs_envelope, pause_splits, quietest_ms, silence_split_ranges
+from featurecache import FeatureCache
+from novelty import FRAME_SECONDS, KERNEL_SECONDS
+from novelty import MIN_TRACK_SEC as NOVELTY_MIN_TRACK_SEC, SENSITIVITY as NOVELTY_SENSITIVITY
+from phrases import BEATS_PER_BAR, MIN_TRACK_SEC, PHRASE_BARS, SENSITIVITY
+from profiling import stage
+
+HOP_LENGTH = 512
+
+
+class MixFeatures:
+    """Everything the detectors look at for one mix, each computed at most once.
+
+    The file is decoded once (on first need) and that decode feeds the energy
+    index every dBFS envelope is derived from, pydub's silence scan and a
+    single mel spectrogram that both onset envelopes (mean for tempo, median
+    for beat tracking, exactly as `onset_strength(y=...)` and
+    `beat_track(y=...)` would build them) derive from. With a `cache`,
+    features already computed on an earlier run are loaded instead and the mix
+    may never be decoded at all. With `stream`, the energy index and both
+    onset envelopes are computed block by block from an ffmpeg pipe instead
+    (same values, bounded memory). A `profile`
+    (profiling.RunProfile) gets one stage per feature computed or loaded.
+    """
+
+    def __init__(self, path, cache=None, stream=False, profile=None):
+        self.path = path
+        self.cache = cache
+        self.stream = stream
+        self.profile = profile
+        self._decoded = None
+        self._info = None  # (sample_rate, channels) when only regions were decoded
+        self._mel_db = {}
+        self._streamed_onsets = {}
+        self._features = {}
+        self._cached_only = False
+
+    @contextmanager
+    def cached_only(self):
+        """Within this block a feature that is neither computed yet nor in the cache raises LookupError
+        instead of being computed, so nothing is decoded or analysed."""
+        self._cached_only = True
+        try:
+            yield
+        finally:
+            self._cached_only = False
+
+    @property
+    def decoded(self):
+        if self._decoded is None:
+            if self._cached_only:
+                raise LookupError("the mix is not decoded")
+            with stage(self.profile, "decode"):
+                self._decoded = DecodedAudio.load(self.path)
+        return self._decoded
+
+    @property
+    def audio(self):
+        return self.decoded.audio
+
+    @property
+    def audio_if_decoded(self):
+        """The AudioSegment if something already needed it, else None (export can then cut or stream)."""
+        return self._decoded.audio if self._decoded else None
+
+    def _cached(self, kind, compute, **params):
+        key = (kind, tuple(sorted(params.items())))
+        if key not in self._features:
+            features = None
+            if self.cache:
+                with stage(self.profile, f"{kind} (cache)"):
+                    features = self.cache.get(self.path, kind, **params)
+            if features is None and self._cached_only:
+                raise LookupError(f"{kind} is not in the feature cache")
+            if features is None:
+                with stage(self.profile, kind):
+                    features = compute()
+                    if self.cache:
+                        features = self.cache.put(self.path, kind, features, **params)
+            self._features[key] = features
+        return self._features[key]
+
+    def energy(self, step_ms=ENERGY_STEP_MS):
+        """The mix's EnergyIndex: built once from the decode (or the stream), then cached."""
+        def compute():
+            if self._streaming():
+                from streaming import pcm_blocks
+                sample_rate, channels, blocks = pcm_blocks(self.path)
+                return EnergyIndex.build(blocks, sample_rate, channels, step_ms).to_features()
+            return EnergyIndex.from_audio(self.audio, step_ms).to_features()
+        return EnergyIndex.from_features(self._cached("energy", compute, step_ms=step_ms))
+
+    def dbfs(self, chunk_ms=100):
+        """`(volumes, length_ms)` of the pydub-compatible dBFS envelope.
+
+        Window sizes on the energy index grid (multiples of 10 ms) are derived
+        from the index, so trying another `chunk_ms` never rescans the mix.
+        """
+        if chunk_ms % ENERGY_STEP_MS == 0:
+            index = self.energy()
+            if index.covers(chunk_ms):
+                with stage(self.profile, "dbfs (from energy index)"):
+                    return index.envelope(chunk_ms)[1], index.length_ms
+
+        def compute():
+            if self._streaming():
+                from streaming import stream_dbfs_envelope
+                volumes, length_ms = stream_dbfs_envelope(self.path, chunk_ms)
+                return {"volumes": volumes, "length_ms": length_ms}
+            _, volumes = dbfs_envelope(self.audio, chunk_ms)
+            return {"volumes": volumes, "length_ms": len(self.audio)}
+        features = self._cached("dbfs", compute, chunk_ms=chunk_ms)
+        return np.asarray(features["volumes"]), int(features["length_ms"])
+
+    def pcm_region(self, start_ms, end_ms):
+        """`(pcm, sample_rate)` of `[start_ms, end_ms)` as int16 (frames, channels).
+
+        A slice of the decode if there is one, otherwise only that stretch is
+        decoded (the envelope came from the cache, or was streamed).
+        """
+        if self._decoded is not None:
+            sr = self.decoded.sr
+            a, b = int(start_ms * sr / 1000.0), int(end_ms * sr / 1000.0)
+            return self.decoded.pcm[a:b], sr
+        from streaming import decode_region
+        if self._info is None:
+            from pydub.utils import mediainfo
+            info = mediainfo(self.path)
+            self._info = int(info["sample_rate"]), int(info["channels"])
+        return decode_region(self.path, start_ms, end_ms, *self._info), self._info[0]
+
+    def mel_db(self, hop_length=HOP_LENGTH):
+        """Log-power mel spectrogram, the shared first stage of every onset envelope."""
+        if hop_length not in self._mel_db:
+            import librosa
+            with stage(self.profile, "mel"):
+                mel = librosa.feature.melspectrogram(y=self.decoded.float32(), sr=self.decoded.sr,
+                                                     hop_length=hop_length)
+                self._mel_db[hop_length] = librosa.power_to_db(mel)
+        return self._mel_db[hop_length]
+
+    def streamed_onsets(self, hop_length=HOP_LENGTH):
+        """Mean and median onset envelopes from one bounded-memory pass (see streaming)."""
+        if hop_length not in self._streamed_onsets:
+            from streaming import stream_onset_envelopes
+            with stage(self.profile, "onset pass (streamed)"):
+                self._streamed_onsets[hop_length] = stream_onset_envelopes(self.path, hop_length)
+        return self._streamed_onsets[hop_length]
+
+    def _streaming(self):
+        return self.stream and self._decoded is None
+
+    def onset(self, hop_length=HOP_LENGTH):
+        """`onset_env`, `sr` and `duration_sec`, as transitionenergy has always computed them."""
+        def compute():
+            import librosa
+            if self._streaming():
+                streamed = self.streamed_onsets(hop_length)
+                return {"onset_env": streamed["mean"], "sr": streamed["sr"],
+                        "duration_sec": streamed["duration_sec"]}
+            return {
+                "onset_env": librosa.onset.onset_strength(S=self.mel_db(hop_length), sr=self.decoded.sr,
+                                                          hop_length=hop_length),
+                "sr": self.decoded.sr,
+                "duration_sec": self.decoded.duration,
+            }
+        return self._cached("onset", compute, sr=None, hop_length=hop_length)
+
+    def beats(self, hop_length=HOP_LENGTH):
+        """`beat_frames`, `sr` and `duration_sec` from the same beat tracker as beatsplit."""
+        def compute():
+            import librosa
+            if self._streaming():
+                streamed = self.streamed_onsets(hop_length)
+                onset_env, sr, duration = streamed["median"], streamed["sr"], streamed["duration_sec"]
+            else:
+                onset_env = librosa.onset.onset_strength(S=self.mel_db(hop_length), sr=self.decoded.sr,
+                                                         hop_length=hop_length, aggregate=np.median)
+                sr, duration = self.decoded.sr, self.decoded.duration
+            from tempo import global_tempo
+            # beat_track's own tempo estimate would hold a tempogram of the whole mix
+            _, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=hop_length,
+                                                     bpm=global_tempo(onset_env, sr, hop_length))
+            return {"beat_frames": beat_frames, "sr": sr, "duration_sec": duration}
+        return self._cached("beats", compute, sr=None, hop_length=hop_length)
+
+    def tempos(self, window_seconds=10, overlap=0.0, hop_length=HOP_LENGTH):
+        """Per-window `tempos` (BPM) and their start `times`, from one tempogram pass."""
+        def compute():
+            from tempo import window_tempos
+            onset = self.onset(hop_length)
+            tempos, times = window_tempos(onset["onset_env"], int(onset["sr"]), hop_length,
+                                          window_seconds, overlap)
+            return {"tempos": tempos, "times": times}
+        return self._cached("tempos", compute, sr=None, hop_length=hop_length,
+                            window_seconds=window_seconds, overlap=overlap)
+
+    def spectral(self, frame_seconds=FRAME_SECONDS):
+        """Float32 log-mel + chroma `frames` (one per `frame_length` samples), `sr` and `duration_sec`.
+
+        Cut block by block from the decode, or from the stream, so neither a
+        spectrogram of the whole mix nor (streaming) the mix itself is held.
+        """
+        def compute():
+            from novelty import frame_length, pcm_in_blocks, spectral_frames
+            if self._streaming():
+                from streaming import pcm_blocks
+                sr, _, blocks = pcm_blocks(self.path)
+            else:
+                sr, blocks = self.decoded.sr, pcm_in_blocks(self.decoded.pcm)
+            length = frame_length(sr, frame_seconds)
+            frames, samples = spectral_frames(blocks, sr, length)
+            return {"frames": frames, "sr": sr, "frame_length": length, "duration_sec": samples / sr}
+        return self._cached("spectral", compute, frame_seconds=frame_seconds)
+
+    def summary(self):
+        if self._decoded:
+            return self._decoded.summary()
+        if self._streamed_onsets:
+            return "Analysed in streamed blocks; the mix was never held in memory."
+        return "Everything came from the feature cache."
+
+
+# === DETECTORS ===
+class SilenceDetector:
+    """process.py: the chunks `pydub.silence.split_on_silence` would return."""
+
+    name = "silence"
+
+    def __init__(self, min_silence_len=1500, silence_thresh=-40, keep_silence=100):
+        self.min_silence_len = min_silence_len
+        self.silence_thresh = silence_thresh
+        self.keep_silence = keep_silence
+
+    def ranges(self, mix):
+        audio = mix.audio
+        with stage(mix.profile, "silence"):
+            return silence_split_ranges(audio, self.min_silence_len, self.silence_thresh, self.keep_silence)
+
+
+class LowVolumeDetector:
+    """lowvolume.py / timestamps.py: split after every sustained low-volume run.
+
+    The `chunk_ms` envelope only finds the pauses. With `refine`, each cut then
+    moves to the quietest millisecond of the pause it came from, found by
+    looking at just those `pause_ms` of samples.
+    """
+
+    name = "low_volume"
+
+    def __init__(self, min_dbfs=-35, pause_ms=2000, chunk_ms=100, min_song_ms=10000, refine=True):
+        self.min_dbfs = min_dbfs
+        self.pause_ms = pause_ms
+        self.chunk_ms = chunk_ms
+        self.min_song_ms = min_song_ms
+        self.refine = refine
+
+    def ranges(self, mix):
+        volumes, length = mix.dbfs(self.chunk_ms)
+        splits = [0]
+        for point in pause_splits(volumes, self.chunk_ms, self.min_dbfs, self.pause_ms):
+            if point - splits[-1] >= self.min_song_ms:
+                splits.append(point)
+        if self.refine:
+            with stage(mix.profile, "refine"):
+                splits[1:] = [self.refine_split(mix, point, length) for point in splits[1:]]
+        splits.append(length)
+        return list(zip(splits[:-1], splits[1:]))
+
+    def refine_split(self, mix, point, length):
+        """The quietest ms among the windows that made up the pause ending at `point`."""
+        windows_needed = max(1, int(np.ceil(self.pause_ms / self.chunk_ms)))
+        start = max(0, point - (windows_needed - 1) * self.chunk_ms)
+        end = min(length, point + self.chunk_ms)
+        pcm, sr = mix.pcm_region(start, end)
+        return start + quietest_ms(pcm, sr)
+
+
+class BeatGapDetector:
+    """beatsplit.py: split on every beat that follows a gap of at least `min_gap` seconds."""
+
+    name = "beat_gap"
+
+    def __init__(self, min_gap=0):
+        self.min_gap = min_gap
+
+    def ranges(self, mix):
+        import librosa
+        beats = mix.beats()
+        beat_times = librosa.frames_to_time(beats["beat_frames"], sr=int(beats["sr"]), hop_length=HOP_LENGTH)
+        split_times = [0.0]
+        for i in range(1, len(beat_times)):
+            if beat_times[i] - beat_times[i - 1] >= self.min_gap:
+                split_times.append(beat_times[i])
+        split_times.append(float(beats["duration_sec"]))
+        split_ms = [int(t * 1000) for t in split_times]
+        return list(zip(split_ms[:-1], split_ms[1:]))
+
+
+class PhraseDetector:
+    """beatsplit.py (default): split only where the music changes across whole phrases.
+
+    Beats are grouped into bars from their downbeats and every bar line is
+    scored by how different the `phrase_bars` bars after it are from the
+    ones before (loudness, onset strength, beat length), so a mix gives one
+    segment per track instead of one per beat. Works from the cached beats,
+    onset envelope and energy index; nothing is decoded again.
+    """
+
+    name = "phrase"
+
+    def __init__(self, phrase_bars=PHRASE_BARS, beats_per_bar=BEATS_PER_BAR, min_track_sec=MIN_TRACK_SEC,
+                 sensitivity=SENSITIVITY):
+        self.phrase_bars = phrase_bars
+        self.beats_per_bar = beats_per_bar
+        self.min_track_sec = min_track_sec
+        self.sensitivity = sensitivity
+
+    def curve(self, mix):
+        """`(bar_times, scores)`: every bar line (s) and how much the music changes there."""
+        import librosa
+        from phrases import beat_features, boundary_scores, downbeats, standardize
+        beats, onset = mix.beats(), mix.onset()
+        sr, env = int(onset["sr"]), np.asarray(onset["onset_env"])
+        beat_frames = np.asarray(beats["beat_frames"], dtype=np.int64)
+        if len(beat_frames) < 2 * self.beats_per_bar:
+            return np.zeros(0), np.zeros(0)
+        beat_times = librosa.frames_to_time(beat_frames, sr=sr, hop_length=HOP_LENGTH)
+        features = standardize(beat_features(beat_times, env, sr / HOP_LENGTH, mix.energy()))
+        bar_starts = downbeats(env[np.minimum(beat_frames, len(env) - 1)], self.beats_per_bar)
+        bar_starts = bar_starts[bar_starts < len(features)]
+        if not len(bar_starts):
+            return np.zeros(0), np.zeros(0)
+        bar_features = np.add.reduceat(features, bar_starts, axis=0) / \
+            np.diff(np.append(bar_starts, len(features)))[:, None]
+        return beat_times[bar_starts], boundary_scores(bar_features, self.phrase_bars)
+
+    def ranges(self, mix):
+        from phrases import pick_boundaries
+        duration = float(mix.beats()["duration_sec"])
+        times, scores = self.curve(mix)
+        split_times = [0.0] + pick_boundaries(times, scores, self.phrase_bars, self.min_track_sec,
+                                              self.sensitivity, duration) + [duration]
+        split_ms = [int(t * 1000) for t in split_times]
+        return list(zip(split_ms[:-1], split_ms[1:]))
+
+
+class TempoChangeDetector:
+    """transitionenergy.py: split where the median-filtered window tempo jumps."""
+
+    name = "tempo_change"
+
+    def __init__(self, window_seconds=10, threshold=10, min_segment_sec=30, overlap=0.0):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.min_segment_sec = min_segment_sec
+        self.overlap = overlap
+
+    def curve(self, mix):
+        """`(times, tempos)` after the 3-window median filter (what the tempo plot shows)."""
+        from scipy.signal import medfilt
+        window_tempos = mix.tempos(self.window_seconds, self.overlap)
+        return np.array(window_tempos["times"]), np.array(medfilt(window_tempos["tempos"], kernel_size=3))
+
+    def ranges(self, mix):
+        times, tempos = self.curve(mix)
+        split_times = [0.0]
+        for i in range(1, len(tempos)):
+            if abs(tempos[i] - tempos[i - 1]) >= self.threshold:
+                if times[i] - split_times[-1] > self.min_segment_sec:
+                    split_times.append(times[i])
+        split_times.append(float(mix.onset()["duration_sec"]))
+        split_ms = [int(t * 1000) for t in split_times]
+        return list(zip(split_ms[:-1], split_ms[1:]))
+
+
+class NoveltyDetector:
+    """noveltysplit.py: split crossfaded mixes where timbre and harmony change for good.
+
+    Frames of log-mel and chroma are compared with each other (cosine
+    similarity) and a checkerboard kernel `kernel_sec` wide is slid along the
+    diagonal of that self-similarity matrix: it peaks where the music before
+    a point is alike, the music after it is alike, and the two differ. That
+    holds through a long blend, where loudness never dips and the tempo is
+    matched. Only the band of the matrix the kernel covers is computed.
+    """
+
+    name = "novelty"
+
+    def __init__(self, kernel_sec=KERNEL_SECONDS, min_track_sec=NOVELTY_MIN_TRACK_SEC,
+                 sensitivity=NOVELTY_SENSITIVITY, frame_seconds=FRAME_SECONDS):
+        self.kernel_sec = kernel_sec
+        self.min_track_sec = min_track_sec
+        self.sensitivity = sensitivity
+        self.frame_seconds = frame_seconds
+
+    def half_width(self, spectral):
+        """Kernel half width in frames."""
+        return max(int(round(self.kernel_sec * int(spectral["sr"]) / int(spectral["frame_length"]))), 1)
+
+    def curve(self, mix):
+        """`(times, novelty)`: the start of every frame (s) and how much the music changes there."""
+        from novelty import checkerboard_novelty, normalize, similarity_band
+        spectral = mix.spectral(self.frame_seconds)
+        frames = np.asarray(spectral["frames"], dtype=np.float32)
+        times = np.arange(len(frames)) * int(spectral["frame_length"]) / int(spectral["sr"])
+        if len(frames) < 2:
+            return times, np.zeros(len(frames))
+        half = self.half_width(spectral)
+        with stage(mix.profile, "novelty"):
+            return times, checkerboard_novelty(similarity_band(normalize(frames), 2 * half), half)
+
+    def ranges(self, mix):
+        from phrases import pick_boundaries
+        spectral = mix.spectral(self.frame_seconds)
+        duration = float(spectral["duration_sec"])
+        times, novelty = self.curve(mix)
+        split_times = [0.0] + pick_boundaries(times, novelty, self.half_width(spectral), self.min_track_sec,
+                                              self.sensitivity, duration) + [duration]
+        split_ms = [int(t * 1000) for t in split_times]
+        return list(zip(split_ms[:-1], split_ms[1:]))
+
+
+def cached_curve(detector, mix):
+    """`detector.curve(mix)` if everything it needs is already computed or cached, else None.
+
+    For resumed runs: their boundaries come from the manifest, so the curve
+    is only worth drawing if it costs no decode or analysis.
+    """
+    try:
+        with mix.cached_only():
+            return detector.curve(mix)
+    except LookupError:
+        return None
+
+
+DETECTORS = [SilenceDetector, LowVolumeDetector, BeatGapDetector, PhraseDetector, TempoChangeDetector,
+             NoveltyDetector]
+
+
+def segment(path, detectors=None, cache=None, mix=None):
+    """Run every detector over one shared MixFeatures; returns `{detector.name: ranges}`."""
+    mix = mix or MixFeatures(path, cache)
+    detectors = detectors if detectors is not None else [cls() for cls in DETECTORS]
+    return {detector.name: detector.ranges(mix) for detector in detectors}
+
+
+if __name__ == "__main__":
+    # Compare every detector on one mix: python segmentation.py funeralmix.mp3
+    path = sys.argv[1] if len(sys.argv) > 1 else "funeralmix.mp3"
+    mix = MixFeatures(path, FeatureCache())
+    for name, ranges in segment(path, mix=mix).items():
+        print(f"\n🎚️ {name}: {len(ranges)} segments")
+        for start, end in ranges:
+            print(f"  {start // 1000}s → {end // 1000}s")
+    print("\n" + mix.summary())
@@ -1,20 +1,27 @@
 import json
 import os
-from pydub import AudioSegment
+from cuesheet import write_virtual_split
+from encoder import extension
+from exporter import export_segments, source_length_ms
 
 # === CONFIGURATION ===
 AUDIO_FILE = "funeralmix.mp3"
 OUTPUT_DIR = "time_splits"
 TIMECUT_JSON = "timecut_metadata.json"  # Your updated JSON
+LOSSLESS_EXPORT = True  # Copy MP3 frames instead of re-encoding each song
+EXPORT_WORKERS = None  # Tracks written in parallel (None = one per CPU core)
+EXPORT_FORMAT = "mp3"  # mp3, flac, opus or wav (anything but mp3 is re-encoded)
+EXPORT_BITRATE = None  # e.g. "320k" for mp3/opus (None = encoder default)
+VIRTUAL_SPLIT = False  # Write a .cue sheet and offsets into the mix instead of audio files
 
 # === LOAD TIME CUTS FROM JSON ===
 with open(TIMECUT_JSON, "r", encoding="utf-8") as f:
     metadata = json.load(f)
 
-# === LOAD AUDIO ===
-print("🎵 Loading audio...")
-audio = AudioSegment.from_mp3(AUDIO_FILE)
-audio_length_ms = len(audio)
+# === MEASURE AUDIO (from the MP3 seek index; the mix itself is never decoded) ===
+print("🎵 Indexing audio...")
+audio = None  # each track is cut or re-encoded from just its own frames
+audio_length_ms = source_length_ms(AUDIO_FILE)
 
 # === CONVERT START TIMES: MINUTES → MILLISECONDS ===
 start_times = [int(entry["start_time"] * 60 * 1000) for entry in metadata]
@@ -32,12 +39,7 @@ for i in range(len(metadata)):
 
     artist = metadata[i].get("artist", "Unknown Artist").strip()
     title = metadata[i].get("title", f"Track_{i+1:02}").strip()
-    filename = f"{artist} - {title}.mp3"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-
-    segment = audio[start:end]
-    segment.export(filepath, format="mp3")
-    print(f"✅ Exported: {filename} ({start // 1000}s → {end // 1000}s)")
+    filename = f"{artist} - {title}{extension(EXPORT_FORMAT)}"
 
     segments_metadata.append({
         "track": i + 1,
@@ -50,9 +52,21 @@ for i in range(len(metadata)):
         "duration_sec": (end - start) // 1000
     })
 
+ranges = list(zip(start_times, end_times))
+if VIRTUAL_SPLIT:
+    # The cue sheet and split_timestamps.json (with offsets) replace the audio files
+    cue_path, _ = write_virtual_split(AUDIO_FILE, ranges, OUTPUT_DIR, segments_metadata)
+    print(f"✅ Cue sheet: {cue_path}")
+else:
+    paths = [os.path.join(OUTPUT_DIR, s["filename"]) for s in segments_metadata]
+    for i, start, end, _ in export_segments(AUDIO_FILE, ranges, paths, audio, LOSSLESS_EXPORT, EXPORT_WORKERS,
+                                            format=EXPORT_FORMAT, bitrate=EXPORT_BITRATE):
+        print(f"✅ Exported: {segments_metadata[i]['filename']} ({start // 1000}s → {end // 1000}s)")
+
 # === SAVE METADATA ===
-with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w", encoding="utf-8") as f:
-    json.dump(segments_metadata, f, indent=2, ensure_ascii=False)
+if not VIRTUAL_SPLIT:
+    with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w", encoding="utf-8") as f:
+        json.dump(segments_metadata, f, indent=2, ensure_ascii=False)
 
 with open(os.path.join(OUTPUT_DIR, "split_timestamps.txt"), "w", encoding="utf-8") as f:
     for s in segments_metadata:
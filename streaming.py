@@ -0,0 +1,383 @@
+import subprocess
+from collections import deque
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import mediainfo
+
+from encoder import output_args
+from envelope import SILENCE_FLOOR_DBFS, window_dbfs, window_frames
+from mp3cut import Mp3Cutter
+
+BLOCK_MS = 10000  # decoded audio held in memory at once
+MAX_PENDING_ENCODES = 4  # finished tracks allowed to keep encoding while we read on
+ONSET_BLOCK_FRAMES = 4096  # STFT frames analysed at once by stream_onset_envelopes (~47 s at 44.1 kHz)
+REGION_PREROLL_MS = 500  # decoded and dropped before a seeked region (MP3 decoder warm-up)
+
+
+def pcm_blocks(path, block_ms=BLOCK_MS):
+    """Decode `path` through an ffmpeg pipe in fixed-size int16 (frames, channels) blocks.
+
+    Returns `(sample_rate, channels, blocks)`; the samples are the same 16-bit
+    PCM `AudioSegment.from_file` would produce, just never all in memory.
+    """
+    info = mediainfo(path)
+    sample_rate, channels = int(info["sample_rate"]), int(info["channels"])
+    block_bytes = int(block_ms * sample_rate / 1000) * channels * 2
+
+    def blocks():
+        proc = subprocess.Popen(
+            [AudioSegment.converter, "-v", "error", "-i", path, "-vn",
+             "-f", "s16le", "-acodec", "pcm_s16le", "-"],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        finished = False
+        try:
+            while True:
+                data = proc.stdout.read(block_bytes)
+                if not data:
+                    break
+                usable = len(data) - len(data) % (2 * channels)
+                yield np.frombuffer(data[:usable], dtype=np.int16).reshape(-1, channels)
+            finished = True
+        finally:
+            if not finished:
+                proc.kill()
+            proc.stdout.close()
+            error = proc.stderr.read()
+            proc.stderr.close()
+            if proc.wait() and finished:
+                raise RuntimeError(f"ffmpeg could not decode {path}: {error.decode(errors='replace')}")
+
+    return sample_rate, channels, blocks()
+
+
+def decode_region(path, start_ms, end_ms, sample_rate, channels, preroll_ms=REGION_PREROLL_MS):
+    """Just `[start_ms, end_ms)` of `path` as int16 (frames, channels), decoded with an ffmpeg seek.
+
+    Decoding starts `preroll_ms` early: right after a seek the MP3 decoder has
+    no bit reservoir yet and outputs silence, which is then thrown away.
+    """
+    seek_ms = max(0, start_ms - preroll_ms)
+    proc = subprocess.run(
+        [AudioSegment.converter, "-v", "error", "-ss", f"{seek_ms / 1000:.3f}", "-t",
+         f"{(end_ms - seek_ms) / 1000:.3f}", "-i", path, "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+         "-ar", str(sample_rate), "-ac", str(channels), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode:
+        raise RuntimeError(f"ffmpeg could not decode {path}: {proc.stderr.decode(errors='replace')}")
+    usable = len(proc.stdout) - len(proc.stdout) % (2 * channels)
+    pcm = np.frombuffer(proc.stdout[:usable], dtype=np.int16).reshape(-1, channels)
+    return pcm[int((start_ms - seek_ms) * sample_rate / 1000.0):]
+
+
+class WindowScanner:
+    """Turns a stream of PCM blocks into the tools' fixed-ms dBFS windows.
+
+    Windows are computed exactly like `envelope.dbfs_envelope`, but only the
+    samples of the window currently straddling a block edge are kept around.
+    """
+
+    def __init__(self, sample_rate, channels, chunk_ms=100, floor=SILENCE_FLOOR_DBFS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.chunk_ms = chunk_ms
+        self.floor = floor
+        self.next_window = 0
+        self.start_frame = 0  # absolute frame of _pending[0], always a window start
+        self._pending = np.zeros((0, channels), dtype=np.int16)
+
+    def _scan(self, starts_ms, ends_ms):
+        start_frames, end_frames = window_frames(starts_ms, ends_ms, self.sample_rate)
+        pcm = self._pending
+        samples = pcm.reshape(-1)
+        lo = np.minimum((start_frames - self.start_frame) * self.channels, len(samples))
+        hi = np.minimum((end_frames - self.start_frame) * self.channels, len(samples))
+        counts = (end_frames - start_frames) * self.channels
+        return window_dbfs(samples, lo, hi, counts, 2, self.floor)
+
+    def _consume(self, first, volumes, upto_frame):
+        consumed = self._pending[:upto_frame - self.start_frame]
+        result = (first, volumes, consumed, self.start_frame)
+        self._pending = self._pending[upto_frame - self.start_frame:]
+        self.start_frame = upto_frame
+        self.next_window = first + len(volumes)
+        return result
+
+    def feed(self, block):
+        """Add a block; returns `(first_window, volumes, pcm, pcm_start_frame)`.
+
+        `volumes` covers every window that is now complete and `pcm` holds
+        exactly their samples (from the first one's start to the next window).
+        """
+        self._pending = np.concatenate((self._pending, block)) if len(self._pending) else block
+        buffered_end = self.start_frame + len(self._pending)
+
+        # Windows whose end frame is already buffered
+        first = self.next_window
+        last = int(buffered_end * 1000 / self.sample_rate // self.chunk_ms)
+        while last > first and int(last * self.chunk_ms * self.sample_rate / 1000.0) > buffered_end:
+            last -= 1
+        last = max(last, first)
+        starts_ms = np.arange(first, last) * self.chunk_ms
+        volumes = self._scan(starts_ms, starts_ms + self.chunk_ms)
+        upto = int(last * self.chunk_ms * self.sample_rate / 1000.0)
+        return self._consume(first, volumes, upto)
+
+    def finish(self):
+        """Close the stream; returns the remaining windows like `feed`, plus the length in ms."""
+        total_frames = self.start_frame + len(self._pending)
+        length_ms = round(total_frames * 1000 / self.sample_rate)
+        first = self.next_window
+        starts_ms = np.arange(first * self.chunk_ms, length_ms, self.chunk_ms)
+        volumes = self._scan(starts_ms, np.minimum(starts_ms + self.chunk_ms, length_ms))
+        return self._consume(first, volumes, total_frames) + (length_ms,)
+
+
+class TrackEncoder:
+    """An ffmpeg process encoding one track from PCM written to its stdin."""
+
+    def __init__(self, out_path, sample_rate, channels, format="mp3", bitrate=None):
+        self.out_path = out_path
+        self.proc = subprocess.Popen(
+            [AudioSegment.converter, "-v", "error", "-y", "-f", "s16le",
+             "-ar", str(sample_rate), "-ac", str(channels), "-i", "-"] + output_args(format, bitrate) + [out_path],
+            stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, pcm):
+        if len(pcm):
+            self.proc.stdin.write(np.ascontiguousarray(pcm).data)
+
+    def finish_input(self):
+        self.proc.stdin.close()
+
+    def wait(self):
+        error = self.proc.stderr.read()
+        self.proc.stderr.close()
+        if self.proc.wait():
+            raise RuntimeError(f"ffmpeg could not encode {self.out_path}: "
+                               f"{error.decode(errors='replace')}")
+        return self.out_path
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.wait()
+
+
+def stream_dbfs_envelope(path, chunk_ms=100, block_ms=BLOCK_MS):
+    """`dbfs_envelope` of a file without ever holding more than a block of PCM.
+
+    Returns `(volumes, length_ms)`.
+    """
+    sample_rate, channels, blocks = pcm_blocks(path, block_ms)
+    scanner = WindowScanner(sample_rate, channels, chunk_ms)
+    parts = [scanner.feed(block)[1] for block in blocks]
+    _, tail, _, _, length_ms = scanner.finish()
+    parts.append(tail)
+    return np.concatenate(parts), length_ms
+
+
+def stream_onset_envelopes(path, hop_length=512, n_fft=2048, top_db=80.0, block_frames=ONSET_BLOCK_FRAMES,
+                           block_ms=BLOCK_MS):
+    """Both onset envelopes of a mix (mean and median over mel bands) in bounded memory.
+
+    The same numbers `onset_strength(S=power_to_db(melspectrogram(y=...)))`
+    gives on the fully decoded mono signal: mel frames are computed a block
+    at a time from overlapping stretches of the zero-padded signal, and their
+    unclipped dB values go to a temporary file because `top_db` clips against
+    the loudest value of the whole mix (~640 MB of disk for 4 hours). A second
+    pass reads them back block by block to clip, difference and aggregate.
+    Returns `{"mean", "median", "sr", "duration_sec"}`.
+    """
+    import tempfile
+
+    import librosa
+
+    sample_rate, channels, blocks = pcm_blocks(path, block_ms)
+    span = (block_frames - 1) * hop_length + n_fft  # signal behind one block of frames
+    pending = np.zeros(n_fft // 2, dtype=np.float32)  # center=True pads the start with zeros
+    total_samples = 0
+    frames_done = 0
+    loudest = None
+    n_mels = None
+
+    with tempfile.TemporaryFile() as spill:
+        def flush(signal):
+            nonlocal loudest, n_mels
+            mel = librosa.feature.melspectrogram(y=signal, sr=sample_rate, n_fft=n_fft, hop_length=hop_length,
+                                                 center=False)
+            log_mel = librosa.power_to_db(mel, top_db=None)
+            n_mels = log_mel.shape[0]
+            block_max = log_mel.max()
+            loudest = block_max if loudest is None else max(loudest, block_max)
+            spill.write(np.ascontiguousarray(log_mel.T).tobytes())
+            return log_mel.shape[1]
+
+        for block in blocks:
+            if channels == 1:
+                mono = block[:, 0].astype(np.float32)
+            else:
+                mono = block.mean(axis=1, dtype=np.float32)
+            mono *= 1.0 / 32768
+            total_samples += len(mono)
+            pending = np.concatenate((pending, mono))
+            while len(pending) >= span:
+                frames_done += flush(pending[:span])
+                pending = pending[block_frames * hop_length:]
+
+        # The last frames see zero padding past the end, like center=True
+        n_frames = 1 + total_samples // hop_length
+        pending = np.concatenate((pending, np.zeros(n_fft // 2, dtype=np.float32)))
+        while frames_done < n_frames:
+            count = min(block_frames, n_frames - frames_done)
+            frames_done += flush(pending[:(count - 1) * hop_length + n_fft])
+            pending = pending[count * hop_length:]
+        floor = loudest - top_db
+        spill.seek(0)
+        means, medians = [], []
+        previous = np.zeros((0, n_mels), dtype=np.float32)  # the frame each block differences against
+        for start in range(0, n_frames, block_frames):
+            rows = np.frombuffer(spill.read(min(block_frames, n_frames - start) * n_mels * 4),
+                                 dtype=np.float32).reshape(-1, n_mels)
+            S = np.maximum(np.ascontiguousarray(np.concatenate((previous, rows)).T), floor)
+            rise = np.maximum(0.0, S[:, 1:] - S[:, :-1])
+            means.append(np.mean(rise, axis=-2))
+            medians.append(np.median(rise, axis=-2))
+            previous = rows[-1:]
+
+    # onset_strength's lag and centering shift, trimmed back to the frame count
+    pad = np.zeros(1 + n_fft // (2 * hop_length), dtype=np.float32)
+    mean = np.concatenate([pad] + means)[:n_frames]
+    median = np.concatenate([pad] + medians)[:n_frames]
+    return {"mean": mean, "median": median, "sr": sample_rate, "duration_sec": total_samples / sample_rate}
+
+
+def stream_low_volume_split(path, out_path_for, min_dbfs=-35, pause_ms=2000, chunk_ms=100,
+                            min_song_ms=10000, lossless=True, format="mp3", bitrate=None, block_ms=BLOCK_MS):
+    """lowvolume.py's split in one bounded-memory pass over an ffmpeg decode pipe.
+
+    Runs the same `current_silence` state machine and MIN_SONG_LENGTH_MS
+    filtering as the in-memory tools, but every track is handed off as soon as
+    its end is known: cut from the MP3 frames with `lossless` (MP3 to MP3),
+    otherwise its PCM has been streaming into its own ffmpeg encoder (`format`
+    at `bitrate`) all along.
+    `out_path_for(index)` names each track. Yields `(index, start_ms, end_ms,
+    out_path)` in order as tracks are finished.
+    """
+    sample_rate, channels, blocks = pcm_blocks(path, block_ms)
+    scanner = WindowScanner(sample_rate, channels, chunk_ms)
+    cutter = Mp3Cutter(path) if lossless and format == "mp3" and str(path).lower().endswith(".mp3") else None
+    windows_needed = max(1, int(np.ceil(pause_ms / chunk_ms)))
+
+    track, track_start = 0, 0
+    current_silence = 0
+    encoder = None if cutter else TrackEncoder(out_path_for(0), sample_rate, channels, format, bitrate)
+    written = 0  # frames already sent to the current encoder
+    encoding = deque()
+
+    try:
+        stream = ((scanner.feed(block) + (None,)) for block in blocks)
+        for first, volumes, pcm, pcm_start, length_ms in _then(stream, scanner.finish):
+            for offset, db in enumerate(volumes.tolist()):
+                if db >= min_dbfs:
+                    current_silence = 0
+                    continue
+                current_silence += 1
+                if current_silence < windows_needed:
+                    continue
+                current_silence = 0
+                split = (first + offset) * chunk_ms
+                if split - track_start < min_song_ms:
+                    continue
+
+                out_path = out_path_for(track)
+                if cutter:
+                    cutter.cut(track_start, split, out_path)
+                    yield track, track_start, split, out_path
+                else:
+                    split_frame = int(split * sample_rate / 1000.0)
+                    encoder.write(pcm[written - pcm_start:split_frame - pcm_start])
+                    encoder.finish_input()
+                    encoding.append((encoder, (track, track_start, split, out_path)))
+                    yield from _drain(encoding, MAX_PENDING_ENCODES)
+                    encoder = TrackEncoder(out_path_for(track + 1), sample_rate, channels, format, bitrate)
+                    written = split_frame
+                track, track_start = track + 1, split
+
+            if encoder:
+                encoder.write(pcm[written - pcm_start:])
+                written = pcm_start + len(pcm)
+
+            if length_ms is not None:
+                out_path = out_path_for(track)
+                if cutter:
+                    cutter.cut(track_start, length_ms, out_path)
+                    yield track, track_start, length_ms, out_path
+                else:
+                    encoder.finish_input()
+                    encoding.append((encoder, (track, track_start, length_ms, out_path)))
+                    encoder = None
+                    yield from _drain(encoding, 0)
+    finally:
+        if encoder:
+            encoder.kill()
+        for enc, _ in encoding:
+            enc.kill()
+        if cutter:
+            cutter.close()
+
+
+def stream_export(path, ranges, out_paths, format="mp3", bitrate=None, block_ms=BLOCK_MS):
+    """Re-encode sorted, non-overlapping `(start_ms, end_ms)` ranges while decoding block by block.
+
+    The streaming counterpart of `exporter.export_segments` for when the mix
+    was never decoded into memory. Yields `(index, start_ms, end_ms, out_path)`.
+    """
+    sample_rate, channels, blocks = pcm_blocks(path, block_ms)
+    starts, ends = window_frames([r[0] for r in ranges], [r[1] for r in ranges], sample_rate)
+    r = 0
+    position = 0
+    encoder = None
+    encoding = deque()
+    try:
+        for block in blocks:
+            end = position + len(block)
+            while r < len(ranges) and starts[r] < end:
+                if encoder is None:
+                    encoder = TrackEncoder(out_paths[r], sample_rate, channels, format, bitrate)
+                encoder.write(block[max(starts[r] - position, 0):min(ends[r], end) - position])
+                if ends[r] > end:
+                    break
+                encoder.finish_input()
+                encoding.append((encoder, (r, ranges[r][0], ranges[r][1], out_paths[r])))
+                encoder = None
+                yield from _drain(encoding, MAX_PENDING_ENCODES)
+                r += 1
+            position = end
+
+        # Ranges running past the end of the audio get whatever was there
+        for r in range(r, len(ranges)):
+            if encoder is None:
+                encoder = TrackEncoder(out_paths[r], sample_rate, channels, format, bitrate)
+            encoder.finish_input()
+            encoding.append((encoder, (r, ranges[r][0], ranges[r][1], out_paths[r])))
+            encoder = None
+        yield from _drain(encoding, 0)
+    finally:
+        if encoder:
+            encoder.kill()
+        for enc, _ in encoding:
+            enc.kill()
+
+
+def _drain(encoding, limit):
+    """Wait for the oldest finished-input encoders until at most `limit` are running."""
+    while len(encoding) > limit:
+        enc, info = encoding.popleft()
+        enc.wait()
+        yield info
+
+
+def _then(stream, last):
+    """Items of `stream`, followed by `last()` once it is exhausted."""
+    yield from stream
+    yield last()
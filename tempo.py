@@ -0,0 +1,80 @@
+import librosa
+import numpy as np
+
+# librosa.feature.tempo defaults, which beat_track uses for its tempo estimate
+AC_SIZE_SECONDS = 8.0
+START_BPM = 120.0
+STD_BPM = 1.0
+MAX_TEMPO = 320.0
+
+# Tempogram frames computed at once (x autocorrelation lags and FFT padding, ~90 MB peak at 44.1 kHz)
+BLOCK_FRAMES = 1 << 12
+
+
+def _ac_window_frames(sr, hop_length):
+    return librosa.time_to_frames(AC_SIZE_SECONDS, sr=sr, hop_length=hop_length).item()
+
+
+def _best_bpms(mean_ac, sr, hop_length):
+    """beat_track's pick from mean autocorrelations `(lags, n)`: the strongest lag under the prior."""
+    bpms = librosa.tempo_frequencies(mean_ac.shape[0], hop_length=hop_length, sr=sr)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logprior = -0.5 * ((np.log2(bpms) - np.log2(START_BPM)) / STD_BPM) ** 2
+    logprior[:int(np.argmax(bpms < MAX_TEMPO))] = -np.inf
+    return bpms[np.argmax(np.log1p(1e6 * mean_ac) + logprior[:, None], axis=0)]
+
+
+def global_tempo(onset_env, sr, hop_length=512):
+    """The tempo `librosa.beat.beat_track` estimates for a whole onset envelope.
+
+    beat_track builds a tempogram of the entire envelope to average it (GBs
+    for a long mix); here it is summed a block at a time instead. Pass the
+    result as `bpm=` and beat_track skips its own estimate.
+    """
+    onset_env = np.asarray(onset_env, dtype=np.float32)
+    win_length = _ac_window_frames(sr, hop_length)
+    padded = np.pad(onset_env, win_length // 2, mode="linear_ramp", end_values=0)
+    total = np.zeros(win_length, dtype=np.float64)
+    for a in range(0, len(onset_env), BLOCK_FRAMES):
+        b = min(a + BLOCK_FRAMES, len(onset_env))
+        tg = librosa.feature.tempogram(onset_envelope=padded[a:b + win_length - 1], sr=sr,
+                                       hop_length=hop_length, win_length=win_length, center=False)
+        total += tg.sum(axis=1, dtype=np.float64)
+    return float(_best_bpms(total[:, None] / max(len(onset_env), 1), sr, hop_length)[0])
+
+
+def window_tempos(onset_env, sr, hop_length=512, window_seconds=10, overlap=0.0):
+    """Tempo (BPM) of consecutive windows of an onset envelope, from one tempogram pass.
+
+    Same windows as the old per-window `librosa.beat.beat_track` loop (every
+    `window_seconds`, or more often with `overlap` between 0 and 1), and the
+    same estimate beat_track makes: the window's mean autocorrelation weighted
+    by a log-normal prior around 120 BPM. The tempogram is computed once over
+    the whole mix instead of per window, so window edges see their real
+    neighbours rather than zero padding. Returns `(tempos, times)` where times
+    are window starts in seconds.
+    """
+    onset_env = np.asarray(onset_env, dtype=np.float32)
+    window_hops = int(window_seconds * sr / hop_length)
+    step = max(1, int(round(window_hops * (1 - overlap))))
+    starts = np.arange(0, len(onset_env) - window_hops, step)
+    if not len(starts) or window_hops < 1:
+        return np.zeros(0), np.zeros(0)
+
+    win_length = _ac_window_frames(sr, hop_length)
+    # Center the autocorrelation frames once for the whole mix, like tempogram(center=True)
+    padded = np.pad(onset_env, win_length // 2, mode="linear_ramp", end_values=0)
+
+    sums = np.zeros((win_length, len(starts)), dtype=np.float64)
+    per_block = max(1, (BLOCK_FRAMES - window_hops) // step + 1)
+    for first in range(0, len(starts), per_block):
+        block = starts[first:first + per_block]
+        a, b = block[0], block[-1] + window_hops
+        tg = librosa.feature.tempogram(onset_envelope=padded[a:b + win_length - 1], sr=sr,
+                                       hop_length=hop_length, win_length=win_length, center=False)
+        prefix = np.zeros((win_length, tg.shape[1] + 1))
+        np.cumsum(tg, axis=1, out=prefix[:, 1:])
+        sums[:, first:first + len(block)] = prefix[:, block - a + window_hops] - prefix[:, block - a]
+
+    return _best_bpms(sums / window_hops, sr, hop_length), librosa.frames_to_time(starts, sr=sr,
+                                                                               hop_length=hop_length)
@@ -1,5 +1,9 @@
-from pydub import AudioSegment
 import os
+from cuesheet import write_virtual_split
+from encoder import extension
+from exporter import export_segments
+from featurecache import FeatureCache
+from segmentation import LowVolumeDetector, MixFeatures
 
 # === CONFIGURATION ===
 AUDIO_FILE = "funeralmix.mp3"
@@ -7,54 +11,44 @@ MIN_PAUSE_DBFS = -35          # Consider anything below this as a volume drop
 PAUSE_DURATION_MS = 2000      # Duration the volume must stay low
 CHUNK_SIZE_MS = 100
 MIN_SONG_LENGTH_MS = 10000    # Skip splitting if segments are shorter than this
+REFINE_SPLITS = True          # Move each cut to the quietest millisecond of its pause
+LOSSLESS_EXPORT = True        # Copy MP3 frames instead of re-encoding each song
+EXPORT_WORKERS = None         # Tracks written in parallel (None = one per CPU core)
+EXPORT_FORMAT = "mp3"         # mp3, flac, opus or wav (anything but mp3 is re-encoded)
+EXPORT_BITRATE = None         # e.g. "320k" for mp3/opus (None = encoder default)
+STREAMING = False             # Scan and export in decoded blocks instead of loading the whole mix
+VIRTUAL_SPLIT = False         # Write a .cue sheet and offsets into the mix instead of audio files
 
-# === LOAD AUDIO ===
-audio = AudioSegment.from_mp3(AUDIO_FILE)
-length = len(audio)
+# === LOAD VOLUME ENVELOPE (decodes only if it is not cached yet) ===
+mix = MixFeatures(AUDIO_FILE, FeatureCache(), STREAMING)
 
-# === FIND SPLIT POINTS BASED ON VOLUME DROPS ===
-split_points = []
-current_silence = 0
-
-for i in range(0, length, CHUNK_SIZE_MS):
-    chunk = audio[i:i + CHUNK_SIZE_MS]
-    db = chunk.dBFS if chunk.dBFS != float("-inf") else -90
-
-    if db < MIN_PAUSE_DBFS:
-        current_silence += CHUNK_SIZE_MS
-        if current_silence >= PAUSE_DURATION_MS:
-            split_points.append(i)
-            current_silence = 0
-    else:
-        current_silence = 0
-
-# === FILTER TOO-CLOSE SPLITS AND PREPARE FINAL SPLITS ===
-final_splits = [0]
-for point in split_points:
-    if point - final_splits[-1] >= MIN_SONG_LENGTH_MS:
-        final_splits.append(point)
-final_splits.append(length)
+# === FIND SPLIT POINTS BASED ON VOLUME DROPS (too-close splits are skipped) ===
+ranges = LowVolumeDetector(MIN_PAUSE_DBFS, PAUSE_DURATION_MS, CHUNK_SIZE_MS, MIN_SONG_LENGTH_MS,
+                           REFINE_SPLITS).ranges(mix)
 
 # === PREVIEW SPLIT TIMES ===
 print("\n🕒 Split Preview:")
-for i in range(len(final_splits) - 1):
-    start_sec = final_splits[i] // 1000
-    end_sec = final_splits[i+1] // 1000
+for i, (start, end) in enumerate(ranges):
+    start_sec = start // 1000
+    end_sec = end // 1000
     duration = end_sec - start_sec
     print(f"  Song {i+1}: {start_sec}s → {end_sec}s ({duration} seconds)")
 
 # === ASK TO EXPORT ===
-confirm = input("\nExport all these segments as separate MP3s? (y/n): ").strip().lower()
-if confirm == 'y':
+what = "a cue sheet for these segments" if VIRTUAL_SPLIT else \
+    f"all these segments as separate {EXPORT_FORMAT.upper()} files"
+confirm = input(f"\nExport {what}? (y/n): ").strip().lower()
+if confirm == 'y' and VIRTUAL_SPLIT:
+    cue_path, _ = write_virtual_split(AUDIO_FILE, ranges, "volume_split_songs")
+    print(f"✅ Cue sheet: {cue_path}")
+elif confirm == 'y':
     output_dir = "volume_split_songs"
     os.makedirs(output_dir, exist_ok=True)
 
-    for i in range(len(final_splits) - 1):
-        start = final_splits[i]
-        end = final_splits[i+1]
-        segment = audio[start:end]
-        output_file = os.path.join(output_dir, f"song_{i+1}.mp3")
-        segment.export(output_file, format="mp3")
+    paths = [os.path.join(output_dir, f"song_{i+1}{extension(EXPORT_FORMAT)}") for i in range(len(ranges))]
+    for _, _, _, output_file in export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded,
+                                                LOSSLESS_EXPORT, EXPORT_WORKERS, format=EXPORT_FORMAT,
+                                                bitrate=EXPORT_BITRATE):
         print(f"✅ Exported: {output_file}")
 else:
     print("\n❌ Export canceled. You can adjust parameters and re-run.")
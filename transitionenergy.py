@@ -1,99 +1,95 @@
-import librosa
-import numpy as np
-from scipy.signal import medfilt
-from pydub import AudioSegment
 import matplotlib.pyplot as plt
 import json
 import os
+from cuesheet import write_virtual_split
+from encoder import extension
+from exporter import export_segments
+from featurecache import FeatureCache
+from manifest import SplitManifest
+from segmentation import MixFeatures, TempoChangeDetector, cached_curve
 
 # === CONFIGURATION ===
 AUDIO_FILE = "funeralmix.mp3"
 OUTPUT_DIR = "beat_change_splits"
 WINDOW_SECONDS = 10
+WINDOW_OVERLAP = 0.0  # Fraction of each tempo window shared with the next (0.5 = half)
 TEMPO_CHANGE_THRESHOLD = 10
 MIN_SEGMENT_DURATION_SEC = 30
-
-# === STEP 1: LOAD AUDIO ===
+LOSSLESS_EXPORT = True  # Copy MP3 frames instead of re-encoding each track
+EXPORT_WORKERS = None  # Tracks written in parallel (None = one per CPU core)
+EXPORT_FORMAT = "mp3"  # mp3, flac, opus or wav (anything but mp3 is re-encoded)
+EXPORT_BITRATE = None  # e.g. "320k" for mp3/opus (None = encoder default)
+STREAMING = False  # Compute onsets block by block from the file (flat memory for long mixes)
+VIRTUAL_SPLIT = False  # Write a .cue sheet and offsets into the mix instead of audio files
+RESUME = True  # Reuse boundaries and skip finished tracks of an earlier run (split_manifest.json)
+
+# === STEP 1-3: ONSETS, WINDOW TEMPOS AND TEMPO CHANGES (cached per mix) ===
 print("🎵 Loading audio...")
-y, sr = librosa.load(AUDIO_FILE, sr=None)
-duration_sec = librosa.get_duration(y=y, sr=sr)
-
-# === STEP 2: ANALYZE TEMPO PATTERNS ===
-hop_length = 512
-onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
-frame_times = librosa.frames_to_time(np.arange(len(onset_env)), sr=sr, hop_length=hop_length)
-
-window_hops = int(WINDOW_SECONDS * sr / hop_length)
-tempos = []
-times = []
-
-for i in range(0, len(onset_env) - window_hops, window_hops):
-    segment = onset_env[i:i + window_hops]
-    if len(segment) < 10:
-        continue
-    tempo, _ = librosa.beat.beat_track(onset_envelope=segment, sr=sr, hop_length=hop_length)
-    tempos.append(tempo)
-    times.append(frame_times[i])
-
-tempos = medfilt(tempos, kernel_size=3)
-tempos = np.array(tempos)
-times = np.array(times)
-
-# === STEP 3: DETECT TEMPO CHANGES ===
-split_times = [0.0]
-for i in range(1, len(tempos)):
-    delta = abs(tempos[i] - tempos[i - 1])
-    if delta >= TEMPO_CHANGE_THRESHOLD:
-        if times[i] - split_times[-1] > MIN_SEGMENT_DURATION_SEC:
-            split_times.append(times[i])
-split_times.append(duration_sec)
-
-split_ms = [int(t * 1000) for t in split_times]
+mix = MixFeatures(AUDIO_FILE, FeatureCache(), STREAMING)
+detector = TempoChangeDetector(WINDOW_SECONDS, TEMPO_CHANGE_THRESHOLD, MIN_SEGMENT_DURATION_SEC, WINDOW_OVERLAP)
+manifest = None
+if RESUME and not VIRTUAL_SPLIT:
+    # Checkpoint of this run; a rerun (after a crash or a tweak) only redoes what is missing or changed
+    manifest = SplitManifest(OUTPUT_DIR, AUDIO_FILE, "tempo_change", {
+        "window_seconds": WINDOW_SECONDS, "threshold": TEMPO_CHANGE_THRESHOLD,
+        "min_segment_sec": MIN_SEGMENT_DURATION_SEC, "overlap": WINDOW_OVERLAP})
+ranges = manifest.boundaries(lambda: detector.ranges(mix)) if manifest else detector.ranges(mix)
+# A resumed run never decodes for the graph: it is redrawn only if the feature cache has the tempos
+curve = cached_curve(detector, mix) if manifest and manifest.resumed else detector.curve(mix)
+split_times = [start / 1000 for start, _ in ranges[1:]]
+print(mix.summary())
 
 # === STEP 4: EXPORT SPLITS ===
-print(f"\n✂️ Splitting into {len(split_ms)-1} segments...")
-audio = AudioSegment.from_mp3(AUDIO_FILE)
+print(f"\n✂️ Splitting into {len(ranges)} segments...")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 segments_metadata = []
 
-for i in range(len(split_ms) - 1):
-    start = split_ms[i]
-    end = split_ms[i + 1]
-    segment = audio[start:end]
-    filename = f"track_{i+1:02}.mp3"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-    segment.export(filepath, format="mp3")
-    print(f"✅ Exported: {filename} ({start//1000}s → {end//1000}s)")
-
-    segments_metadata.append({
-        "track": i + 1,
-        "filename": filename,
-        "start_sec": start // 1000,
-        "end_sec": end // 1000,
-        "duration_sec": (end - start) // 1000
-    })
+if VIRTUAL_SPLIT:
+    # The cue sheet and split_timestamps.json (with offsets) replace the audio files
+    cue_path, segments_metadata = write_virtual_split(AUDIO_FILE, ranges, OUTPUT_DIR)
+    print(f"✅ Cue sheet: {cue_path}")
+else:
+    paths = [os.path.join(OUTPUT_DIR, f"track_{i+1:02}{extension(EXPORT_FORMAT)}") for i in range(len(ranges))]
+    for i, start, end, filepath in export_segments(AUDIO_FILE, ranges, paths, mix.audio_if_decoded,
+                                                   LOSSLESS_EXPORT, EXPORT_WORKERS, format=EXPORT_FORMAT,
+                                                   bitrate=EXPORT_BITRATE, manifest=manifest):
+        filename = os.path.basename(filepath)
+        print(f"✅ Exported: {filename} ({start//1000}s → {end//1000}s)")
+
+        segments_metadata.append({
+            "track": i + 1,
+            "filename": filename,
+            "start_sec": start // 1000,
+            "end_sec": end // 1000,
+            "duration_sec": (end - start) // 1000
+        })
 
 # === STEP 5: EXPORT TIMESTAMPS TO JSON & TXT ===
-with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w") as f:
-    json.dump(segments_metadata, f, indent=2)
+if not VIRTUAL_SPLIT:
+    with open(os.path.join(OUTPUT_DIR, "split_timestamps.json"), "w") as f:
+        json.dump(segments_metadata, f, indent=2)
 
 with open(os.path.join(OUTPUT_DIR, "split_timestamps.txt"), "w") as f:
     for segment in segments_metadata:
       f.write(f"Track {segment['track']:02}: {segment['start_sec']}s -> {segment['end_sec']}s ({segment['duration_sec']}s)\n")
 
 # === STEP 6: PLOT TEMPO CHANGES ===
-plt.figure(figsize=(14, 5))
-plt.plot(times, tempos, marker='o', label="Tempo (BPM)")
-for split in split_times[1:-1]:
-    plt.axvline(x=split, color='r', linestyle='--', alpha=0.5)
-plt.title("Detected Beat Pattern Changes Over Time")
-plt.xlabel("Time (s)")
-plt.ylabel("Tempo (BPM)")
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(OUTPUT_DIR, "tempo_plot.png"))
-plt.show()
+if curve is not None:
+    times, tempos = curve
+    plt.figure(figsize=(14, 5))
+    plt.plot(times, tempos, marker='o', label="Tempo (BPM)")
+    for split in split_times:
+        plt.axvline(x=split, color='r', linestyle='--', alpha=0.5)
+    plt.title("Detected Beat Pattern Changes Over Time")
+    plt.xlabel("Time (s)")
+    plt.ylabel("Tempo (BPM)")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(OUTPUT_DIR, "tempo_plot.png"))
+    plt.show()
+else:
+    print("ℹ️ Resumed without the tempos in the feature cache: kept the tempo graph of the previous run")
 
 print("\n📁 All tracks, timestamp logs, and tempo graph saved to:", OUTPUT_DIR)
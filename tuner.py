@@ -0,0 +1,301 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# === CONFIGURATION ===
+AUDIO_FILE = "funeralmix.mp3"
+TIMECUT_JSON = "timecut_metadata.json"  # hand-labelled song starts, as songByTime.py reads them
+TOLERANCE_MS = 5000  # a split this close to a labelled start counts as a hit
+RESULTS_DIR = "tuner_results"
+SEED = 1234
+TOP = 5  # settings listed per detector
+
+# Every combination is tried (or --random N of them). Values are the detectors' own parameters.
+SEARCH_SPACES = {
+    "low_volume": {
+        "min_dbfs": list(range(-60, -19, 2)),
+        "pause_ms": [500, 1000, 1500, 2000, 3000, 4000],
+        "chunk_ms": [50, 100, 200],
+        "min_song_ms": [10000, 30000, 60000, 90000],
+    },
+    "silence": {
+        "min_silence_len": [500, 1000, 1500, 2000, 3000, 4000],
+        "silence_thresh": list(range(-60, -19, 2)),
+    },
+    "beat_gap": {
+        "min_gap": [0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0],
+    },
+    "phrase": {
+        "phrase_bars": [8, 16, 32],
+        "sensitivity": [2.0, 2.5, 3.0, 3.5, 4.0, 5.0, 6.0, 8.0],
+        "min_track_sec": [30, 60, 90, 120],
+    },
+    "tempo_change": {
+        "window_seconds": [5, 10, 15],
+        "overlap": [0.0, 0.5],
+        "threshold": [4, 6, 8, 10, 12, 15, 20],
+        "min_segment_sec": [30, 60, 90, 120],
+    },
+    "novelty": {
+        "kernel_sec": [10, 20, 30, 45, 60],
+        "sensitivity": [3.0, 4.0, 5.0, 6.0, 8.0, 10.0],
+        "min_track_sec": [30, 60, 90, 120],
+    },
+}
+
+
+def configurations(space, samples=None, seed=SEED):
+    """Parameter dicts of a search space: the whole grid, or `samples` of it drawn at random."""
+    names = list(space)
+    grid = list(itertools.product(*(space[name] for name in names)))
+    if samples and samples < len(grid):
+        picked = np.random.default_rng(seed).choice(len(grid), samples, replace=False)
+        grid = [grid[i] for i in sorted(picked)]
+    return [dict(zip(names, values)) for values in grid]
+
+
+# === LABELS AND SCORING ===
+def labelled_boundaries(timecuts_path):
+    """Song starts (ms) of a timecut JSON, without the one at the start of the mix."""
+    with open(timecuts_path, "r", encoding="utf-8") as f:
+        starts = np.array(sorted(int(entry["start_time"] * 60 * 1000) for entry in json.load(f)))
+    return starts[starts > 0]
+
+
+def _nearest_distance(points, targets):
+    """Distance from each of `points` to the closest of the sorted `targets`."""
+    i = np.searchsorted(targets, points)
+    left = targets[np.maximum(i - 1, 0)]
+    right = targets[np.minimum(i, len(targets) - 1)]
+    return np.minimum(np.abs(points - left), np.abs(points - right))
+
+
+def match_counts(found, truth, tolerance_ms=TOLERANCE_MS):
+    """`(found hits, found, truth hits, truth)`: splits near a labelled start and labelled starts near a split."""
+    found = np.sort(np.asarray(found, dtype=np.int64))
+    if not len(found) or not len(truth):
+        return 0, len(found), 0, len(truth)
+    return (int((_nearest_distance(found, truth) <= tolerance_ms).sum()), len(found),
+            int((_nearest_distance(truth, found) <= tolerance_ms).sum()), len(truth))
+
+
+def precision_recall_f1(counts):
+    found_hits, found, truth_hits, truth = counts
+    precision = found_hits / found if found else 0.0
+    recall = truth_hits / truth if truth else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+# === SWEEPS (features come from the mix once; each yields the split points of every configuration) ===
+def _spaced(points, min_gap, start=0, strict=False):
+    """The splits a detector keeps walking sorted `points`: each at least `min_gap` after the previous one."""
+    kept, last, i = [], start, 0
+    while True:
+        i += int(np.searchsorted(points[i:], last + min_gap, side="right" if strict else "left"))
+        if i >= len(points):
+            return np.array(kept, dtype=np.int64)
+        last = points[i]
+        kept.append(last)
+        i += 1
+
+
+def sweep_low_volume(mix, configs):
+    """LowVolumeDetector without refine (it only moves a cut inside its own pause)."""
+    from envelope import pause_splits
+    envelopes = {}
+    for c in configs:
+        if c["chunk_ms"] not in envelopes:
+            envelopes[c["chunk_ms"]] = mix.dbfs(c["chunk_ms"])[0]
+        points = np.asarray(pause_splits(envelopes[c["chunk_ms"]], c["chunk_ms"], c["min_dbfs"], c["pause_ms"]),
+                            dtype=np.int64)
+        yield _spaced(points, c["min_song_ms"])
+
+
+def sweep_silence(mix, configs):
+    """SilenceDetector's chunk starts, from the energy index on its step grid instead of every millisecond."""
+    index = mix.energy()
+    step, length = index.step_ms, index.length_ms
+    windows = {}
+    for c in configs:
+        min_len = int(np.ceil(c["min_silence_len"] / step)) * step
+        if min_len not in windows:
+            starts = np.arange(0, max(length - min_len, -1) + 1, step)
+            windows[min_len] = starts, index.dbfs(starts, starts + min_len)
+        starts, volumes = windows[min_len]
+        silent = starts[volumes <= c["silence_thresh"]]
+        if not len(silent):
+            yield np.zeros(0, dtype=np.int64)
+            continue
+        # Same merging of overlapping silent windows as detect_silence; a chunk starts where a silence ends
+        steps = np.diff(silent)
+        breaks = np.flatnonzero((steps != step) & (steps > min_len)) + 1
+        range_starts = silent[np.concatenate(([0], breaks))]
+        range_ends = silent[np.concatenate((breaks - 1, [len(silent) - 1]))] + min_len
+        ends = range_ends[(range_ends < length) & (range_starts > 0)]
+        yield np.maximum(ends - 100, 0)  # keep_silence
+
+
+def sweep_beat_gap(mix, configs):
+    import librosa
+    from segmentation import HOP_LENGTH
+    beats = mix.beats()
+    times = librosa.frames_to_time(beats["beat_frames"], sr=int(beats["sr"]), hop_length=HOP_LENGTH)
+    gaps = np.diff(times)
+    for c in configs:
+        yield (times[1:][gaps >= c["min_gap"]] * 1000).astype(np.int64)
+
+
+def sweep_phrase(mix, configs):
+    from phrases import pick_boundaries
+    from segmentation import PhraseDetector
+    duration = float(mix.beats()["duration_sec"])
+    curves = {}
+    for c in configs:
+        if c["phrase_bars"] not in curves:
+            curves[c["phrase_bars"]] = PhraseDetector(c["phrase_bars"]).curve(mix)
+        times, scores = curves[c["phrase_bars"]]
+        splits = pick_boundaries(times, scores, c["phrase_bars"], c["min_track_sec"], c["sensitivity"], duration)
+        yield (np.array(splits) * 1000).astype(np.int64)
+
+
+def sweep_tempo_change(mix, configs):
+    from segmentation import TempoChangeDetector
+    curves = {}
+    for c in configs:
+        key = (c["window_seconds"], c["overlap"])
+        if key not in curves:
+            times, tempos = TempoChangeDetector(c["window_seconds"], overlap=c["overlap"]).curve(mix)
+            curves[key] = times * 1000, np.abs(np.diff(tempos))
+        times_ms, jumps = curves[key]
+        candidates = times_ms[1:][jumps >= c["threshold"]]
+        yield _spaced(candidates, c["min_segment_sec"] * 1000, strict=True)
+
+
+def sweep_novelty(mix, configs):
+    from phrases import pick_boundaries
+    from segmentation import NoveltyDetector
+    spectral = mix.spectral()
+    duration = float(spectral["duration_sec"])
+    curves = {}
+    for c in configs:
+        if c["kernel_sec"] not in curves:
+            detector = NoveltyDetector(c["kernel_sec"])
+            curves[c["kernel_sec"]] = detector.curve(mix) + (detector.half_width(spectral),)
+        times, novelty, half = curves[c["kernel_sec"]]
+        splits = pick_boundaries(times, novelty, half, c["min_track_sec"], c["sensitivity"], duration)
+        yield (np.array(splits) * 1000).astype(np.int64)
+
+
+SWEEPS = {
+    "low_volume": sweep_low_volume,
+    "silence": sweep_silence,
+    "beat_gap": sweep_beat_gap,
+    "phrase": sweep_phrase,
+    "tempo_change": sweep_tempo_change,
+    "novelty": sweep_novelty,
+}
+
+
+# === RUN ===
+def tune_mix(path, timecuts, configs, tolerance_ms=TOLERANCE_MS, stream=False):
+    """Score every configuration of every detector on one mix (in a pool process).
+
+    Features are computed (or loaded from the feature cache) once and shared
+    by all configurations. Returns `{detector: (configurations, 4) counts}`.
+    """
+    from featurecache import FeatureCache
+    from segmentation import MixFeatures
+    mix = MixFeatures(path, FeatureCache(), stream)
+    truth = labelled_boundaries(timecuts)
+    return {name: np.array([match_counts(found, truth, tolerance_ms) for found in SWEEPS[name](mix, detector_configs)],
+                           dtype=np.int64).reshape(-1, 4)
+            for name, detector_configs in configs.items()}
+
+
+def tune(jobs, configs, tolerance_ms=TOLERANCE_MS, processes=None, stream=False):
+    """Counts summed over all labelled mixes, one pool process per mix."""
+    totals = {name: np.zeros((len(detector_configs), 4), dtype=np.int64) for name, detector_configs in configs.items()}
+    with ProcessPoolExecutor(max_workers=processes or min(len(jobs), os.cpu_count() or 1)) as pool:
+        futures = {pool.submit(tune_mix, job["file"], job["timecuts"], configs, tolerance_ms, stream): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            for name, counts in future.result().items():
+                totals[name] += counts
+            print(f"✅ {os.path.basename(futures[future]['file'])}")
+    return totals
+
+
+def ranked(configs, counts, top=TOP):
+    """The `top` settings by F1 (then precision), with their scores."""
+    rows = []
+    for params, row in zip(configs, counts):
+        precision, recall, f1 = precision_recall_f1(row)
+        rows.append({"params": params, "precision": round(precision, 3), "recall": round(recall, 3),
+                     "f1": round(f1, 3), "splits": int(row[1])})
+    return sorted(rows, key=lambda r: (-r["f1"], -r["precision"]))[:top]
+
+
+# === CLI ===
+def _jobs(source, timecuts):
+    from batch import AUDIO_EXTENSIONS, collect_jobs
+    if source.lower().endswith(AUDIO_EXTENSIONS):
+        sibling = os.path.splitext(source)[0] + ".json"
+        jobs = [{"file": source, "timecuts": sibling if os.path.isfile(sibling) else timecuts}]
+    else:
+        jobs = collect_jobs(source, timecuts=timecuts)
+    return [job for job in jobs if job.get("timecuts")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the detector settings that best match labelled mixes.")
+    parser.add_argument("source", nargs="?", default=AUDIO_FILE,
+                        help="a mix, a folder of mixes or a batch manifest (each needs a timecut JSON)")
+    parser.add_argument("--timecuts", default=TIMECUT_JSON, help="timecut JSON for mixes without a <mix>.json")
+    parser.add_argument("--detectors", nargs="+", default=list(SEARCH_SPACES), choices=list(SEARCH_SPACES))
+    parser.add_argument("--random", type=int, metavar="N", help="try N random settings per detector, not the grid")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_MS / 1000, help="seconds a split may be off")
+    parser.add_argument("--stream", action="store_true", help="analyse volume and onsets in blocks (flat memory)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="mixes scored at once (default: CPU cores)")
+    parser.add_argument("--top", type=int, default=TOP)
+    parser.add_argument("-o", "--output", help="results JSON (default: tuner_results/<time>.json)")
+    args = parser.parse_args(argv)
+
+    jobs = _jobs(args.source, args.timecuts)
+    if not jobs:
+        print(f"❌ No labelled mixes found in {args.source}")
+        return 1
+    configs = {name: configurations(SEARCH_SPACES[name], args.random) for name in args.detectors}
+    print(f"🎛️ Scoring {sum(map(len, configs.values()))} settings on {len(jobs)} labelled mixes...")
+    started = time.perf_counter()
+    totals = tune(jobs, configs, int(args.tolerance * 1000), args.jobs, args.stream)
+    seconds = time.perf_counter() - started
+
+    results = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": round(seconds, 2),
+               "tolerance_sec": args.tolerance, "mixes": [job["file"] for job in jobs], "detectors": {}}
+    for name, detector_configs in configs.items():
+        best = ranked(detector_configs, totals[name], args.top)
+        results["detectors"][name] = {"settings_tried": len(detector_configs), "best": best}
+        print(f"\n🏆 {name} ({len(detector_configs)} settings)")
+        for row in best:
+            params = ", ".join(f"{k}={v}" for k, v in row["params"].items())
+            print(f"  F1 {row['f1']:.2f}  P {row['precision']:.2f}  R {row['recall']:.2f}  "
+                  f"({row['splits']} splits)  {params}")
+    print(f"\n⏱️ {seconds:.1f}s including feature extraction")
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print("📁 Results saved to:", output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
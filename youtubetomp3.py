@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# === CONFIGURATION ===
+OUTPUT_DIR = "youtubemp3"
+FETCH_WORKERS = 4  # downloads running at once
+TRANSCODE_WORKERS = os.cpu_count() or 1  # ffmpeg encodes running at once
+MP3_BITRATE = "192k"
+
+LOCAL_PLAYLISTS = (".json", ".m3u", ".m3u8", ".txt")  # playlist files the local source understands
+
+
+def safe_name(text, fallback="download"):
+    """`text` as a file name that is valid on Windows too."""
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", str(text or "")).strip(" .")
+    return name[:150] or fallback
+
+
+# === SOURCES ===
+class YtDlpSource:
+    """YouTube (and anything else yt-dlp supports): one playlist or video URL."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def entries(self):
+        """`(title, [{"url", "title"}, ...])` without downloading anything."""
+        import yt_dlp
+        with yt_dlp.YoutubeDL({"quiet": True, "extract_flat": "in_playlist", "skip_download": True}) as ydl:
+            info = ydl.extract_info(self.url, download=False)
+        if "entries" not in info:
+            return info.get("title"), [{"url": info.get("webpage_url") or self.url, "title": info.get("title")}]
+        items = [{"url": entry.get("url") or entry.get("webpage_url") or entry["id"], "title": entry.get("title")}
+                 for entry in info["entries"] if entry]
+        return info.get("title"), items
+
+    def fetch(self, entry, folder, index):
+        """Download the best audio stream of one entry into `folder`; returns the file path."""
+        import yt_dlp
+        options = {"quiet": True, "noprogress": True, "format": "bestaudio/best",
+                   "outtmpl": os.path.join(folder, f"{index:04}.%(ext)s")}
+        with yt_dlp.YoutubeDL(options) as ydl:
+            info = ydl.extract_info(entry["url"], download=True)
+            return ydl.prepare_filename(info)
+
+
+class LocalSource:
+    """A stand-in for the remote source: a folder, or a playlist file (local or over HTTP).
+
+    Playlists list one path or URL per line (.txt/.m3u) or as a JSON list of
+    strings / `{"url": ..., "title": ...}` objects; relative entries are taken
+    from the playlist's own location.
+    """
+
+    def __init__(self, location):
+        self.location = location
+
+    @staticmethod
+    def handles(location):
+        if os.path.isdir(location) or location.startswith("file://"):
+            return True
+        return urllib.parse.urlparse(location).path.lower().endswith(LOCAL_PLAYLISTS)
+
+    def entries(self):
+        location = self.location
+        if os.path.isdir(location):
+            from batch import AUDIO_EXTENSIONS
+            # Only audio: playlists, cover art and notes in the folder are not tracks
+            files = sorted(f for f in os.listdir(location)
+                           if f.lower().endswith(AUDIO_EXTENSIONS) and os.path.isfile(os.path.join(location, f)))
+            return os.path.basename(os.path.abspath(location)), [
+                {"url": os.path.join(location, f), "title": os.path.splitext(f)[0]} for f in files]
+
+        with _open(location) as f:
+            text = f.read().decode("utf-8-sig")
+        if urllib.parse.urlparse(location).path.lower().endswith(".json"):
+            items = json.loads(text)
+        else:
+            items = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+        entries = []
+        for item in items:
+            entry = dict(item) if isinstance(item, dict) else {"url": item}
+            entry["url"] = _resolve(location, entry["url"])
+            entry.setdefault("title", os.path.splitext(os.path.basename(urllib.parse.urlparse(entry["url"]).path))[0])
+            entries.append(entry)
+        name = os.path.splitext(os.path.basename(urllib.parse.urlparse(location).path))[0]
+        return name, entries
+
+    def fetch(self, entry, folder, index):
+        ext = os.path.splitext(urllib.parse.urlparse(entry["url"]).path)[1] or ".bin"
+        path = os.path.join(folder, f"{index:04}{ext}")
+        with _open(entry["url"]) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        return path
+
+
+def _open(location):
+    if urllib.parse.urlparse(location).scheme in ("http", "https", "file"):
+        return urllib.request.urlopen(location, timeout=60)
+    return open(location, "rb")
+
+
+def _resolve(base, target):
+    """`target` relative to the playlist `base` (a URL or a local path)."""
+    if urllib.parse.urlparse(target).scheme in ("http", "https", "file") or os.path.isabs(target):
+        return target
+    if urllib.parse.urlparse(base).scheme in ("http", "https", "file"):
+        return urllib.parse.urljoin(base, target)
+    return os.path.join(os.path.dirname(os.path.abspath(base)), target)
+
+
+def source_for(url):
+    return LocalSource(url) if LocalSource.handles(url) else YtDlpSource(url)
+
+
+# === PIPELINE ===
+def transcode(path, title=None, bitrate=MP3_BITRATE):
+    """Encode a downloaded file to MP3 bytes through an ffmpeg pipe (the one pydub is set up to use)."""
+    from pydub import AudioSegment
+    command = [AudioSegment.converter, "-v", "error", "-i", path, "-vn", "-b:a", bitrate]
+    if title:
+        command += ["-metadata", f"title={title}"]
+    proc = subprocess.run(command + ["-f", "mp3", "-"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode:
+        raise RuntimeError(f"ffmpeg could not convert {title or path}: {proc.stderr.decode(errors='replace')}")
+    return proc.stdout
+
+
+def convert_all(source, entries, fetch_workers=FETCH_WORKERS, transcode_workers=TRANSCODE_WORKERS,
+                should_stop=None):
+    """Download and encode every entry, overlapping the two in separate pools.
+
+    At most `fetch_workers` downloads and `transcode_workers` encodes run at
+    once, and only a couple of downloads wait ahead of the encoders, so the
+    temp folder and the MP3s held in memory stay small however long the
+    playlist is. Each download is deleted as soon as it has been encoded.
+    Yields `(index, entry, mp3_bytes, error)` as items finish (not in order).
+    """
+    limit = fetch_workers + 2 * transcode_workers
+    todo = iter(enumerate(entries))
+    fetching, encoding = {}, {}
+    with tempfile.TemporaryDirectory(prefix="youtubemp3_") as folder, \
+            ThreadPoolExecutor(fetch_workers) as fetch_pool, ThreadPoolExecutor(transcode_workers) as encode_pool:
+        try:
+            while True:
+                while len(fetching) + len(encoding) < limit and not (should_stop and should_stop()):
+                    item = next(todo, None)
+                    if item is None:
+                        break
+                    i, entry = item
+                    fetching[fetch_pool.submit(source.fetch, entry, folder, i)] = (i, entry)
+                if not fetching and not encoding:
+                    return
+                done, _ = wait(list(fetching) + list(encoding), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetching:
+                        i, entry = fetching.pop(future)
+                        if future.exception():
+                            yield i, entry, None, future.exception()
+                        else:
+                            path = future.result()
+                            encoding[encode_pool.submit(transcode, path, entry.get("title"))] = (i, entry, path)
+                    else:
+                        i, entry, path = encoding.pop(future)
+                        if os.path.exists(path):
+                            os.remove(path)
+                        yield i, entry, future.result() if not future.exception() else None, future.exception()
+        finally:
+            # Stopping early: let running jobs finish, skip the rest
+            for future in list(fetching) + list(encoding):
+                future.cancel()
+
+
+def download_playlist(url, output_dir=OUTPUT_DIR, fetch_workers=FETCH_WORKERS,
+                      transcode_workers=TRANSCODE_WORKERS, log=print, should_stop=None):
+    """Turn a playlist or video URL into one zip of MP3s named after it; returns the zip path.
+
+    Each MP3 is appended to the zip the moment it is encoded (stored, MP3
+    does not compress), so no MP3 ever lands on disk outside the zip. Files
+    are numbered in playlist order. The zip is written as `.part` and renamed
+    once complete.
+    """
+    source = source_for(url)
+    log("🔎 Reading playlist...")
+    title, entries = source.entries()
+    if not entries:
+        raise ValueError(f"Nothing to download at {url}")
+    os.makedirs(output_dir, exist_ok=True)
+    zip_path = os.path.join(output_dir, safe_name(title) + ".zip")
+    log(f"🎵 {len(entries)} item(s) from: {title}")
+
+    started = time.perf_counter()
+    failed, names = [], set()
+    with zipfile.ZipFile(zip_path + ".part", "w", zipfile.ZIP_STORED) as zf:
+        results = convert_all(source, entries, fetch_workers, transcode_workers, should_stop)
+        try:
+            for done, (i, entry, mp3, error) in enumerate(results, 1):
+                label = entry.get("title") or entry["url"]
+                if error is not None:
+                    failed.append({"index": i + 1, "title": label, "error": str(error)})
+                    log(f"❌ [{done}/{len(entries)}] {label}: {error}")
+                    continue
+                name = f"{i + 1:03} - {safe_name(label, f'Track {i + 1}')}.mp3"
+                while name in names:
+                    name = name[:-4] + "_.mp3"
+                names.add(name)
+                zf.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), mp3)
+                log(f"✅ [{done}/{len(entries)}] {name} ({len(mp3) / 2**20:.1f} MB)")
+        finally:
+            results.close()
+    if should_stop and should_stop():
+        log(f"⏹️ Stopped after {len(names)} MP3(s); the partial zip is at: {zip_path}.part")
+        return zip_path + ".part"
+    os.replace(zip_path + ".part", zip_path)
+    log(f"📁 {len(names)} MP3(s) in {time.perf_counter() - started:.0f}s, saved to: {zip_path}")
+    if failed:
+        log(f"⚠️ {len(failed)} item(s) failed: " + ", ".join(str(f["index"]) for f in failed))
+    return zip_path
+
+
+if __name__ == "__main__":
+    playlist_url = sys.argv[1] if len(sys.argv) > 1 else input("Enter YouTube playlist or video URL: ").strip()
+    download_playlist(playlist_url)